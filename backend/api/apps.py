@@ -1,7 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
     verbose_name = "API Интерфейс"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if settings.QUERY_INSTRUMENTATION or settings.METRICS_ENABLED:
+            from .instrumentation import install
+
+            # Соединения создаются в каждом потоке отдельно, в том числе
+            # в потоках sync_to_async под ASGI.
+            connection_created.connect(install)
+        if settings.METRICS_ENABLED:
+            from foodgram.metrics import record_connection
+
+            connection_created.connect(record_connection)
@@ -0,0 +1,301 @@
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import InvalidPage
+from django.db.models import Exists, OuterRef, Value
+from django.http import HttpResponse
+from django.urls import path
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from recipes.catalog import aget_catalog, get_catalog_version
+from recipes.models import Recipe
+from users.models import User, UserSubscription
+
+from .conditional import (
+    get_not_modified_response,
+    get_variant_etag,
+    make_etag,
+    set_validators,
+    version_to_datetime,
+)
+from .feed_cache import (
+    cache_page,
+    get_cached_page,
+    get_feed_versions,
+    get_page_key,
+    is_feed_cacheable,
+)
+from .pagination import CustomPaginator
+from .serializers import RecipeDetailSerializer, UserSerializer
+from .views import (
+    CustomUserManagerViewSet,
+    IngredientViewSet,
+    RecipeManagerViewSet,
+    annotate_for_reading,
+)
+
+# Параметры, которые асинхронные обработчики не поддерживают: такие
+# запросы отдаются синхронным представлениям DRF.
+SYNC_ONLY_PARAMS = ("search", "cursor", "count", "format")
+
+
+class FallbackToSync(Exception):
+    """Запрос нужно выполнить синхронным представлением."""
+
+
+async def aauthenticate(request):
+    """Асинхронный аналог TokenAuthentication."""
+    auth = request.headers.get("Authorization", "").split()
+    if not auth or auth[0].lower() != "token":
+        return AnonymousUser()
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed(
+            _("Invalid token header. No credentials provided.")
+        )
+    token = await Token.objects.select_related("user").filter(
+        key=auth[1]
+    ).afirst()
+    if token is None:
+        raise exceptions.AuthenticationFailed(_("Invalid token."))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(
+            _("User inactive or deleted.")
+        )
+    return token.user
+
+
+def get_media_type():
+    """Формат ответов асинхронных обработчиков — первый из рендереров."""
+    return api_settings.DEFAULT_RENDERER_CLASSES[0].media_type
+
+
+def not_found(model):
+    """Та же ошибка, что у get_object_or_404 синхронных представлений."""
+    return exceptions.NotFound(
+        _("No %s matches the given query.") % model._meta.object_name
+    )
+
+
+def render(data, status=200):
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    response = HttpResponse(
+        renderer.render(data),
+        status=status,
+        content_type=renderer.media_type,
+    )
+    response["Vary"] = "Accept"
+    return response
+
+
+def async_read_view(handler, sync_view):
+    """GET обслуживает handler, остальное — синхронное представление DRF."""
+    view_class, actions = sync_view.cls, sync_view.actions
+    sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or any(
+            param in request.GET for param in SYNC_ONLY_PARAMS
+        ):
+            return await sync_view(request, *args, **kwargs)
+        try:
+            request = Request(request)
+            request.user = await aauthenticate(request)
+            return await handler(request, *args, **kwargs)
+        except FallbackToSync:
+            return await sync_view(request._request, *args, **kwargs)
+        except exceptions.APIException as error:
+            detail = error.detail
+            if not isinstance(detail, (list, dict)):
+                detail = {"detail": detail}
+            response = render(detail, error.status_code)
+            if isinstance(error, exceptions.AuthenticationFailed):
+                response["WWW-Authenticate"] = "Token"
+            return response
+
+    # Как у as_view(): по ним находятся query_budgets вьюсета.
+    view.cls, view.actions = view_class, actions
+    markcoroutinefunction(view)
+    return csrf_exempt(view)
+
+
+def conditional(request, data, etag, last_modified=None):
+    etag = get_variant_etag(request, etag, get_media_type())
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is None:
+        response = render(data() if callable(data) else data)
+    return set_validators(response, etag, last_modified)
+
+
+async def ingredient_list(request):
+    catalog = await aget_catalog()
+    name = request.query_params.get("name", "").strip()
+    return conditional(
+        request,
+        lambda: catalog.search(
+            name, limit=settings.INGREDIENT_SEARCH_LIMIT if name else None
+        ),
+        make_etag("ingredients", catalog.version),
+    )
+
+
+async def ingredient_detail(request, pk):
+    catalog = await aget_catalog()
+    ingredient = catalog.get(pk)
+    if ingredient is None:
+        raise exceptions.NotFound
+    return conditional(request, ingredient,
+                       make_etag("ingredients", catalog.version))
+
+
+async def user_detail(request, id):
+    viewer = request.user
+    queryset = User.objects.annotate(
+        is_subscribed=Exists(
+            UserSubscription.objects.filter(
+                user=viewer, author=OuterRef("pk")
+            )
+        ) if viewer.is_authenticated else Value(False)
+    )
+    user = await queryset.filter(pk=id).afirst()
+    if user is None:
+        raise not_found(User)
+    return conditional(
+        request,
+        lambda: UserSerializer(user, context={"request": request}).data,
+        make_etag("user", str(id), viewer.pk, user.updated_at,
+                  user.is_subscribed),
+        None if viewer.is_authenticated else user.updated_at,
+    )
+
+
+async def recipe_detail(request, pk):
+    user = request.user
+    queryset = annotate_for_reading(Recipe.objects.all(), user)
+    recipe = await queryset.filter(pk=pk).afirst()
+    if recipe is None:
+        raise not_found(Recipe)
+    state = (recipe.updated_at, recipe.author.updated_at)
+    if user.is_authenticated:
+        state += (
+            recipe.is_favorited,
+            recipe.is_in_shopping_cart,
+            recipe.author.is_subscribed,
+        )
+    catalog_version = await sync_to_async(get_catalog_version)()
+    return conditional(
+        request,
+        lambda: RecipeDetailSerializer(
+            recipe, context={"request": request}
+        ).data,
+        make_etag("recipe", str(pk), user.pk, state, catalog_version),
+        None if user.is_authenticated else max(
+            *state[:2], version_to_datetime(catalog_version)
+        ),
+    )
+
+
+async def recipe_list(request):
+    user = request.user
+    if not is_feed_cacheable(request) and not user.is_authenticated:
+        # Личные фильтры без авторизации синхронный путь обработает
+        # так же, как раньше.
+        raise FallbackToSync
+    view = RecipeManagerViewSet(
+        request=request, action="list", args=(), kwargs={},
+        format_kwarg=None,
+    )
+    queryset = view.filter_queryset(view.get_queryset())
+
+    versions = await sync_to_async(get_feed_versions)(user)
+    etag = None
+    if versions is not None:
+        etag = get_variant_etag(
+            request, make_etag("recipes", user.pk, versions),
+            get_media_type(),
+        )
+    response = get_not_modified_response(request, etag, None)
+    if response is not None:
+        return set_validators(response, etag, None)
+
+    page_key = None
+    if is_feed_cacheable(request):
+        page_key = await sync_to_async(get_page_key)(request)
+        data = await sync_to_async(get_cached_page)(request, page_key)
+        if data is not None:
+            return set_validators(render(data), etag, None)
+
+    data = await paginate(request, queryset)
+    if page_key is not None:
+        await sync_to_async(cache_page)(request, page_key, data)
+    return set_validators(render(data), etag, None)
+
+
+async def paginate(request, queryset):
+    """Постраничный вывод CustomPaginator без синхронных запросов."""
+    pagination = CustomPaginator()
+    pagination.request = request
+    pagination.cursor_mode = pagination.approximate = False
+    page_size = pagination.get_page_size(request)
+    paginator = pagination.django_paginator_class(queryset, page_size)
+    paginator.count = await queryset.acount()
+    page_number = pagination.get_page_number(request, paginator)
+    try:
+        pagination.page = paginator.page(page_number)
+    except InvalidPage as error:
+        raise exceptions.NotFound(pagination.invalid_page_message.format(
+            page_number=page_number, message=str(error)
+        ))
+    rows = [recipe async for recipe in pagination.page.object_list]
+    pagination.page.object_list = rows
+    serializer = RecipeDetailSerializer(rows, many=True,
+                                        context={"request": request})
+    return pagination.get_paginated_response(serializer.data).data
+
+
+def get_sync_views():
+    """Представления DRF для тех же URL, что регистрирует роутер."""
+    list_actions = {"get": "list", "post": "create"}
+    detail_actions = {
+        "get": "retrieve",
+        "put": "update",
+        "patch": "partial_update",
+        "delete": "destroy",
+    }
+    return {
+        "ingredients-list": IngredientViewSet.as_view(
+            {"get": "list"}, basename="ingredients", detail=False
+        ),
+        "ingredients-detail": IngredientViewSet.as_view(
+            {"get": "retrieve"}, basename="ingredients", detail=True
+        ),
+        "recipes-list": RecipeManagerViewSet.as_view(
+            list_actions, basename="recipes", detail=False
+        ),
+        "recipes-detail": RecipeManagerViewSet.as_view(
+            detail_actions, basename="recipes", detail=True
+        ),
+        "users-detail": CustomUserManagerViewSet.as_view(
+            detail_actions, basename="users", detail=True
+        ),
+    }
+
+
+def get_urlpatterns():
+    """Асинхронные маршруты; их ставят перед маршрутами роутера."""
+    sync_views = get_sync_views()
+    return [
+        path(route, async_read_view(handler, sync_views[name]), name=name)
+        for route, handler, name in (
+            ("ingredients/", ingredient_list, "ingredients-list"),
+            ("ingredients/<int:pk>/", ingredient_detail,
+             "ingredients-detail"),
+            ("recipes/", recipe_list, "recipes-list"),
+            ("recipes/<int:pk>/", recipe_detail, "recipes-detail"),
+            ("users/<int:id>/", user_detail, "users-detail"),
+        )
+    ]
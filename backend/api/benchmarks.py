@@ -0,0 +1,145 @@
+import json
+import os
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(timings):
+    """Сводка по замерам в миллисекундах."""
+    if not timings:
+        return {"count": 0}
+    summary = {
+        "count": len(timings),
+        "min_ms": round(min(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+    if len(timings) > 1:
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        for share in PERCENTILES:
+            summary[f"p{share}_ms"] = round(cuts[share - 1], 3)
+    else:
+        for share in PERCENTILES:
+            summary[f"p{share}_ms"] = summary["min_ms"]
+    return summary
+
+
+def get_host():
+    """Хост из ALLOWED_HOSTS для запросов, которые не идут через сеть."""
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip(".")
+        if host and host != "*":
+            return host
+    return "localhost"
+
+
+def get_revision():
+    """Текущий коммит, чтобы результаты можно было сравнивать по истории."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name, params, results, output_dir=None):
+    """Сохраняет результаты в <каталог>/<name>/ и возвращает прошлые.
+
+    Каждый запуск пишется в отдельный файл с датой и коммитом в имени,
+    поэтому файлы сортируются по времени запуска.
+    """
+    directory = os.path.join(
+        output_dir or settings.BENCHMARK_RESULTS_DIR, name
+    )
+    os.makedirs(directory, exist_ok=True)
+    previous = load_latest(directory, params)
+    revision = get_revision()
+    created = datetime.now(timezone.utc)
+    document = {
+        "benchmark": name,
+        "revision": revision,
+        "created": created.isoformat(timespec="seconds"),
+        "params": params,
+        "results": results,
+    }
+    filename = f"{created:%Y%m%dT%H%M%S}-{revision or 'unknown'}.json"
+    path = os.path.join(directory, filename)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file, ensure_ascii=False, indent=2)
+    return path, previous
+
+
+def load_latest(directory, params):
+    """Последний запуск с теми же параметрами: иначе сравнивать нечего."""
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as file:
+            document = json.load(file)
+        if document.get("params") == params:
+            return document
+    return None
+
+
+def find_regressions(previous, results, metrics, threshold):
+    """Метрики, выросшие больше чем на threshold (доля) с прошлого запуска.
+
+    Для всех метрик меньшее значение лучше.
+    """
+    if previous is None:
+        return []
+    regressions = []
+    for case, current in results.items():
+        before = previous["results"].get(case)
+        if not before:
+            continue
+        for metric in metrics:
+            old, new = before.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append((case, metric, old, new))
+    return regressions
+
+
+class BenchmarkCommand(BaseCommand):
+    """Общие параметры и вывод для команд benchmark_*."""
+
+    benchmark_name = None
+    # Метрики, рост которых считается регрессией.
+    regression_metrics = ("p95_ms",)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            help="Каталог для JSON с результатами "
+                 "(по умолчанию BENCHMARK_RESULTS_DIR).",
+        )
+        parser.add_argument(
+            "--threshold", type=float, default=0.2,
+            help="Допустимый рост метрик относительно прошлого запуска.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def save(self, params, results, options):
+        path, previous = save_results(self.benchmark_name, params, results,
+                                      options["output"])
+        self.stdout.write(f"Результаты: {path}")
+        regressions = find_regressions(previous, results,
+                                       self.regression_metrics,
+                                       options["threshold"])
+        for case, metric, old, new in regressions:
+            self.stdout.write(self.style.WARNING(
+                f"Регрессия {case}: {metric} {old} -> {new} "
+                f"(коммит {previous['revision']})"
+            ))
+        return regressions
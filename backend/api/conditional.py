@@ -0,0 +1,111 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from foodgram.metrics import record_cache
+
+
+def make_etag(*parts):
+    return quote_etag(
+        hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    )
+
+
+def get_variant_etag(request, etag, media_type):
+    """ETag конкретного представления ресурса.
+
+    Тело зависит не только от данных: у разных страниц и фильтров
+    (параметры запроса) и форматов ответа ETag тоже разный.
+    """
+    if etag is None:
+        return None
+    return make_etag(
+        etag,
+        request.build_absolute_uri(request.path),
+        sorted(request.query_params.lists()),
+        media_type,
+    )
+
+
+def version_to_datetime(version):
+    """Версия кэша (time.time_ns() при изменении) как Last-Modified."""
+    return datetime.fromtimestamp(version / 10 ** 9, tz=timezone.utc)
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """Ответ 304, если клиент прислал совпадающие валидаторы, иначе None."""
+    if etag is None and last_modified is None:
+        return None
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=(
+            int(last_modified.timestamp()) if last_modified else None
+        ),
+    )
+    if "If-None-Match" in request.headers or (
+        "If-Modified-Since" in request.headers
+    ):
+        record_cache("conditional_get",
+                     response is not None and response.status_code == 304)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        if etag and not response.has_header("ETag"):
+            response["ETag"] = etag
+        if last_modified and not response.has_header("Last-Modified"):
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+class NotModified(Exception):
+    """Прерывает обработку запроса готовым ответом 304."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Добавляет ETag/Last-Modified и отвечает 304 Not Modified.
+
+    Валидаторы считаются get_validators() без сериализации тела ответа.
+    """
+
+    conditional_actions = ("list", "retrieve")
+    validators = (None, None)
+
+    def get_validators(self, request, *args, **kwargs):
+        """Возвращает пару (etag, last_modified); None — не проверять."""
+        return None, None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method not in ("GET", "HEAD")
+            or self.action not in self.conditional_actions
+        ):
+            return
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        self.validators = (
+            get_variant_etag(request, etag, request.accepted_media_type),
+            last_modified,
+        )
+        response = get_not_modified_response(request, *self.validators)
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        return set_validators(response, *self.validators)
@@ -0,0 +1,141 @@
+import csv
+import io
+import os
+
+from django.conf import settings
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from recipes.models import RecipeIngredientLink
+
+from .renderers import dumps
+
+EXPORT_CHUNK_SIZE = 2000
+SHOPPING_LIST_TITLE = "Список покупок"
+SHOPPING_LIST_FILENAME = "shopping_list"
+PDF_FONT_NAME = "ShoppingListFont"
+PDF_FALLBACK_FONT = "Helvetica"
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """Параметр ?format= выбирает формат файла, а не рендерер DRF.
+
+    Ответы с ошибками при этом всегда отдаются в JSON.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return super().select_renderer(request, renderers, "json")
+
+
+def get_shopping_list_rows(user):
+    """Суммирует ингредиенты корзины одним агрегирующим запросом."""
+    return (
+        RecipeIngredientLink.objects.filter(
+            recipe__in_shopping_cart_of__user=user
+        )
+        .values("ingredient__name", "ingredient__measurement_unit")
+        .annotate(total_amount=Sum("amount"))
+        .order_by("ingredient__name", "ingredient__measurement_unit")
+        .values_list(
+            "ingredient__name",
+            "ingredient__measurement_unit",
+            "total_amount",
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+class _Echo:
+    """Буфер для csv.writer, который просто возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def stream_txt(rows):
+    yield f"{SHOPPING_LIST_TITLE}:\n"
+    for name, unit, amount in rows:
+        yield f"- {name} ({unit}) — {amount}\n"
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(("name", "measurement_unit", "amount"))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_json(rows):
+    separator = "\n"
+    yield "["
+    for name, unit, amount in rows:
+        item = {"name": name, "measurement_unit": unit, "amount": amount}
+        yield separator + dumps(item).decode()
+        separator = ",\n"
+    yield "\n]\n"
+
+
+def _get_pdf_font():
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    font_path = settings.SHOPPING_LIST_PDF_FONT
+    if not os.path.exists(font_path):
+        return PDF_FALLBACK_FONT
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+    return PDF_FONT_NAME
+
+
+def stream_pdf(rows):
+    """PDF собирается целиком и отдаётся одним куском.
+
+    Строки при этом всё равно читаются из курсора порциями.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    font = _get_pdf_font()
+    font_size = 11
+    line_height = font_size * 1.5
+    margin = 50
+    width, height = A4
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle(SHOPPING_LIST_TITLE)
+    pdf.setFont(font, font_size + 3)
+    pdf.drawString(margin, height - margin, f"{SHOPPING_LIST_TITLE}:")
+    y = height - margin - line_height * 2
+    pdf.setFont(font, font_size)
+
+    for name, unit, amount in rows:
+        if y < margin:
+            pdf.showPage()
+            pdf.setFont(font, font_size)
+            y = height - margin
+        pdf.drawString(margin, y, f"- {name} ({unit}) — {amount}")
+        y -= line_height
+
+    pdf.save()
+    yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    "txt": (stream_txt, "text/plain; charset=utf-8"),
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "json": (stream_json, "application/json; charset=utf-8"),
+    "pdf": (stream_pdf, "application/pdf"),
+}
+DEFAULT_EXPORT_FORMAT = "txt"
+
+
+def build_shopping_list_response(rows, export_format):
+    stream, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream(rows), content_type=content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="{SHOPPING_LIST_FILENAME}.{export_format}"'
+    )
+    return response
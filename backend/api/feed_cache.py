@@ -0,0 +1,179 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Value
+
+from foodgram.db_router import is_reading_replica
+from foodgram.metrics import record_cache
+from recipes.models import FavoriteRecipe, ShoppingListEntry
+from users.models import UserSubscription
+
+FEED_VERSION_KEY = "recipe_feed:version"
+USER_VERSION_KEY = "recipe_feed:user:{user_id}:version"
+PAGE_KEY = "recipe_feed:page:{version}:{digest}"
+OVERLAY_KEY = "recipe_feed:overlay:{user_id}:{version}:{page_key}"
+PERSONAL_PARAMS = (
+    "is_favorited",
+    "is_in_shopping_cart",
+    "favorites",
+    "shopping_cart",
+)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump_version(key):
+    transaction.on_commit(
+        lambda: cache.set(key, time.time_ns(), timeout=None)
+    )
+
+
+def _is_fresh(version):
+    """Версию поставили так недавно, что реплика могла не догнать запись."""
+    return is_reading_replica() and (
+        time.time_ns() - version
+        < settings.DB_REPLICA_STICKY_SECONDS * 10 ** 9
+    )
+
+
+def invalidate_feed():
+    """Сбрасывает общие страницы ленты после изменения рецептов."""
+    _bump_version(FEED_VERSION_KEY)
+
+
+def invalidate_user_feed(user_id):
+    """Сбрасывает отметки избранного, корзины и подписок пользователя."""
+    _bump_version(USER_VERSION_KEY.format(user_id=user_id))
+
+
+def is_feed_cacheable(request):
+    return not any(param in request.query_params
+                   for param in PERSONAL_PARAMS)
+
+
+def get_page_key(request):
+    params = sorted(request.query_params.lists())
+    digest = hashlib.md5(
+        repr((request.build_absolute_uri(request.path), params)).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return PAGE_KEY.format(version=_get_version(FEED_VERSION_KEY),
+                           digest=digest)
+
+
+def get_feed_versions(user):
+    """Версии общей ленты и отметок пользователя для ETag списка.
+
+    Их сбрасывают те же изменения, что и закэшированные страницы, так
+    что валидатор не требует запросов к базе. None — проверять нечего:
+    чтение идёт с реплики сразу после изменения.
+    """
+    versions = [_get_version(FEED_VERSION_KEY)]
+    if user.is_authenticated:
+        versions.append(
+            _get_version(USER_VERSION_KEY.format(user_id=user.pk))
+        )
+    if any(map(_is_fresh, versions)):
+        return None
+    return versions
+
+
+def _get_overlay_key(user, page_key):
+    version = _get_version(USER_VERSION_KEY.format(user_id=user.pk))
+    return OVERLAY_KEY.format(user_id=user.pk, version=version,
+                              page_key=page_key)
+
+
+def split_page(data):
+    """Делит страницу ленты на общую часть и отметки пользователя."""
+    public_results = []
+    overlay = {"favorites": [], "shopping_cart": [], "subscriptions": []}
+    for item in data["results"]:
+        if item["is_favorited"]:
+            overlay["favorites"].append(item["id"])
+        if item["is_in_shopping_cart"]:
+            overlay["shopping_cart"].append(item["id"])
+        if item["author"]["is_subscribed"]:
+            overlay["subscriptions"].append(item["author"]["id"])
+        public_results.append(dict(
+            item,
+            is_favorited=False,
+            is_in_shopping_cart=False,
+            author=dict(item["author"], is_subscribed=False),
+        ))
+    return dict(data, results=public_results), overlay
+
+
+def _load_overlay(user, page):
+    recipe_ids = [item["id"] for item in page["results"]]
+    author_ids = {item["author"]["id"] for item in page["results"]}
+    favorites = FavoriteRecipe.objects.filter(
+        user=user, recipe_id__in=recipe_ids
+    ).order_by().values_list(Value("favorites"), "recipe_id")
+    shopping_cart = ShoppingListEntry.objects.filter(
+        user=user, recipe_id__in=recipe_ids
+    ).order_by().values_list(Value("shopping_cart"), "recipe_id")
+    subscriptions = UserSubscription.objects.filter(
+        user=user, author_id__in=author_ids
+    ).order_by().values_list(Value("subscriptions"), "author_id")
+
+    overlay = {"favorites": [], "shopping_cart": [], "subscriptions": []}
+    for kind, pk in favorites.union(shopping_cart, subscriptions,
+                                    all=True):
+        overlay[kind].append(pk)
+    return overlay
+
+
+def get_cached_page(request, page_key):
+    """Собирает страницу из общего кэша и отметок пользователя."""
+    page = cache.get(page_key)
+    record_cache("feed_page", page is not None)
+    if page is None or not request.user.is_authenticated:
+        return page
+
+    overlay_key = _get_overlay_key(request.user, page_key)
+    overlay = cache.get(overlay_key)
+    record_cache("feed_overlay", overlay is not None)
+    if overlay is None:
+        overlay = _load_overlay(request.user, page)
+        cache.set(overlay_key, overlay,
+                  timeout=settings.RECIPE_FEED_CACHE_TIMEOUT)
+
+    favorites = set(overlay["favorites"])
+    shopping_cart = set(overlay["shopping_cart"])
+    subscriptions = set(overlay["subscriptions"])
+    return dict(page, results=[
+        dict(
+            item,
+            is_favorited=item["id"] in favorites,
+            is_in_shopping_cart=item["id"] in shopping_cart,
+            author=dict(
+                item["author"],
+                is_subscribed=item["author"]["id"] in subscriptions,
+            ),
+        )
+        for item in page["results"]
+    ])
+
+
+def cache_page(request, page_key, data):
+    if _is_fresh(_get_version(FEED_VERSION_KEY)):
+        # Реплика могла ещё не получить изменение, сбросившее ленту:
+        # такая страница осталась бы в кэше под новой версией.
+        return
+    public, overlay = split_page(data)
+    timeout = settings.RECIPE_FEED_CACHE_TIMEOUT
+    cache.set(page_key, public, timeout=timeout)
+    if request.user.is_authenticated:
+        cache.set(_get_overlay_key(request.user, page_key), overlay,
+                  timeout=timeout)
@@ -0,0 +1,96 @@
+import uuid
+
+import filetype
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+from recipes.images import DEFAULT_FORMAT, FORMATS, get_rendition
+
+from .parsers import get_image_size_message
+
+
+def _get_renditions(value):
+    return getattr(value.instance, f"{value.field.name}_renditions", None)
+
+
+class RenditionImageField(serializers.ImageField):
+    """Ссылка на уменьшенную копию изображения, пока её нет — на оригинал."""
+
+    def __init__(self, rendition, fmt=DEFAULT_FORMAT, **kwargs):
+        self.rendition = rendition
+        self.fmt = fmt
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        name = get_rendition(_get_renditions(value), value.name,
+                             self.rendition, self.fmt)
+        if name is None:
+            return super().to_representation(value)
+        url = value.storage.url(name)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """Все готовые копии: {"thumbnail": {"webp": url, "jpeg": url}, ...}."""
+
+    def to_representation(self, value):
+        renditions = _get_renditions(value) if value else None
+        if not renditions or renditions.get("source") != value.name:
+            return {}
+        request = self.context.get("request")
+        result = {}
+        for size, formats in renditions.items():
+            if not isinstance(formats, dict):
+                continue
+            result[size] = {}
+            for fmt in FORMATS:
+                if fmt in formats:
+                    url = value.storage.url(formats[fmt])
+                    result[size][fmt] = (
+                        request.build_absolute_uri(url) if request else url
+                    )
+        return result
+
+
+class ImageUploadField(Base64ImageField):
+    """Base64ImageField, который принимает и готовые файлы.
+
+    Файлы приходят из StreamingJSONParser (длинные data URI уже
+    декодированы на диск) и из multipart/form-data.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            if len(data) * 3 // 4 > settings.MAX_IMAGE_UPLOAD_SIZE:
+                raise serializers.ValidationError(get_image_size_message())
+            return super().to_internal_value(data)
+        if not isinstance(data, UploadedFile):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        if data.size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            raise serializers.ValidationError(get_image_size_message())
+        data.name = f"{uuid.uuid4()}.{self.get_upload_extension(data)}"
+        return super(Base64FieldMixin, self).to_internal_value(data)
+
+    def get_upload_extension(self, upload):
+        upload.seek(0)
+        extension = filetype.guess_extension(upload.read(262))
+        upload.seek(0)
+        if extension is None:
+            try:
+                with Image.open(upload) as image:
+                    extension = image.format.lower()
+            except OSError:
+                raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+            finally:
+                upload.seek(0)
+        extension = "jpg" if extension == "jpeg" else extension
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        return extension
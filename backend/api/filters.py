@@ -1,17 +1,66 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
 from django_filters import rest_framework as filters
 
 from recipes.models import Ingredient, Recipe
 
+PREFIX_MATCH = 0
+CONTAINS_MATCH = 1
+FUZZY_MATCH = 2
+
 
 class IngredientSearchFilter(filters.FilterSet):
     name = filters.CharFilter(
         field_name="name",
-        lookup_expr="startswith"
+        lookup_expr="istartswith"
     )
+    search = filters.CharFilter(method="apply_search")
 
     class Meta:
         model = Ingredient
-        fields = ('name',)
+        fields = ("name", "search")
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        data = self.form.cleaned_data
+        if any(data.get(field) for field in self.Meta.fields):
+            return queryset[:settings.INGREDIENT_SEARCH_LIMIT]
+        return queryset
+
+    def apply_search(self, queryset, name, value):
+        """Сначала совпадения с начала названия, затем вхождения.
+
+        На PostgreSQL к ним добавляются похожие по триграммам названия,
+        чтобы находились ингредиенты с опечатками.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+
+        rank = Case(
+            When(name__istartswith=value, then=Value(PREFIX_MATCH)),
+            When(name__icontains=value, then=Value(CONTAINS_MATCH)),
+            default=Value(FUZZY_MATCH),
+            output_field=IntegerField(),
+        )
+        condition = Q(name__icontains=value)
+        ordering = ["search_rank", "name"]
+
+        if connections[queryset.db].vendor == "postgresql":
+            from django.contrib.postgres.search import TrigramSimilarity
+
+            condition |= Q(name__trigram_similar=value)
+            queryset = queryset.annotate(
+                similarity=TrigramSimilarity("name", value)
+            )
+            ordering = ["search_rank", "-similarity", "name"]
+
+        return (
+            queryset.filter(condition)
+            .annotate(search_rank=rank)
+            .order_by(*ordering)
+        )
 
 
 class RecipeCustomFilter(filters.FilterSet):
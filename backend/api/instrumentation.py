@@ -0,0 +1,253 @@
+import abc
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from foodgram.metrics import (
+    REQUEST_DB_TIME,
+    REQUEST_LATENCY,
+    REQUEST_NON_DB_TIME,
+    REQUEST_QUERIES,
+)
+
+logger = logging.getLogger("api.queries")
+
+# Статистика запросов текущего HTTP-запроса. Контекстная переменная
+# копируется в потоки sync_to_async, поэтому ORM под ASGI тоже учитывается.
+current_stats = ContextVar("query_stats", default=None)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LISTS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+SQL_PREVIEW_LENGTH = 200
+HTTP_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL-запросов, чем разрешено."""
+
+
+def get_signature(sql):
+    """Текст запроса без значений: одинаков для всех итераций N+1."""
+    sql = LITERALS.sub("?", sql)
+    return PLACEHOLDER_LISTS.sub("(...)", sql)
+
+
+class QueryStats:
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.signatures = Counter()
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        self.signatures[get_signature(sql)] += 1
+        if self.parent is not None:
+            self.parent.add(sql, duration)
+
+    def get_duplicates(self, threshold=None):
+        """Запросы, повторившиеся не меньше threshold раз: признак N+1."""
+        threshold = threshold or settings.QUERY_DUPLICATE_THRESHOLD
+        return [
+            (signature, total)
+            for signature, total in self.signatures.most_common()
+            if total >= threshold
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, time.perf_counter() - started)
+
+
+def install(connection, **kwargs):
+    """Подключает record_query к соединению (и как приёмник сигнала
+    connection_created). Повторный вызов ничего не меняет."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def track_queries():
+    """Считает запросы внутри блока, в том числе во вложенных потоках."""
+    for connection in connections.all():
+        install(connection)
+    stats = QueryStats(parent=current_stats.get())
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Для тестов: падает, если блок выполнил больше max_queries запросов.
+
+        with query_budget(4):
+            client.get("/api/recipes/")
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(format_budget_error(
+            "блок", stats, max_queries
+        ))
+
+
+def format_budget_error(name, stats, budget):
+    message = f"{name}: {stats.count} SQL-запросов при бюджете {budget}."
+    duplicates = stats.get_duplicates()
+    if duplicates:
+        message += " Повторяются: " + "; ".join(
+            f"{total}× {signature[:SQL_PREVIEW_LENGTH]}"
+            for signature, total in duplicates
+        )
+    return message
+
+
+def get_view_budget(request):
+    """Имя представления и бюджет из его атрибута query_budgets.
+
+    Бюджеты объявляются во вьюсете словарём {действие: число запросов}.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None, None
+    view_class = getattr(match.func, "cls", None)
+    if view_class is None:
+        return match.view_name, None
+    actions = getattr(match.func, "actions", None) or {}
+    method = request.method.lower()
+    action = actions.get(method) or actions.get("get") or method
+    budgets = getattr(view_class, "query_budgets", {})
+    return f"{view_class.__name__}.{action}", budgets.get(action)
+
+
+class TrackQueriesMiddleware(abc.ABC):
+    """Основа middleware, которым нужна статистика SQL каждого запроса.
+
+    Работает и под WSGI, и под ASGI; выключенное middleware не
+    подключается вовсе. Наследники задают is_enabled() и finish().
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not self.is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with track_queries() as stats:
+            response = self.get_response(request)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with track_queries() as stats:
+            response = await self.get_response(request)
+        return self.finish(request, response, stats, started)
+
+    @abc.abstractmethod
+    def is_enabled(self):
+        """Подключать ли middleware (проверяется один раз при запуске)."""
+
+    @abc.abstractmethod
+    def finish(self, request, response, stats, started):
+        """Обрабатывает итог запроса и возвращает ответ."""
+
+
+class QueryInstrumentationMiddleware(TrackQueriesMiddleware):
+    """Число и время SQL-запросов на каждый запрос к API.
+
+    Пишет заголовок Server-Timing и строку JSON в логгер api.queries,
+    отмечает повторяющиеся запросы (N+1) и превышение бюджетов
+    представлений. С QUERY_BUDGET_STRICT превышение бюджета — ошибка.
+    Запросы из потоковых ответов, которые выполняются после выхода из
+    представления, не учитываются.
+    """
+
+    def is_enabled(self):
+        return settings.QUERY_INSTRUMENTATION
+
+    def finish(self, request, response, stats, started):
+        total = (time.perf_counter() - started) * 1000
+        sql = stats.duration * 1000
+        duplicates = stats.get_duplicates()
+        view, budget = get_view_budget(request)
+        over_budget = budget is not None and stats.count > budget
+
+        description = f"{stats.count} queries"
+        if duplicates:
+            description += f", {len(duplicates)} repeated"
+        timing = f'db;dur={sql:.2f};desc="{description}", app;dur={total:.2f}'
+        if response.has_header("Server-Timing"):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response["Server-Timing"] = timing
+
+        logger.log(
+            logging.WARNING if duplicates or over_budget else logging.INFO,
+            json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "view": view,
+                "status": response.status_code,
+                "queries": stats.count,
+                "sql_ms": round(sql, 2),
+                "total_ms": round(total, 2),
+                "budget": budget,
+                "duplicates": [
+                    {"sql": signature[:SQL_PREVIEW_LENGTH], "count": count}
+                    for signature, count in duplicates
+                ],
+            }, ensure_ascii=False),
+        )
+        if over_budget and settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(format_budget_error(view, stats,
+                                                          budget))
+        return response
+
+
+class MetricsMiddleware(TrackQueriesMiddleware):
+    """Гистограммы задержки, времени SQL и времени без SQL для /metrics."""
+
+    def is_enabled(self):
+        return settings.METRICS_ENABLED
+
+    def finish(self, request, response, stats, started):
+        total = time.perf_counter() - started
+        view = get_view_budget(request)[0] or "unmatched"
+        method = request.method if request.method in HTTP_METHODS else "other"
+        REQUEST_LATENCY.labels(
+            view, method, str(response.status_code)
+        ).observe(total)
+        REQUEST_DB_TIME.labels(view).observe(stats.duration)
+        REQUEST_NON_DB_TIME.labels(view).observe(
+            max(total - stats.duration, 0)
+        )
+        REQUEST_QUERIES.labels(view).observe(stats.count)
+        return response
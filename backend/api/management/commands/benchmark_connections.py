@@ -0,0 +1,178 @@
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import BenchmarkCommand, summarize
+from api.management.commands.benchmark_serving import (
+    HOST,
+    fetch,
+    get_free_port,
+    wait_ready,
+)
+from recipes.models import FavoriteRecipe, Recipe, ShoppingListEntry
+from users.models import User
+
+# Переменные окружения сервера для каждого режима работы с соединениями.
+MODES = {
+    "close": {"DB_CONN_MAX_AGE": "0", "DB_POOL": "false"},
+    "persistent": {"DB_CONN_MAX_AGE": "60", "DB_POOL": "false"},
+    "pool": {"DB_POOL": "true"},
+}
+ENDPOINTS = (
+    ("favorite", FavoriteRecipe),
+    ("shopping_cart", ShoppingListEntry),
+)
+EXPECTED_STATUS = {"POST": 201, "DELETE": 204}
+# Сколько рецептов-кандидатов брать на пользователя
+CANDIDATES = 200
+
+
+async def toggler(port, token, candidates, deadline, samples):
+    """Добавляет рецепт в закладки или покупки и сразу убирает его."""
+    headers = f"Authorization: Token {token}\r\n"
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        while time.perf_counter() < deadline:
+            endpoint = random.choice(ENDPOINTS)[0]
+            path = f"/api/recipes/{random.choice(candidates)}/{endpoint}/"
+            for method in ("POST", "DELETE"):
+                started = time.perf_counter()
+                try:
+                    status, keep_alive = await fetch(reader, writer, path,
+                                                     headers, method)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    status, keep_alive = None, False
+                samples.append((
+                    endpoint, method,
+                    (time.perf_counter() - started) * 1000,
+                    status == EXPECTED_STATUS[method],
+                ))
+                if not keep_alive:
+                    writer.close()
+                    reader, writer = await asyncio.open_connection(HOST,
+                                                                   port)
+    finally:
+        writer.close()
+
+
+async def run_toggles(port, identities, duration):
+    samples = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        toggler(port, token, candidates, deadline, samples)
+        for token, candidates in identities
+    ))
+    return samples
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Задержка переключателей закладок и списка покупок (POST и DELETE) "
+        "при разных режимах соединений с базой: новое соединение на каждый "
+        "запрос (close), постоянные соединения (persistent) и пул psycopg "
+        "(pool). Для каждого режима запускается gunicorn на свободном "
+        "порту; нужна база PostgreSQL."
+    )
+    benchmark_name = "connections"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument(
+            "--concurrency", type=int, default=8,
+            help="Число клиентов; у каждого свой пользователь.",
+        )
+        parser.add_argument("--duration", type=float, default=15)
+        parser.add_argument("--warmup", type=float, default=2)
+        parser.add_argument("--mode", choices=MODES, action="append")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        identities = self.get_identities(options["concurrency"])
+        results = {}
+        for mode in options["mode"] or MODES:
+            samples = self.benchmark(mode, identities, options)
+            by_action = defaultdict(list)
+            for endpoint, method, duration, ok in samples:
+                by_action[f"{endpoint}.{method.lower()}"].append(
+                    (duration, ok)
+                )
+            by_action["total"] = [(sample[2], sample[3])
+                                  for sample in samples]
+            for action, timings in by_action.items():
+                result = summarize([duration for duration, ok in timings
+                                    if ok])
+                result["errors"] = sum(not ok for _, ok in timings)
+                results[f"{mode}.{action}"] = result
+                self.stdout.write(
+                    f"{mode} {action}: p50={result.get('p50_ms')} мс, "
+                    f"p95={result.get('p95_ms')} мс, "
+                    f"p99={result.get('p99_ms')} мс, "
+                    f"ошибок: {result['errors']}"
+                )
+        self.save(
+            {
+                key: options[key] for key in (
+                    "workers", "concurrency", "duration",
+                )
+            },
+            results, options,
+        )
+
+    def get_identities(self, count):
+        """Токены пользователей и рецепты, которых нет у них ни в
+        закладках, ни в покупках: POST всегда создаёт связь."""
+        users = list(
+            User.objects.filter(is_active=True).order_by("pk")[:count]
+        )
+        if len(users) < count:
+            raise CommandError("Нужны данные: выполните load_data.")
+        recipe_ids = list(
+            Recipe.objects.order_by("?").values_list("pk", "author_id")
+            [:CANDIDATES * 4]
+        )
+        identities = []
+        for user in users:
+            taken = set()
+            for _, model in ENDPOINTS:
+                taken.update(model.objects.filter(user=user)
+                             .values_list("recipe_id", flat=True))
+            candidates = [
+                pk for pk, author in recipe_ids
+                if author != user.pk and pk not in taken
+            ][:CANDIDATES]
+            if not candidates:
+                raise CommandError("Нет рецептов для переключения.")
+            token, _ = Token.objects.get_or_create(user=user)
+            identities.append((token.key, candidates))
+        return identities
+
+    def benchmark(self, mode, identities, options):
+        port = get_free_port()
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", "foodgram.wsgi:application",
+                "--workers", str(options["workers"]),
+                "--bind", f"{HOST}:{port}",
+                "--log-level", "warning",
+            ],
+            cwd=settings.BASE_DIR,
+            env=dict(os.environ, **MODES[mode]),
+        )
+        try:
+            wait_ready(port, server)
+            if options["warmup"]:
+                asyncio.run(run_toggles(port, identities, options["warmup"]))
+            return asyncio.run(run_toggles(port, identities,
+                                           options["duration"]))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
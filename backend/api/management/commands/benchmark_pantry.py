@@ -0,0 +1,190 @@
+import random
+import time
+from itertools import accumulate
+
+from django.core.management.base import CommandError
+from django.db.models import (
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+)
+
+from api.benchmarks import BenchmarkCommand, summarize
+from recipes.models import RecipeIngredientLink
+from recipes.pantry import PantryIndex
+
+# Сколько рецептов отдаётся на странице
+PAGE_SIZE = 20
+
+
+def sql_search(ingredients, include, exclude, limit):
+    """Та же выдача через агрегацию RecipeIngredientLink в базе."""
+    have = set(ingredients) | set(include)
+    size = Subquery(
+        RecipeIngredientLink.objects.filter(recipe_id=OuterRef("recipe_id"))
+        .order_by()
+        .values("recipe_id")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    queryset = (
+        RecipeIngredientLink.objects.filter(ingredient_id__in=have)
+        .order_by()
+        .values("recipe_id")
+        .annotate(matched=Count("pk"), size=size)
+    )
+    if include:
+        queryset = queryset.annotate(
+            included=Count("pk", filter=Q(ingredient_id__in=include))
+        ).filter(included=len(set(include)))
+    if exclude:
+        queryset = queryset.exclude(recipe_id__in=(
+            RecipeIngredientLink.objects.filter(ingredient_id__in=exclude)
+            .values("recipe_id")
+        ))
+    queryset = queryset.annotate(
+        coverage=ExpressionWrapper(F("matched") * 1.0 / F("size"),
+                                   output_field=FloatField()),
+        missing=F("size") - F("matched"),
+    ).order_by("-coverage", "missing", "-recipe_id")
+    return [
+        (recipe_id, matched, size - matched)
+        for recipe_id, matched, size in queryset.values_list(
+            "recipe_id", "matched", "size"
+        )[:limit]
+    ]
+
+
+def synthetic_rows(recipes, ingredients, weights, per_recipe):
+    """Пары (рецепт, ингредиент): популярность ингредиентов по Ципфу."""
+    for recipe_id in range(1, recipes + 1):
+        size = random.randint(max(1, per_recipe - 5), per_recipe + 5)
+        chosen = set(random.choices(ingredients, cum_weights=weights,
+                                    k=size))
+        for ingredient_id in sorted(chosen):
+            yield recipe_id, ingredient_id
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Поиск «что приготовить»: обратный индекс в памяти на "
+        "синтетических данных (по умолчанию 1 000 000 рецептов) и на "
+        "данных из базы против агрегации RecipeIngredientLink в SQL."
+    )
+    benchmark_name = "pantry"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--recipes", type=int, default=1_000_000)
+        parser.add_argument("--ingredients", type=int, default=2000)
+        parser.add_argument("--per-recipe", type=int, default=9)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--skip-db", action="store_true")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        results = {}
+
+        ingredients = list(range(1, options["ingredients"] + 1))
+        weights = list(accumulate(1 / rank for rank in ingredients))
+        started = time.perf_counter()
+        index = PantryIndex(None, synthetic_rows(
+            options["recipes"], ingredients, weights, options["per_recipe"],
+        ))
+        build = time.perf_counter() - started
+        self.stdout.write(
+            f"Синтетический индекс: {len(index.recipe_ids)} рецептов, "
+            f"{sum(map(len, index.postings.values()))} связей, "
+            f"сборка (с генерацией) {build:.1f} с, "
+            f"{self.get_size(index) / 2 ** 20:.0f} МБ"
+        )
+        queries = self.get_queries(ingredients, weights, options["queries"])
+        results["index.synthetic"] = self.measure(
+            lambda query: index.search(*query)[:PAGE_SIZE], queries
+        )
+        self.stdout.write(
+            f"Масок ингредиентов в кэше: "
+            f"{index.get_bitmap.cache_info().currsize}, по "
+            f"{len(index.recipe_ids) / 8 / 2 ** 10:.0f} КБ"
+        )
+
+        if not options["skip_db"]:
+            rows = RecipeIngredientLink.objects.order_by(
+                "recipe_id"
+            ).values_list("recipe_id", "ingredient_id")
+            index = PantryIndex(None, rows.iterator(chunk_size=10000))
+            if not index.recipe_ids:
+                raise CommandError("Нужны данные: выполните load_data.")
+            ingredients = sorted(
+                index.postings, key=lambda pk: -len(index.postings[pk])
+            )
+            weights = list(accumulate(
+                1 / rank for rank in range(1, len(ingredients) + 1)
+            ))
+            queries = self.get_queries(ingredients, weights,
+                                       options["queries"])
+            for query in queries:
+                if (index.search(*query)[:PAGE_SIZE]
+                        != sql_search(*query, PAGE_SIZE)):
+                    raise CommandError(f"Выдачи расходятся: {query}")
+            results["index.db"] = self.measure(
+                lambda query: index.search(*query)[:PAGE_SIZE], queries
+            )
+            results["sql.db"] = self.measure(
+                lambda query: sql_search(*query, PAGE_SIZE), queries
+            )
+
+        for case, result in results.items():
+            self.stdout.write(
+                f"{case}: p50={result['p50_ms']} мс, "
+                f"p95={result['p95_ms']} мс, p99={result['p99_ms']} мс"
+            )
+        self.save(
+            {
+                key: options[key] for key in (
+                    "recipes", "ingredients", "per_recipe", "queries",
+                )
+            },
+            results, options,
+        )
+
+    def get_queries(self, ingredients, weights, count):
+        """Наборы продуктов: популярные ингредиенты чаще; у четверти
+        запросов есть обязательный ингредиент, у четверти — исключённый."""
+        queries = []
+        for _ in range(count):
+            have = set(random.choices(ingredients, cum_weights=weights,
+                                      k=random.randint(5, 15)))
+            include = [random.choice(sorted(have))] if (
+                random.random() < 0.25
+            ) else []
+            exclude = random.choices(ingredients, cum_weights=weights) if (
+                random.random() < 0.25
+            ) else []
+            queries.append((sorted(have), include, [
+                pk for pk in exclude if pk not in have
+            ]))
+        return queries
+
+    def measure(self, run, queries):
+        for query in queries[:10]:
+            run(query)
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return summarize(timings)
+
+    def get_size(self, index):
+        """Массивы и маски по размеру рецептов, без кэша масок."""
+        arrays = [index.recipe_ids, *index.postings.values()]
+        return (
+            sum(item.itemsize * len(item) for item in arrays)
+            + sum((mask.bit_length() + 7) // 8
+                  for mask in index.size_masks.values())
+        )
@@ -0,0 +1,90 @@
+import json
+import time
+
+from django.core.management.base import CommandError
+from django.test import Client
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+from api.benchmarks import BenchmarkCommand, get_host, summarize
+from api.renderers import FastJSONRenderer, orjson
+from api.views import RecipeManagerViewSet
+
+RENDERERS = {
+    "json": JSONRenderer,
+    "orjson": FastJSONRenderer,
+}
+
+
+def measure(run, rounds):
+    """Время (wall) и процессорное время одного вызова в миллисекундах."""
+    wall, cpu = [], []
+    for _ in range(rounds):
+        started, started_cpu = time.perf_counter(), time.process_time()
+        run()
+        cpu.append((time.process_time() - started_cpu) * 1000)
+        wall.append((time.perf_counter() - started) * 1000)
+    result = summarize(wall)
+    result["cpu_mean_ms"] = summarize(cpu)["mean_ms"]
+    return result
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Сериализация ответа в JSON: стандартный JSONRenderer против "
+        "FastJSONRenderer (orjson). Замеряются рендеринг готовой страницы "
+        "/api/recipes/?limit=100 и весь GET-запрос к ней (страница берётся "
+        "из кэша ленты, поэтому запрос в основном состоит из рендеринга)."
+    )
+    benchmark_name = "renderers"
+    regression_metrics = ("p50_ms", "cpu_mean_ms")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--limit", type=int, default=100)
+        parser.add_argument("--rounds", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("orjson не установлен.")
+        path = f"/api/recipes/?limit={options['limit']}"
+        client = Client(HTTP_HOST=get_host())
+        response = client.get(path)
+        if response.status_code != 200 or not response.data["results"]:
+            raise CommandError("Нужны данные: выполните load_data.")
+        data = response.data
+        expected = json.loads(JSONRenderer().render(data))
+        if json.loads(FastJSONRenderer().render(data)) != expected:
+            raise CommandError("FastJSONRenderer отдаёт другой JSON.")
+
+        results = {}
+        original = RecipeManagerViewSet.renderer_classes
+        try:
+            for name, renderer_class in RENDERERS.items():
+                renderer = renderer_class()
+                RecipeManagerViewSet.renderer_classes = [
+                    renderer_class, BrowsableAPIRenderer,
+                ]
+                cases = {
+                    "render": lambda: renderer.render(data),
+                    "request": lambda: client.get(path),
+                }
+                for case, run in cases.items():
+                    for _ in range(options["warmup"]):
+                        run()
+                    result = measure(run, options["rounds"])
+                    results[f"{case}.{name}"] = result
+                    self.stdout.write(
+                        f"{case} {name}: p50={result['p50_ms']} мс, "
+                        f"p95={result['p95_ms']} мс, "
+                        f"CPU={result['cpu_mean_ms']} мс"
+                    )
+        finally:
+            RecipeManagerViewSet.renderer_classes = original
+        self.stdout.write(
+            f"Размер ответа: {len(JSONRenderer().render(data))} байт."
+        )
+        self.save(
+            {key: options[key] for key in ("limit", "rounds", "warmup")},
+            results, options,
+        )
@@ -0,0 +1,315 @@
+import http.client
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import BenchmarkCommand, get_host, summarize
+from recipes.models import Ingredient, Recipe, ShoppingListEntry
+from users.models import User, UserSubscription
+
+# (сценарий, вес, что нужно пользователю: None, "auth", "cart",
+# "subscriptions")
+SCENARIOS = (
+    ("recipes_list", 30, None),
+    ("recipe_detail", 25, None),
+    ("ingredients_search", 20, None),
+    ("subscriptions", 15, "subscriptions"),
+    ("download_shopping_cart", 10, "cart"),
+)
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries')
+# Сколько пользователей с данными готовить для виртуальных клиентов
+IDENTITY_POOL_SIZE = 50
+
+
+class Identity:
+    """От чьего имени виртуальный пользователь ходит в API."""
+
+    def __init__(self, user=None, token=None, has_cart=False,
+                 has_subscriptions=False):
+        self.user = user
+        self.headers = {"Authorization": f"Token {token}"} if token else {}
+        self.features = {None}
+        if user is not None:
+            self.features.add("auth")
+        if has_cart:
+            self.features.add("cart")
+        if has_subscriptions:
+            self.features.add("subscriptions")
+
+
+class Traffic:
+    """Строит пути запросов по данным из базы."""
+
+    def __init__(self):
+        self.recipe_ids = list(
+            Recipe.objects.order_by("?").values_list("pk", flat=True)[:1000]
+        )
+        self.author_ids = list(
+            User.objects.filter(recipes_count__gt=0)
+            .values_list("pk", flat=True)[:1000]
+        )
+        self.prefixes = sorted({
+            name[:length].lower()
+            for name in Ingredient.objects.values_list("name", flat=True)
+            [:2000]
+            for length in (1, 2, 3)
+        })
+        self.pages = max(1, min(Recipe.objects.count() // 6, 50))
+        if not (self.recipe_ids and self.prefixes):
+            raise CommandError("Нужны данные: выполните load_data.")
+
+    def get_path(self, scenario, identity, rng):
+        if scenario == "recipes_list":
+            # Отфильтрованные выборки короткие: их смотрят с первой
+            # страницы, как и фронтенд.
+            if rng.random() < 0.2 and self.author_ids:
+                query = f"author={rng.choice(self.author_ids)}"
+            elif "auth" in identity.features and rng.random() < 0.2:
+                query = rng.choice(
+                    ("is_favorited=1", "is_in_shopping_cart=1")
+                )
+            else:
+                query = f"page={rng.randint(1, self.pages)}"
+            return f"/api/recipes/?{query}&limit=6"
+        if scenario == "recipe_detail":
+            return f"/api/recipes/{rng.choice(self.recipe_ids)}/"
+        if scenario == "ingredients_search":
+            return "/api/ingredients/?name=" + quote(
+                rng.choice(self.prefixes)
+            )
+        if scenario == "subscriptions":
+            return "/api/users/subscriptions/?recipes_limit=3"
+        return "/api/recipes/download_shopping_cart/"
+
+
+class InProcessTransport:
+    """Запросы через тестовый клиент Django с подсчётом SQL."""
+
+    def __init__(self):
+        self.client = Client(HTTP_HOST=get_host(),
+                             raise_request_exception=False)
+
+    def get(self, path, headers):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = self.client.get(path, headers=headers)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            response.close()
+        return response.status_code, queries
+
+    def close(self):
+        connections.close_all()
+
+
+class HTTPTransport:
+    """Запросы к запущенному серверу по keep-alive соединению."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.connection = connection_class(parts.netloc, timeout=30)
+
+    def get(self, path, headers):
+        try:
+            self.connection.request("GET", path, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # Следующий запрос откроет соединение заново.
+            self.connection.close()
+            raise
+        # Число запросов сервер сообщает, если включён QUERY_INSTRUMENTATION.
+        match = SERVER_TIMING_QUERIES.search(
+            response.getheader("Server-Timing", "")
+        )
+        return response.status, int(match.group(1)) if match else None
+
+    def close(self):
+        self.connection.close()
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Сценарный нагрузочный тест: виртуальные пользователи с "
+        "весами сценариев ходят в /api/recipes/, /api/ingredients/, "
+        "/api/users/subscriptions/ и download_shopping_cart. Без "
+        "--base-url запросы идут в процессе и считается число SQL; "
+        "с ним число SQL берётся из заголовка Server-Timing."
+    )
+    benchmark_name = "scenarios"
+    regression_metrics = ("p95_ms", "queries_mean")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--users", type=int, default=8,
+                            help="Число виртуальных пользователей.")
+        parser.add_argument("--duration", type=float, default=30)
+        parser.add_argument("--warmup", type=float, default=3)
+        parser.add_argument(
+            "--anonymous", type=float, default=0.3,
+            help="Доля анонимных виртуальных пользователей.",
+        )
+        parser.add_argument(
+            "--think-time", type=float, default=0,
+            help="Пауза между запросами, мс (равномерно от 0 до значения).",
+        )
+        parser.add_argument(
+            "--base-url",
+            help="Адрес запущенного сервера, например http://localhost. "
+                 "Сервер должен работать с той же базой.",
+        )
+        parser.add_argument("--scenario", action="append",
+                            choices=[name for name, *_ in SCENARIOS])
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        traffic = Traffic()
+        identities = self.get_identities()
+        selected = options["scenario"] or [name for name, *_ in SCENARIOS]
+        scenarios = [item for item in SCENARIOS if item[0] in selected]
+
+        if options["warmup"]:
+            self.run(traffic, identities, scenarios, options,
+                     options["warmup"])
+        samples, elapsed = self.run(traffic, identities, scenarios, options,
+                                    options["duration"])
+
+        results = {}
+        by_scenario = defaultdict(list)
+        for sample in samples:
+            by_scenario[sample[0]].append(sample)
+        for name, *_ in scenarios:
+            if by_scenario[name]:
+                results[name] = self.summarize(by_scenario[name], elapsed)
+        results["total"] = self.summarize(samples, elapsed)
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name}: {result['rps']} rps, "
+                f"p50={result.get('p50_ms')} мс, "
+                f"p95={result.get('p95_ms')} мс, "
+                f"p99={result.get('p99_ms')} мс, "
+                f"SQL/запрос: {result['queries_mean']}, "
+                f"ошибок: {result['errors']}"
+            )
+        self.save(
+            {
+                key: options[key] for key in (
+                    "users", "duration", "anonymous", "think_time",
+                    "base_url",
+                )
+            },
+            results, options,
+        )
+
+    def get_identities(self):
+        cart_users = set(
+            ShoppingListEntry.objects.values_list("user", flat=True)
+            .distinct()[:IDENTITY_POOL_SIZE]
+        )
+        followers = set(
+            UserSubscription.objects.values_list("user", flat=True)
+            .distinct()[:IDENTITY_POOL_SIZE]
+        )
+        users = User.objects.filter(
+            pk__in=cart_users | followers, is_active=True
+        )
+        identities = []
+        for user in users:
+            token, _ = Token.objects.get_or_create(user=user)
+            identities.append(Identity(
+                user, token.key, user.pk in cart_users, user.pk in followers,
+            ))
+        if not identities:
+            raise CommandError(
+                "Нет пользователей со списком покупок или подписками."
+            )
+        return identities
+
+    def run(self, traffic, identities, scenarios, options, duration):
+        samples = []
+        deadline = time.perf_counter() + duration
+        threads = [
+            threading.Thread(
+                target=self.virtual_user,
+                args=(number, traffic, identities, scenarios, options,
+                      deadline, samples),
+            )
+            for number in range(options["users"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started
+
+    def virtual_user(self, number, traffic, identities, scenarios, options,
+                     deadline, samples):
+        rng = random.Random(options["seed"] + number)
+        identity = (
+            Identity() if rng.random() < options["anonymous"]
+            else rng.choice(identities)
+        )
+        available = [
+            (name, weight) for name, weight, feature in scenarios
+            if feature in identity.features
+        ]
+        if not available:
+            return
+        names, weights = zip(*available)
+        transport = (
+            HTTPTransport(options["base_url"]) if options["base_url"]
+            else InProcessTransport()
+        )
+        try:
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(names, weights)[0]
+                path = traffic.get_path(scenario, identity, rng)
+                started = time.perf_counter()
+                try:
+                    status, queries = transport.get(path, identity.headers)
+                except (OSError, http.client.HTTPException):
+                    status, queries = None, None
+                samples.append((
+                    scenario,
+                    (time.perf_counter() - started) * 1000,
+                    status,
+                    queries,
+                ))
+                if options["think_time"]:
+                    time.sleep(rng.uniform(0, options["think_time"]) / 1000)
+        finally:
+            transport.close()
+
+    def summarize(self, samples, elapsed):
+        ok = [sample for sample in samples
+              if sample[2] is not None and sample[2] < 400]
+        queries = [sample[3] for sample in ok if sample[3] is not None]
+        result = summarize([sample[1] for sample in ok])
+        result.update(
+            rps=round(len(ok) / elapsed, 1),
+            errors=len(samples) - len(ok),
+            queries_mean=round(sum(queries) / len(queries), 2)
+            if queries else None,
+            queries_max=max(queries) if queries else None,
+        )
+        return result
@@ -0,0 +1,195 @@
+import base64
+import io
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count, Prefetch, Value
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.benchmarks import BenchmarkCommand, get_host, summarize
+from api.serializers import (
+    IngredientSerializer,
+    RecipeDetailSerializer,
+    RecipeShortSerializer,
+    RecipeWriteSerializer,
+    SubscriptionOutputSerializer,
+    UserSerializer,
+)
+from api.views import annotate_for_reading
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+RECIPES_LIMIT = 3
+
+
+def make_request(user):
+    request = Request(APIRequestFactory().get(
+        "/api/", {"recipes_limit": RECIPES_LIMIT}, HTTP_HOST=get_host()
+    ))
+    request.user = user
+    return request
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "orange").save(buffer, "PNG")
+    return ("data:image/png;base64,"
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Микробенчмарки сериализаторов API на данных из базы: время "
+        "сериализации (объекты выбираются заранее) и число запросов, "
+        "которые сериализатор делает сам. Результаты сохраняются в JSON."
+    )
+    benchmark_name = "serializers"
+    regression_metrics = ("p50_ms", "queries")
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--objects", type=int, default=100,
+                            help="Объектов в одном вызове сериализатора.")
+        parser.add_argument("--rounds", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--case", action="append",
+                            help="Запустить только указанные случаи.")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        cases = self.get_cases(options["objects"])
+        selected = options["case"] or list(cases)
+        unknown = sorted(set(selected) - set(cases))
+        if unknown:
+            raise CommandError(
+                f"Неизвестные случаи: {', '.join(unknown)}. "
+                f"Доступны: {', '.join(cases)}."
+            )
+
+        results = {}
+        for name in selected:
+            results[name] = self.measure(cases[name](), options)
+            result = results[name]
+            self.stdout.write(
+                f"{name}: median={result['p50_ms']} мс, "
+                f"stddev={result['stddev_ms']} мс, "
+                f"{result['ops']} оп/с, запросов: {result['queries']} "
+                f"({result['objects']} объектов)"
+            )
+        self.save(
+            {key: options[key] for key in ("objects", "rounds", "warmup")},
+            results, options,
+        )
+
+    def measure(self, case, options):
+        run, objects = case
+        for _ in range(options["warmup"]):
+            run()
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        timings = []
+        for _ in range(options["rounds"]):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        result = summarize(timings)
+        result.update(
+            stddev_ms=round(statistics.pstdev(timings), 3),
+            ops=round(1000 / result["mean_ms"], 1),
+            queries=len(queries),
+            objects=objects,
+        )
+        return result
+
+    def get_cases(self, size):
+        """Случаи: функции, которые готовят данные и возвращают
+        (вызов сериализатора, число объектов)."""
+        follower = (
+            User.objects.annotate(total=Count("follower"))
+            .order_by("-total").first()
+        )
+        if follower is None or not Recipe.objects.exists():
+            raise CommandError("Нужны данные: выполните load_data.")
+
+        def serialize(serializer_class, objects, user):
+            objects = list(objects)
+            context = {"request": make_request(user)}
+            return (
+                lambda: serializer_class(objects, many=True,
+                                         context=context).data,
+                len(objects),
+            )
+
+        def recipes(user):
+            queryset = annotate_for_reading(Recipe.objects.all(), user)
+            return queryset.order_by("-pub_date")[:size]
+
+        def subscriptions():
+            return (
+                User.objects.filter(following__user=follower)
+                .annotate(is_subscribed=Value(True))
+                .prefetch_related(Prefetch(
+                    "recipes", queryset=Recipe.objects.order_by("-pub_date")
+                ))
+                .order_by("username")[:size]
+            )
+
+        def write():
+            ingredient_ids = list(
+                Ingredient.objects.values_list("pk", flat=True)[:size]
+            )
+            data = {
+                "name": "Рецепт",
+                "text": "Описание",
+                "cooking_time": 10,
+                "image": make_image(),
+                "ingredients": [
+                    {"id": pk, "amount": random.randint(1, 100)}
+                    for pk in random.sample(ingredient_ids,
+                                            min(10, len(ingredient_ids)))
+                ],
+            }
+            context = {"request": make_request(follower)}
+
+            def run():
+                serializer = RecipeWriteSerializer(data=data,
+                                                   context=context)
+                serializer.is_valid(raise_exception=True)
+            return run, 1
+
+        return {
+            "ingredient": lambda: serialize(
+                IngredientSerializer, Ingredient.objects.all()[:size],
+                AnonymousUser(),
+            ),
+            "user": lambda: serialize(
+                UserSerializer,
+                User.objects.annotate(
+                    is_subscribed=Value(False)
+                )[:size],
+                AnonymousUser(),
+            ),
+            "recipe_short": lambda: serialize(
+                RecipeShortSerializer,
+                Recipe.objects.order_by("-pub_date")[:size],
+                AnonymousUser(),
+            ),
+            "recipe_detail_anonymous": lambda: serialize(
+                RecipeDetailSerializer, recipes(AnonymousUser()),
+                AnonymousUser(),
+            ),
+            "recipe_detail_authenticated": lambda: serialize(
+                RecipeDetailSerializer, recipes(follower), follower,
+            ),
+            "subscription": lambda: serialize(
+                SubscriptionOutputSerializer, subscriptions(), follower,
+            ),
+            "recipe_write_validation": write,
+        }
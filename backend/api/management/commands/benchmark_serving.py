@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+MODES = {
+    "sync": ("foodgram.wsgi:application", "sync", "false"),
+    "async": (
+        "foodgram.asgi:application", "uvicorn_worker.UvicornWorker", "true"
+    ),
+}
+HOST = "127.0.0.1"
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def fetch(reader, writer, path, headers, method="GET"):
+    """Один запрос без тела; возвращает код ответа и можно ли
+    переиспользовать сокет."""
+    request = f"{method} {path} HTTP/1.1\r\nHost: {HOST}\r\n{headers}\r\n"
+    writer.write(request.encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    length = 0
+    keep_alive = True
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        name = name.lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection":
+            keep_alive = value.strip().lower() != "close"
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+def wait_ready(port, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise CommandError("Сервер завершился при запуске.")
+        try:
+            with socket.create_connection((HOST, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError("Сервер не запустился.")
+
+
+async def client(port, paths, headers, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        while time.perf_counter() < deadline:
+            path = random.choice(paths)
+            started = time.perf_counter()
+            try:
+                status, keep_alive = await fetch(reader, writer, path,
+                                                 headers)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                errors.append("connection")
+                keep_alive = False
+            else:
+                if status >= 400:
+                    errors.append(status)
+                else:
+                    latencies.append(time.perf_counter() - started)
+            if not keep_alive:
+                # Sync-воркеры gunicorn закрывают соединение после ответа.
+                writer.close()
+                reader, writer = await asyncio.open_connection(HOST, port)
+    finally:
+        writer.close()
+
+
+async def run_load(port, paths, headers, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        client(port, paths, headers, deadline, latencies, errors)
+        for _ in range(concurrency)
+    ))
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест горячих GET-эндпоинтов: gunicorn с sync-воркерами "
+        "(WSGI) против воркеров uvicorn (ASGI, ASYNC_READ_API) при равном "
+        "числе воркеров. Серверы запускаются на свободных портах."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=15)
+        parser.add_argument("--warmup", type=float, default=2)
+        parser.add_argument("--mode", choices=MODES, action="append")
+        parser.add_argument(
+            "--token", help="Токен пользователя для авторизованных запросов."
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        paths = self.get_paths()
+        headers = ""
+        if options["token"]:
+            headers = f"Authorization: Token {options['token']}\r\n"
+        for mode in options["mode"] or MODES:
+            result = self.benchmark(mode, paths, headers, options)
+            self.stdout.write(json.dumps(result, ensure_ascii=False))
+
+    def get_paths(self):
+        recipe_ids = list(Recipe.objects.values_list("pk", flat=True)[:50])
+        user_ids = list(User.objects.values_list("pk", flat=True)[:50])
+        names = list(Ingredient.objects.values_list("name", flat=True)[:50])
+        if not (recipe_ids and user_ids and names):
+            raise CommandError("Нужны данные: выполните load_data.")
+        paths = ["/api/recipes/", "/api/recipes/?page=2",
+                 "/api/recipes/?limit=12"]
+        paths += [f"/api/recipes/{pk}/" for pk in recipe_ids]
+        paths += [f"/api/users/{pk}/" for pk in user_ids]
+        paths += [
+            "/api/ingredients/?name="
+            + "".join(f"%{byte:02X}" for byte in name[:2].encode())
+            for name in names
+        ]
+        return paths
+
+    def benchmark(self, mode, paths, headers, options):
+        app, worker_class, async_api = MODES[mode]
+        port = get_free_port()
+        env = dict(os.environ, ASYNC_READ_API=async_api)
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", app,
+                "--worker-class", worker_class,
+                "--workers", str(options["workers"]),
+                "--bind", f"{HOST}:{port}",
+                "--log-level", "warning",
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        try:
+            wait_ready(port, server)
+            asyncio.run(run_load(port, paths, headers,
+                                 options["concurrency"], options["warmup"]))
+            latencies, errors = asyncio.run(run_load(
+                port, paths, headers,
+                options["concurrency"], options["duration"],
+            ))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        return {
+            "mode": mode,
+            "workers": options["workers"],
+            "concurrency": options["concurrency"],
+            "requests": len(latencies),
+            "errors": len(errors),
+            "rps": round(len(latencies) / options["duration"], 1),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2)
+            if latencies else None,
+            **{
+                f"p{int(share * 100)}_ms": round(
+                    percentile(latencies, share) * 1000, 2
+                ) if latencies else None
+                for share in (0.5, 0.95, 0.99)
+            },
+        }
@@ -0,0 +1,116 @@
+import base64
+import gc
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework.parsers import JSONParser
+
+from api.fields import ImageUploadField
+from api.parsers import StreamingJSONParser
+
+MODES = ("legacy", "streaming")
+
+
+def make_payload(size_mb):
+    """JSON тела запроса с PNG из шума примерно заданного размера."""
+    side = int((size_mb * 1024 * 1024 / 3) ** 0.5)
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=1)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    body = json.dumps({"avatar": f"data:image/png;base64,{encoded}"})
+    return body.encode(), len(buffer.getvalue())
+
+
+def get_rss():
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class RssSampler(threading.Thread):
+    """Следит за текущим RSS процесса и запоминает максимум."""
+
+    def __init__(self, interval=0.002):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = get_rss()
+        self.finished = threading.Event()
+
+    def run(self):
+        while not self.finished.wait(self.interval):
+            self.peak = max(self.peak, get_rss())
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+        return self.peak
+
+
+def upload(mode, body):
+    if mode == "legacy":
+        parser, field = JSONParser(), Base64ImageField()
+    else:
+        parser, field = StreamingJSONParser(), ImageUploadField()
+    data = parser.parse(io.BytesIO(body), parser_context={})
+    result = field.to_internal_value(data["avatar"])
+    result.close()
+
+
+def measure(mode, size_mb, concurrency, rounds):
+    """Выполняется в отдельном процессе, чтобы пик RSS был своим."""
+    django.setup()
+    body, image_size = make_payload(size_mb)
+    gc.collect()
+    with ThreadPoolExecutor(concurrency) as pool:
+        # Прогрев: запуск потоков не должен попасть в замер.
+        list(pool.map(lambda _: None, range(concurrency)))
+        baseline = get_rss()
+        sampler = RssSampler()
+        sampler.start()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            list(pool.map(lambda _: upload(mode, body), range(concurrency)))
+        elapsed = time.perf_counter() - started
+        peak = sampler.stop()
+    return {
+        "mode": mode,
+        "image_mb": round(image_size / 1024 / 1024, 1),
+        "body_mb": round(len(body) / 1024 / 1024, 1),
+        "concurrency": concurrency,
+        "peak_rss_growth_mb": round((peak - baseline) / 1024 / 1024, 1),
+        "per_upload_ms": round(
+            elapsed * 1000 / (rounds * concurrency), 1
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пиковую память (RSS) при приёме base64-изображений "
+        "обычным JSONParser и StreamingJSONParser при параллельных загрузках."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=float, default=8)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--rounds", type=int, default=2)
+        parser.add_argument("--mode", choices=MODES, action="append")
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context("spawn")
+        for mode in options["mode"] or MODES:
+            with context.Pool(1) as pool:
+                result = pool.apply(measure, (
+                    mode, options["size_mb"],
+                    options["concurrency"], options["rounds"],
+                ))
+            self.stdout.write(json.dumps(result, ensure_ascii=False))
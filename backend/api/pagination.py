@@ -0,0 +1,205 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import cached_property
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+APPROXIMATE_COUNT = "approximate"
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса PostgreSQL.
+
+    Небольшие выборки и остальные СУБД считаются точным COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        rows = int(plan[0]["Plan"]["Plan Rows"])
+        if rows >= settings.APPROXIMATE_COUNT_THRESHOLD:
+            return rows
+    return queryset.count()
+
+
+class ApproximateCountPaginator(DjangoPaginator):
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class RankingPaginator(PageNumberPagination):
+    """Страницы готового ранжированного списка (не QuerySet)."""
+
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+
+class CustomPaginator(PageNumberPagination):
+    """Постраничная пагинация с ?limit= и двумя необязательными режимами.
+
+    ?cursor= включает keyset-пагинацию по полям сортировки и pk: страница
+    выбирается условием WHERE, без OFFSET и COUNT(*).
+    ?count=approximate заменяет точный COUNT(*) оценкой планировщика.
+    """
+
+    page_size_query_param = "limit"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Неверный курсор."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.approximate = (
+            request.query_params.get(self.count_query_param)
+            == APPROXIMATE_COUNT
+        )
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if self.cursor_mode:
+            return self.paginate_by_cursor(queryset, request)
+        if self.approximate:
+            self.django_paginator_class = ApproximateCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        response = {}
+        if self.approximate:
+            response["count"] = self.count
+        response.update(
+            next=self.get_cursor_link(self.next_position, reverse=False),
+            previous=self.get_cursor_link(self.previous_position,
+                                          reverse=True),
+            results=data,
+        )
+        return Response(response)
+
+    def get_keyset_ordering(self, queryset):
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if not all(isinstance(field, str) and "__" not in field
+                   for field in ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if not ordering or ordering[-1].lstrip("-") not in ("pk", "id"):
+            direction = "-" if ordering and ordering[-1][0] == "-" else ""
+            ordering.append(f"{direction}pk")
+        return ordering
+
+    def get_model_field(self, model, name):
+        if name == "pk":
+            return model._meta.pk
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise NotFound(self.invalid_cursor_message)
+
+    def decode_cursor(self, request, queryset, ordering):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(token.encode()))
+            values = payload["v"]
+            if len(values) != len(ordering):
+                raise ValueError
+            position = [
+                self.get_model_field(
+                    queryset.model, field.lstrip("-")
+                ).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(payload.get("r"))
+
+    def encode_cursor(self, position, reverse):
+        payload = {"v": [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in position
+        ]}
+        if reverse:
+            payload["r"] = 1
+        return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def build_keyset_filter(self, ordering, position):
+        """(a, b) после (x, y): a > x OR (a = x AND b > y) с учётом знака.
+
+        Нестрогое условие на первое поле позволяет базе начать просмотр
+        индекса сразу с нужного места.
+        """
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            step = Q(**{f"{name}__{lookup}": position[index]})
+            for previous, value in zip(ordering[:index], position):
+                step &= Q(**{previous.lstrip("-"): value})
+            condition |= step
+        first = ordering[0]
+        lookup = "lte" if first.startswith("-") else "gte"
+        return Q(**{f"{first.lstrip('-')}__{lookup}": position[0]}) & condition
+
+    def paginate_by_cursor(self, queryset, request):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        ordering = self.get_keyset_ordering(queryset)
+        position, reverse = self.decode_cursor(request, queryset, ordering)
+        if self.approximate:
+            self.count = estimate_count(queryset)
+
+        query_ordering = ordering
+        if reverse:
+            query_ordering = [
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in ordering
+            ]
+        queryset = queryset.order_by(*query_ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self.build_keyset_filter(query_ordering, position)
+            )
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        def row_position(row):
+            return [getattr(row, field.lstrip("-")) for field in ordering]
+
+        has_next = has_more if not reverse else position is not None
+        has_previous = position is not None if not reverse else has_more
+        self.next_position = (
+            row_position(rows[-1]) if rows and has_next else None
+        )
+        self.previous_position = (
+            row_position(rows[0]) if rows and has_previous else None
+        )
+        return rows
+
+    def get_cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(position, reverse),
+        )
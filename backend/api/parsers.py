@@ -0,0 +1,234 @@
+import binascii
+import re
+import secrets
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils.datastructures import MultiValueDict
+from rest_framework import parsers, status
+from rest_framework.exceptions import APIException, ParseError
+
+from .renderers import loads
+
+READ_CHUNK_SIZE = 64 * 1024
+# Строки короче этого предела разбираются как обычно, без временных файлов.
+INLINE_STRING_LIMIT = 1024
+DATA_URI = re.compile(rb"data:([\w.+-]+/[\w.+-]+);base64,")
+STRING_SPECIALS = re.compile(rb'["\\]')
+BASE64_ESCAPES = {b"/": b"/", b"n": b"", b"r": b""}
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Слишком большой запрос."
+    default_code = "request_too_large"
+
+
+def get_image_size_message():
+    megabytes = settings.MAX_IMAGE_UPLOAD_SIZE / (1024 * 1024)
+    return f"Размер изображения не должен превышать {megabytes:g} МБ."
+
+
+def check_content_length(request, image_size):
+    """Отклоняет запрос по заголовку Content-Length ещё до чтения тела."""
+    try:
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    limit = image_size + (settings.DATA_UPLOAD_MAX_MEMORY_SIZE or 0)
+    if length > limit:
+        raise RequestTooLarge(get_image_size_message())
+
+
+class Base64Upload:
+    """Декодирует base64 по частям во временный файл на диске."""
+
+    def __init__(self, content_type):
+        self.file = TemporaryUploadedFile(
+            name="upload", content_type=content_type, size=0, charset=None
+        )
+        self.pending = b""
+        self.escape = False
+        self.size = 0
+
+    def write(self, data):
+        if self.escape:
+            data = b"\\" + data
+            self.escape = False
+        if b"\\" in data:
+            data = self.unescape(data)
+        data = self.pending + data
+        usable = len(data) - len(data) % 4
+        self.pending = data[usable:]
+        if usable:
+            self.decode(data[:usable])
+
+    def unescape(self, data):
+        parts = data.split(b"\\")
+        result = [parts[0]]
+        for part in parts[1:]:
+            if not part:
+                # Обратная косая черта пришла последним байтом блока.
+                self.escape = True
+                continue
+            if part[:1] not in BASE64_ESCAPES:
+                raise ParseError("Некорректная строка base64.")
+            result.append(BASE64_ESCAPES[part[:1]] + part[1:])
+        return b"".join(result)
+
+    def decode(self, data):
+        try:
+            decoded = binascii.a2b_base64(data)
+        except binascii.Error:
+            raise ParseError("Некорректная строка base64.")
+        self.size += len(decoded)
+        if self.size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            self.file.close()
+            raise RequestTooLarge(get_image_size_message())
+        self.file.write(decoded)
+
+    def close(self):
+        if self.pending:
+            self.decode(self.pending)
+        self.file.size = self.size
+        self.file.seek(0)
+        return self.file
+
+
+class StreamingJSONParser(parsers.JSONParser):
+    """JSON-парсер, не собирающий изображения в памяти целиком.
+
+    Длинные строки data:<mime>;base64,... декодируются по мере чтения
+    тела во временные файлы; в JSON на их месте остаётся маркер, который
+    после разбора заменяется объектом файла. Размер каждого
+    изображения ограничен MAX_IMAGE_UPLOAD_SIZE, остальной JSON —
+    DATA_UPLOAD_MAX_MEMORY_SIZE.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        if "request" in parser_context:
+            check_content_length(
+                parser_context["request"],
+                settings.MAX_IMAGE_UPLOAD_SIZE * 4 // 3,
+            )
+        if stream is None:
+            raise ParseError("JSON parse error - empty body")
+        uploads = {}
+        try:
+            text = self.split_uploads(stream, uploads)
+            data = loads(text)
+        except Exception as error:
+            for upload in uploads.values():
+                upload.close()
+            if isinstance(error, ValueError):
+                raise ParseError(f"JSON parse error - {error}")
+            raise
+        if not uploads:
+            return data
+        if "request" in parser_context:
+            # Как и для multipart, HttpRequest.close() удалит временные
+            # файлы после отправки ответа.
+            parser_context["request"]._request._files = MultiValueDict(
+                {key: [upload] for key, upload in uploads.items()}
+            )
+        return self.replace_markers(data, uploads)
+
+    def split_uploads(self, stream, uploads):
+        """Возвращает JSON без изображений, складывая файлы в uploads."""
+        marker = secrets.token_hex(8)
+        limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        text = bytearray()
+        upload = None
+        in_string = escape = checked = False
+        string_start = 0
+
+        try:
+            while chunk := stream.read(READ_CHUNK_SIZE):
+                position = 0
+                while position < len(chunk):
+                    if upload is not None:
+                        end = chunk.find(b'"', position)
+                        if end == -1:
+                            upload.write(chunk[position:])
+                            break
+                        upload.write(chunk[position:end])
+                        key = f"\\u0000{marker}:{len(uploads)}"
+                        uploads[key.replace("\\u0000", "\0")] = upload.close()
+                        text += key.encode() + b'"'
+                        upload = None
+                        in_string = False
+                        position = end + 1
+                    elif escape:
+                        text += chunk[position:position + 1]
+                        escape = False
+                        position += 1
+                    elif in_string:
+                        match = STRING_SPECIALS.search(chunk, position)
+                        end = match.start() if match else len(chunk)
+                        text += chunk[position:end]
+                        position = end
+                        if match and match.group() == b'"':
+                            text += b'"'
+                            in_string = False
+                            position += 1
+                        elif match:
+                            text += b"\\"
+                            escape = True
+                            position += 1
+                        if (
+                            in_string and not checked
+                            and len(text) - string_start > INLINE_STRING_LIMIT
+                        ):
+                            checked = True
+                            header = DATA_URI.match(text, string_start)
+                            if header:
+                                upload = Base64Upload(header.group(1).decode())
+                                body = bytes(text[header.end():])
+                                del text[string_start:]
+                                upload.write(body)
+                                escape = False
+                    else:
+                        end = chunk.find(b'"', position)
+                        if end == -1:
+                            text += chunk[position:]
+                            break
+                        text += chunk[position:end + 1]
+                        in_string, checked = True, False
+                        string_start = len(text)
+                        position = end + 1
+                if limit is not None and len(text) > limit:
+                    raise RequestTooLarge()
+        except Exception:
+            if upload is not None:
+                upload.file.close()
+            raise
+
+        if upload is not None:
+            upload.file.close()
+        if upload is not None or in_string:
+            raise ParseError("JSON parse error - unexpected end of body")
+        return bytes(text)
+
+    def replace_markers(self, data, uploads):
+        if isinstance(data, dict):
+            return {
+                key: self.replace_markers(value, uploads)
+                for key, value in data.items()
+            }
+        if isinstance(data, list):
+            return [self.replace_markers(value, uploads) for value in data]
+        if isinstance(data, str):
+            return uploads.get(data, data)
+        return data
+
+
+class LimitedMultiPartParser(parsers.MultiPartParser):
+    """multipart/form-data с той же ранней проверкой размера."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        if "request" in parser_context:
+            check_content_length(parser_context["request"],
+                                 settings.MAX_IMAGE_UPLOAD_SIZE)
+        return super().parse(stream, media_type, parser_context)
@@ -0,0 +1,64 @@
+import json
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# U+2028 и U+2029 допустимы в JSON, но не в JavaScript; DRF их экранирует.
+LINE_SEPARATORS = (
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+_encoder = encoders.JSONEncoder()
+
+
+def dumps(data):
+    """Компактный JSON в байтах, как у JSONRenderer, но через orjson.
+
+    Что orjson не умеет сам (Decimal, ленивые строки переводов,
+    QuerySet), и даты — чтобы формат совпадал с DRF, — отдаются
+    кодировщику DRF. Без orjson работает стандартный json.
+    """
+    if orjson is None:
+        content = json.dumps(
+            data, cls=encoders.JSONEncoder, ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+    else:
+        content = orjson.dumps(
+            data, default=_encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+    for raw, escaped in LINE_SEPARATORS:
+        if raw in content:
+            content = content.replace(raw, escaped)
+    return content
+
+
+def loads(content):
+    """Разбор JSON из байтов (UTF-8)."""
+    if orjson is None:
+        return json.loads(content.decode())
+    return orjson.loads(content)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer на orjson.
+
+    Ответы с отступами (Accept: application/json; indent=4) нужны только
+    для отладки и собираются обычным JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return dumps(data)
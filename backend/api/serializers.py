@@ -1,9 +1,10 @@
+from django.conf import settings
 from django.db import transaction
-from django.http import Http404
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from recipes.counters import change_counter
 from recipes.models import (
     MAX_COOKING_TIME,
     MAX_INGREDIENT_AMOUNT,
@@ -13,7 +14,11 @@ from recipes.models import (
     Recipe,
     RecipeIngredientLink,
 )
-from users.models import User, UserSubscription
+from recipes.pantry import invalidate_pantry
+from recipes.similar import refresh_similar
+from users.models import User
+
+from .fields import ImageUploadField, RenditionImageField, RenditionsField
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -25,17 +30,19 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class UserSerializer(DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
-    avatar = serializers.ImageField(read_only=True)
+    avatar = RenditionImageField("thumbnail")
 
     class Meta(DjoserUserSerializer.Meta):
         model = User
         fields = DjoserUserSerializer.Meta.fields + ("is_subscribed", "avatar")
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         if not request or not request.user.is_authenticated:
             return False
-        return request.user.following.filter(author=obj).exists()
+        return request.user.follower.filter(author=obj).exists()
 
 
 class RecipeIngredientOutputSerializer(serializers.ModelSerializer):
@@ -50,7 +57,9 @@ class RecipeIngredientOutputSerializer(serializers.ModelSerializer):
 
 
 class IngredientInputSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    # Существование проверяет RecipeWriteSerializer одним запросом на
+    # весь список, а не по запросу на каждый ингредиент.
+    id = serializers.IntegerField(min_value=1)
     amount = serializers.IntegerField(
         min_value=MIN_INGREDIENT_AMOUNT,
         max_value=MAX_INGREDIENT_AMOUNT,
@@ -66,7 +75,8 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientOutputSerializer(
         many=True, read_only=True, source="recipe_ingredients"
     )
-    image = Base64ImageField()
+    image = RenditionImageField("medium")
+    image_renditions = RenditionsField(source="image")
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -80,27 +90,31 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_renditions",
             "text",
             "cooking_time",
         )
 
     def get_is_favorited(self, obj):
-        user = self.context["request"].user
-        if not user.is_authenticated:
-            return False
-        return obj.favorited_by.filter(user=user).exists()
+        return self._get_user_flag(obj, "is_favorited", "favorited_by")
 
     def get_is_in_shopping_cart(self, obj):
+        return self._get_user_flag(obj, "is_in_shopping_cart",
+                                   "in_shopping_cart_of")
+
+    def _get_user_flag(self, obj, annotation, related_name):
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
         user = self.context["request"].user
         if not user.is_authenticated:
             return False
-        return obj.in_shopping_cart_of.filter(user=user).exists()
+        return getattr(obj, related_name).filter(user=user).exists()
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = IngredientInputSerializer(many=True)
-    image = Base64ImageField(required=True)
+    image = ImageUploadField(required=True)
     cooking_time = serializers.IntegerField(
         min_value=MIN_COOKING_TIME,
         max_value=MAX_COOKING_TIME,
@@ -123,6 +137,22 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("id", "author")
 
+    def validate_ingredients(self, value):
+        found = Ingredient.objects.in_bulk([item["id"] for item in value])
+        message = serializers.PrimaryKeyRelatedField.default_error_messages[
+            "does_not_exist"
+        ]
+        errors = [
+            {} if item["id"] in found
+            else {"id": [str(message).format(pk_value=item["id"])]}
+            for item in value
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        for item in value:
+            item["ingredient"] = found[item["id"]]
+        return value
+
     def validate(self, data):
         ingredients = data.get("ingredients")
 
@@ -130,7 +160,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {"ingredients": "Нужно указать хотя бы один ингредиент."}
             )
-        ingredient_ids = [item["id"].id for item in ingredients]
+        ingredient_ids = [item["id"] for item in ingredients]
         if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 {"ingredients": "Ингредиенты не должны повторяться."}
@@ -148,13 +178,46 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             [
                 RecipeIngredientLink(
                     recipe=recipe,
-                    ingredient=item["id"],
+                    ingredient=item["ingredient"],
                     amount=item["amount"],
                 )
                 for item in ingredients_data
             ]
         )
 
+    def update_ingredients(self, recipe, ingredients_data):
+        """Меняет только разницу: одно удаление, одна вставка и один
+        bulk_update, сколько бы ингредиентов ни было в рецепте.
+
+        Возвращает True, если изменился сам состав (не только граммовки).
+        """
+        existing = {
+            link.ingredient_id: link
+            for link in RecipeIngredientLink.objects.filter(recipe=recipe)
+        }
+        created, changed = [], []
+        for item in ingredients_data:
+            link = existing.pop(item["ingredient"].pk, None)
+            if link is None:
+                created.append(RecipeIngredientLink(
+                    recipe=recipe,
+                    ingredient=item["ingredient"],
+                    amount=item["amount"],
+                ))
+            elif link.amount != item["amount"]:
+                link.amount = item["amount"]
+                changed.append(link)
+
+        if existing:
+            RecipeIngredientLink.objects.filter(
+                pk__in=[link.pk for link in existing.values()]
+            ).delete()
+        if created:
+            RecipeIngredientLink.objects.bulk_create(created)
+        if changed:
+            RecipeIngredientLink.objects.bulk_update(changed, ["amount"])
+        return bool(existing or created)
+
     @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop("ingredients")
@@ -163,36 +226,43 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         validated_data["author"] = self.context["request"].user
         recipe = Recipe.objects.create(**validated_data, image=image)
         self.create_ingredients(recipe, ingredients_data)
+        change_counter(User, recipe.author_id, "recipes_count", 1)
+        refresh_similar(recipe.pk)
+        invalidate_pantry()
 
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop("ingredients", None)
-        image = validated_data.pop("image", None)
-
-        if ingredients_data:
-            instance.ingredients.clear()
-            self.create_ingredients(instance, ingredients_data)
-
-        if image is not None:
-            instance.image = image
-            instance.save(update_fields=["image"])
-        else:
+        if validated_data.get("image") is None:
             raise serializers.ValidationError(
                 {"image": "Поле 'image' обязательно для создания."}
             )
+        ingredients_data = validated_data.pop("ingredients", None)
 
-        return super().update(instance, validated_data)
+        # Картинка сохраняется вместе с остальными полями одним UPDATE.
+        instance = super().update(instance, validated_data)
+        if ingredients_data and self.update_ingredients(instance,
+                                                        ingredients_data):
+            refresh_similar(instance.pk)
+            invalidate_pantry()
+        return instance
 
     def to_representation(self, instance):
+        # Ингредиенты с названиями одним запросом, а не по одному на связь.
+        prefetch_related_objects([instance], Prefetch(
+            "recipe_ingredients",
+            queryset=RecipeIngredientLink.objects.select_related(
+                "ingredient"
+            ),
+        ))
         return RecipeDetailSerializer(
             instance, context=self.context
         ).data
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = RenditionImageField("thumbnail")
 
     class Meta:
         model = Recipe
@@ -200,73 +270,116 @@ class RecipeShortSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class PantryRecipeSerializer(RecipeShortSerializer):
+    matched = serializers.IntegerField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+    coverage = serializers.SerializerMethodField()
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + ("matched", "missing",
+                                                      "coverage")
+        read_only_fields = fields
+
+    def get_coverage(self, obj):
+        return round(obj.matched / (obj.matched + obj.missing), 3)
+
+
+class PantrySearchSerializer(serializers.Serializer):
+    """Параметры поиска «что приготовить»: имеющиеся ингредиенты,
+    обязательные и исключённые."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.PANTRY_MAX_INGREDIENTS,
+        default=list,
+    )
+    include = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.PANTRY_MAX_INGREDIENTS,
+        default=list,
+    )
+    exclude = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.PANTRY_MAX_INGREDIENTS,
+        default=list,
+    )
+
+    def to_internal_value(self, data):
+        # ?ingredients=1,2&ingredients=3 — и через запятую, и повтором.
+        if hasattr(data, "getlist"):
+            data = {
+                name: [
+                    part for value in data.getlist(name)
+                    for part in value.split(",") if part
+                ]
+                for name in self.fields if name in data
+            }
+        return super().to_internal_value(data)
+
+    def validate(self, data):
+        if not data["ingredients"] and not data["include"]:
+            raise serializers.ValidationError({
+                "errors": "Укажите хотя бы один ингредиент."
+            })
+        return data
+
+
 class SubscriptionOutputSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ("recipes",
                                                "recipes_count")
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
-        limit = self.context["request"].query_params.get("recipes_limit")
         recipes = obj.recipes.all()
-
-        if limit:
-            try:
-                recipes = recipes[: int(limit)]
-            except (ValueError, TypeError):
-                pass
+        limit = get_recipes_limit(self.context["request"])
+        if limit is not None:
+            recipes = recipes[:limit]
 
         return RecipeShortSerializer(recipes, many=True,
                                      context=self.context).data
 
 
+def get_recipes_limit(request):
+    """Возвращает корректный recipes_limit из запроса или None."""
+    try:
+        limit = int(request.query_params.get("recipes_limit"))
+    except (ValueError, TypeError):
+        return None
+    return limit if limit >= 0 else None
+
+
 class AvatarUpdateSerializer(serializers.Serializer):
-    avatar = Base64ImageField(required=True)
+    avatar = ImageUploadField(required=True)
 
 
 class AvatarResponseSerializer(serializers.Serializer):
     avatar = serializers.ImageField(read_only=True)
 
 
-class SubscriptionSerializer(serializers.Serializer):
-    author_id = serializers.IntegerField(write_only=True)
+class RelationBatchSerializer(serializers.Serializer):
+    """Список идентификаторов для пакетных операций или all для
+    удаления всего сразу."""
 
-    def validate_author_id(self, value):
-        try:
-            author = User.objects.get(id=value)
-        except User.DoesNotExist:
-            raise Http404({
-                "author_id": "Пользователь с таким ID не существует."
-            })
-        return author
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RELATION_BATCH_LIMIT,
+        required=False,
+    )
+    all = serializers.BooleanField(default=False)
 
     def validate(self, data):
-        user = self.context["request"].user
-        author = data.get("author_id")
-        if not author:
+        if data["all"] == ("ids" in data):
             raise serializers.ValidationError({
-                "author_id": "ID пользователя не указан."
+                "errors": "Укажите либо список ids, либо all."
             })
-        if user == author:
+        if data["all"] and self.context["request"].method != "DELETE":
             raise serializers.ValidationError({
-                "errors": "Нельзя подписаться на самого себя."
+                "all": "all допустим только при удалении."
             })
-        if user.follower.filter(author=author).exists():
-            raise serializers.ValidationError({
-                "errors": "Вы уже подписаны на этого пользователя."
-            })
-        return {"author": author}
-
-    def create(self, validated_data):
-        user = self.context["request"].user
-        author = validated_data["author"]
-
-        return UserSubscription.objects.create(
-            user=user,
-            author=author
-        )
+        if "ids" in data:
+            data["ids"] = list(dict.fromkeys(data["ids"]))
+        return data
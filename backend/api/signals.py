@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredientLink,
+    ShoppingListEntry,
+)
+from users.models import User, UserSubscription
+
+from .feed_cache import invalidate_feed, invalidate_user_feed
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredientLink)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_recipe_feed(sender, **kwargs):
+    invalidate_feed()
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_recipe_feed_author(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    invalidate_feed()
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+@receiver((post_save, post_delete), sender=ShoppingListEntry)
+@receiver((post_save, post_delete), sender=UserSubscription)
+def invalidate_recipe_feed_marks(sender, instance, **kwargs):
+    invalidate_user_feed(instance.user_id)
@@ -0,0 +1,8 @@
+from django.urls import include, path
+
+from api.async_views import get_urlpatterns
+from foodgram.urls import urlpatterns
+
+# Асинхронные маршруты при любом ASYNC_READ_API: они стоят раньше
+# синхронных и перехватывают те же URL.
+urlpatterns = [path("api/", include(get_urlpatterns())), *urlpatterns]
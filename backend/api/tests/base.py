@@ -0,0 +1,124 @@
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from recipes.counters import reconcile_counters
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredientLink,
+    ShoppingListEntry,
+)
+from users.models import User, UserSubscription
+
+AUTHORS = 3
+RECIPES = 12
+INGREDIENTS_PER_RECIPE = 3
+
+PNG = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAQMAAAAl21bK"
+    "AAAAA1BMVEUAAACnej3aAAAAAXRSTlMAQObYZgAAAApJREFUCNdjYAAAAAIAAeIhvDMA"
+    "AAAASUVORK5CYII="
+)
+
+# Страницы ленты и версии берутся не из кэша, чтобы запросы к базе
+# были одинаковыми от запроса к запросу.
+NO_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+}
+# Для проверок, которым нужны версии в кэше между запросами.
+LOCAL_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+class FoodgramDataMixin:
+    """Авторы с рецептами, ингредиенты и отметки первого пользователя."""
+
+    @classmethod
+    def create_data(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f"user{number}@example.com",
+                username=f"user{number}",
+                first_name="Имя",
+                last_name="Фамилия",
+                password="Pa55word!",
+            )
+            for number in range(AUTHORS + 1)
+        ]
+        cls.user, authors = cls.users[0], cls.users[1:]
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f"ингредиент {number}", measurement_unit="г")
+            for number in range(RECIPES + INGREDIENTS_PER_RECIPE)
+        )
+        # bulk_create не ставит изображения в очередь на копии.
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=authors[number % AUTHORS],
+                name=f"Рецепт {number}",
+                image=f"recipes/images/{number}.png",
+                text="Описание",
+                cooking_time=number + 1,
+            )
+            for number in range(RECIPES)
+        )
+        RecipeIngredientLink.objects.bulk_create(
+            RecipeIngredientLink(recipe=recipe, ingredient=ingredient,
+                                 amount=10)
+            for number, recipe in enumerate(cls.recipes)
+            for ingredient in ingredients[
+                number:number + INGREDIENTS_PER_RECIPE
+            ]
+        )
+        FavoriteRecipe.objects.bulk_create(
+            FavoriteRecipe(user=cls.user, recipe=recipe)
+            for recipe in cls.recipes[::2]
+        )
+        ShoppingListEntry.objects.bulk_create(
+            ShoppingListEntry(user=cls.user, recipe=recipe)
+            for recipe in cls.recipes[::3]
+        )
+        UserSubscription.objects.bulk_create(
+            UserSubscription(user=cls.user, author=author)
+            for author in authors
+        )
+        # bulk_create не меняет счётчики на строках.
+        reconcile_counters()
+        cls.token = Token.objects.create(user=cls.user)
+
+    def login(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def use_temp_media(self):
+        """Файлы и очередь заданий — во временном каталоге теста."""
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            MEDIA_ROOT=directory, IMAGE_QUEUE_DIR=f"{directory}/queue"
+        ))
+
+    def run_worker(self):
+        """Разбирает очередь, как воркер process_images."""
+        call_command("process_images", once=True, stdout=StringIO())
+
+
+@override_settings(CACHES=NO_CACHE)
+class FoodgramAPITestCase(FoodgramDataMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_data()
+
+
+class FoodgramAPITransactionTestCase(FoodgramDataMixin,
+                                     APITransactionTestCase):
+    """Без обёртки теста в транзакцию: atomic() в коде открывает
+    настоящую транзакцию, как в работе, а не точку сохранения, и
+    on_commit выполняется сразу."""
+
+    def setUp(self):
+        self.create_data()
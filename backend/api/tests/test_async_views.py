@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from .base import FoodgramAPITestCase
+
+ASYNC_URLCONF = "api.tests.async_urls"
+# Версии кэша без кэша (DummyCache) — time.time_ns() на каждый запрос;
+# постоянное время делает ETag сравнимыми.
+VERSION = 1_700_000_000 * 10 ** 9
+
+
+class AsyncReadParityTests(FoodgramAPITestCase):
+    """Асинхронные обработчики отвечают так же, как представления DRF."""
+
+    def setUp(self):
+        self.enterContext(mock.patch("time.time_ns", return_value=VERSION))
+
+    def get_urls(self):
+        recipe, author = self.recipes[0], self.users[1]
+        return [
+            "/api/ingredients/",
+            "/api/ingredients/?name=ингредиент 1",
+            f"/api/ingredients/{recipe.ingredients.first().pk}/",
+            "/api/ingredients/999999/",
+            "/api/recipes/",
+            "/api/recipes/?limit=5&page=2",
+            f"/api/recipes/?author={author.pk}",
+            "/api/recipes/?page=99",
+            f"/api/recipes/{recipe.pk}/",
+            "/api/recipes/999999/",
+            f"/api/users/{author.pk}/",
+            f"/api/users/{self.user.pk}/",
+            "/api/users/999999/",
+        ]
+
+    def get(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        return (
+            response.status_code, response.json(),
+            response.get("ETag"), response.get("Last-Modified"),
+        )
+
+    def assert_parity(self, url, **headers):
+        expected = self.get(url, **headers)
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            self.assertEqual(self.get(url, **headers), expected)
+        return expected
+
+    def test_anonymous(self):
+        for url in self.get_urls():
+            with self.subTest(url=url):
+                self.assert_parity(url)
+
+    def test_authenticated(self):
+        self.login()
+        for url in self.get_urls() + [
+            "/api/recipes/?is_favorited=1",
+            "/api/recipes/?is_in_shopping_cart=1&limit=2",
+        ]:
+            with self.subTest(url=url):
+                self.assert_parity(url)
+
+    def test_conditional_requests(self):
+        url = f"/api/recipes/{self.recipes[0].pk}/"
+        for login in (False, True):
+            if login:
+                self.login()
+            with self.subTest(login=login):
+                _, _, etag, _ = self.assert_parity(url)
+                with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+                    response = self.client.get(
+                        url, headers={"If-None-Match": etag}
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_invalid_token(self):
+        status, _, _, _ = self.assert_parity(
+            "/api/recipes/", Authorization="Token invalid"
+        )
+        self.assertEqual(status, 401)
+
+    def test_fallback_to_sync(self):
+        self.login()
+        urls = [
+            "/api/ingredients/?format=json",
+            "/api/recipes/?cursor=",
+            "/api/recipes/?count=approximate",
+            "/api/recipes/?format=json",
+        ]
+        # Эти запросы асинхронные обработчики не отрисовывают.
+        with mock.patch("api.async_views.render",
+                        side_effect=AssertionError):
+            for url in urls:
+                with self.subTest(url=url):
+                    self.assert_parity(url)
+        self.client.credentials()
+        with mock.patch("api.async_views.render",
+                        side_effect=AssertionError):
+            self.assert_parity("/api/recipes/?is_favorited=1")
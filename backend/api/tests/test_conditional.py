@@ -0,0 +1,80 @@
+import time
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from api.conditional import version_to_datetime
+from recipes import catalog
+from recipes.models import Recipe
+from users.models import User
+
+from .base import LOCAL_CACHE, FoodgramAPITestCase
+
+# Раньше любых отметок времени в тесте с точностью Last-Modified.
+PAST = time.time_ns() - 60 * 10 ** 9
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ConditionalGetTests(FoodgramAPITestCase):
+    """ETag различает представления и меняется вместе с телом."""
+
+    def setUp(self):
+        cache.clear()
+
+    def get_etag(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def assert_not_modified(self, url, etag):
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_recipe_list_pages(self):
+        self.login()
+        url = "/api/recipes/?limit=2"
+        etag = self.get_etag(f"{url}&page=1")
+        self.assert_not_modified(f"{url}&page=1", etag)
+        self.assertNotEqual(self.get_etag(f"{url}&page=2"), etag)
+        self.assertNotEqual(self.get_etag(f"{url}&is_favorited=1"), etag)
+
+    def test_recipe_list_formats(self):
+        url = "/api/recipes/"
+        self.assertNotEqual(
+            self.get_etag(url, Accept="application/json"),
+            self.get_etag(url, Accept="text/html"),
+        )
+
+    def test_ingredient_list_filters(self):
+        url = "/api/ingredients/"
+        etag = self.get_etag(f"{url}?name=и")
+        self.assert_not_modified(f"{url}?name=и", etag)
+        self.assertNotEqual(self.get_etag(f"{url}?name=р"), etag)
+        self.assertNotEqual(self.get_etag(url), etag)
+
+    def test_recipe_changes_with_ingredient(self):
+        recipe = self.recipes[0]
+        Recipe.objects.filter(pk=recipe.pk).update(
+            updated_at=version_to_datetime(PAST)
+        )
+        User.objects.filter(pk=recipe.author_id).update(
+            updated_at=version_to_datetime(PAST)
+        )
+        cache.set(catalog.VERSION_KEY, PAST, timeout=None)
+        url = f"/api/recipes/{recipe.pk}/"
+        response = self.client.get(url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        self.assert_not_modified(url, etag)
+
+        ingredient = recipe.ingredients.first()
+        ingredient.measurement_unit = "кг"
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.save()
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("кг", response.content.decode())
+        response = self.client.get(
+            url, headers={"If-Modified-Since": last_modified}
+        )
+        self.assertEqual(response.status_code, 200)
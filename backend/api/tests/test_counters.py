@@ -0,0 +1,131 @@
+import base64
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+
+from recipes.counters import reconcile_counters
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+from .base import PNG, RECIPES, FoodgramAPITestCase
+
+
+class CounterTests(FoodgramAPITestCase):
+    """Счётчики на строках меняются вместе с данными."""
+
+    def setUp(self):
+        self.use_temp_media()
+
+    def get_counter(self, obj, field):
+        return type(obj).objects.values_list(field, flat=True).get(pk=obj.pk)
+
+    def get_admin_client(self):
+        admin = User.objects.create_superuser(
+            email="admin@example.com", username="admin", first_name="Админ",
+            last_name="Админов", password="Pa55word!",
+        )
+        client = Client()
+        client.force_login(admin)
+        return client
+
+    def test_subscriptions_serve_recipes_count(self):
+        self.login()
+        response = self.client.get("/api/users/subscriptions/")
+        self.assertEqual(response.status_code, 200)
+        counts = {
+            author["id"]: author["recipes_count"]
+            for author in response.json()["results"]
+        }
+        self.assertEqual(counts, {
+            author.pk: RECIPES // len(self.users[1:])
+            for author in self.users[1:]
+        })
+
+    def test_subscribe_and_unsubscribe(self):
+        author = self.users[1]
+        self.login()
+        self.assertEqual(self.get_counter(author, "followers_count"), 1)
+        response = self.client.delete(f"/api/users/{author.pk}/subscribe/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_counter(author, "followers_count"), 0)
+        response = self.client.post(f"/api/users/{author.pk}/subscribe/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_counter(author, "followers_count"), 1)
+
+    def test_recipe_create_and_delete(self):
+        self.login()
+        response = self.client.post("/api/recipes/", {
+            "ingredients": [
+                {"id": Ingredient.objects.first().pk, "amount": 10}
+            ],
+            "image": PNG,
+            "name": "Свой рецепт",
+            "text": "Описание",
+            "cooking_time": 5,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_counter(self.user, "recipes_count"), 1)
+        response = self.client.delete(
+            f"/api/recipes/{response.json()['id']}/"
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_counter(self.user, "recipes_count"), 0)
+
+    def test_admin_add_and_delete(self):
+        client = self.get_admin_client()
+        author = self.users[1]
+        before = self.get_counter(author, "recipes_count")
+        image = base64.b64decode(PNG.partition("base64,")[2])
+        response = client.post("/admin/recipes/recipe/add/", {
+            "author": author.pk,
+            "name": "Из админки",
+            "image": SimpleUploadedFile("dish.png", image, "image/png"),
+            "text": "Описание",
+            "cooking_time": 5,
+            "recipe_ingredients-TOTAL_FORMS": 1,
+            "recipe_ingredients-INITIAL_FORMS": 0,
+            "recipe_ingredients-MIN_NUM_FORMS": 1,
+            "recipe_ingredients-MAX_NUM_FORMS": 1000,
+            "recipe_ingredients-0-ingredient": Ingredient.objects.first().pk,
+            "recipe_ingredients-0-amount": 5,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_counter(author, "recipes_count"),
+                         before + 1)
+
+        recipe = Recipe.objects.get(name="Из админки")
+        response = client.post(
+            f"/admin/recipes/recipe/{recipe.pk}/delete/", {"post": "yes"}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_counter(author, "recipes_count"), before)
+
+    def test_admin_bulk_delete(self):
+        client = self.get_admin_client()
+        response = client.post("/admin/recipes/recipe/", {
+            "action": "delete_selected",
+            "_selected_action": [recipe.pk for recipe in self.recipes[:4]],
+            "post": "yes",
+        })
+        self.assertEqual(response.status_code, 302)
+        for author in self.users[1:]:
+            self.assertEqual(
+                self.get_counter(author, "recipes_count"),
+                Recipe.objects.filter(author=author).count(),
+            )
+
+    def test_reconcile_fixes_drift(self):
+        User.objects.update(recipes_count=100)
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(
+            favorites_count=7
+        )
+        fixed = reconcile_counters()
+        self.assertEqual(fixed["User.recipes_count"], User.objects.count())
+        self.assertEqual(fixed["Recipe.favorites_count"], 1)
+        self.assertEqual(fixed["Recipe.cart_count"], 0)
+        self.assertEqual(self.get_counter(self.users[1], "recipes_count"),
+                         RECIPES // len(self.users[1:]))
+        self.assertEqual(self.get_counter(self.user, "recipes_count"), 0)
+        self.assertEqual(self.get_counter(self.recipes[0], "favorites_count"),
+                         1)
+        self.assertEqual(reconcile_counters(), dict.fromkeys(fixed, 0))
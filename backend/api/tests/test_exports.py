@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import re
+from collections import Counter
+
+from recipes.models import RecipeIngredientLink, ShoppingListEntry
+
+from .base import FoodgramAPITestCase
+
+URL = "/api/recipes/download_shopping_cart/"
+TXT_LINE = re.compile(r"- (.+) \((.+)\) — (\d+)")
+
+
+class ShoppingListExportTests(FoodgramAPITestCase):
+    """Выгрузка списка покупок во всех форматах с суммами по корзине."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Ингредиенты второго рецепта частично совпадают с первым.
+        ShoppingListEntry.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    def setUp(self):
+        self.login()
+
+    def get_expected(self):
+        totals = Counter()
+        links = RecipeIngredientLink.objects.filter(
+            recipe__in_shopping_cart_of__user=self.user
+        ).select_related("ingredient")
+        for link in links:
+            totals[link.ingredient.name, link.ingredient.measurement_unit] += (
+                link.amount
+            )
+        return dict(totals)
+
+    def download(self, export_format=None, content_type=None):
+        params = {"format": export_format} if export_format else {}
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], content_type)
+        self.assertIn(
+            f'filename="shopping_list.{export_format or "txt"}"',
+            response["Content-Disposition"],
+        )
+        return b"".join(response.streaming_content)
+
+    def test_amounts_are_summed(self):
+        content = self.download("json", "application/json; charset=utf-8")
+        amounts = {
+            item["name"]: item["amount"] for item in json.loads(content)
+        }
+        # В корзине рецепты 0, 1 и 3: ингредиенты 1–3 есть в двух из них.
+        self.assertEqual(
+            [amounts[f"ингредиент {number}"] for number in range(5)],
+            [10, 20, 20, 20, 10],
+        )
+
+    def test_txt(self):
+        content = self.download(content_type="text/plain; charset=utf-8")
+        title, *lines = content.decode().splitlines()
+        self.assertEqual(title, "Список покупок:")
+        self.assertEqual(
+            {
+                (name, unit): int(amount)
+                for name, unit, amount in (
+                    TXT_LINE.fullmatch(line).groups() for line in lines
+                )
+            },
+            self.get_expected(),
+        )
+
+    def test_csv(self):
+        content = self.download("csv", "text/csv; charset=utf-8")
+        header, *rows = csv.reader(io.StringIO(content.decode()))
+        self.assertEqual(header, ["name", "measurement_unit", "amount"])
+        self.assertEqual(
+            {(name, unit): int(amount) for name, unit, amount in rows},
+            self.get_expected(),
+        )
+
+    def test_json(self):
+        content = self.download("json", "application/json; charset=utf-8")
+        self.assertEqual(
+            {
+                (item["name"], item["measurement_unit"]): item["amount"]
+                for item in json.loads(content)
+            },
+            self.get_expected(),
+        )
+
+    def test_pdf(self):
+        content = self.download("pdf", "application/pdf")
+        self.assertTrue(content.startswith(b"%PDF-"))
+        self.assertIn(b"%%EOF", content[-32:])
+
+    def test_unknown_format(self):
+        response = self.client.get(URL, {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("errors", response.json())
+
+    def test_empty_cart(self):
+        self.client.force_authenticate(self.users[1])
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("errors", response.json())
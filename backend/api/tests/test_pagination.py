@@ -0,0 +1,47 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .base import RECIPES, FoodgramAPITestCase
+
+PAGE_SIZE = 2
+
+
+class CursorPaginationTests(FoodgramAPITestCase):
+    def get_page(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query["sql"] for query in queries]
+
+    def walk(self):
+        url = f"/api/recipes/?cursor=&limit={PAGE_SIZE}"
+        pages = []
+        while url:
+            data, queries = self.get_page(url)
+            pages.append((data, queries))
+            url = data["next"]
+        return pages
+
+    def test_pages_skip_count_and_cost_the_same(self):
+        for login in (False, True):
+            with self.subTest(authenticated=login):
+                if login:
+                    self.login()
+                pages = self.walk()
+                self.assertEqual(len(pages), RECIPES // PAGE_SIZE)
+                first_page_queries = len(pages[0][1])
+                for data, queries in pages:
+                    self.assertNotIn("count", data)
+                    self.assertFalse(
+                        [sql for sql in queries if "COUNT(" in sql.upper()]
+                    )
+                    self.assertEqual(len(queries), first_page_queries)
+
+    def test_cursor_walk_returns_every_recipe_once(self):
+        ids = [
+            recipe["id"]
+            for data, _ in self.walk()
+            for recipe in data["results"]
+        ]
+        self.assertEqual(sorted(ids),
+                         sorted(recipe.pk for recipe in self.recipes))
@@ -0,0 +1,127 @@
+from django.core.cache import cache
+from django.test import override_settings
+
+from recipes import pantry
+from recipes.models import Ingredient, Recipe, RecipeIngredientLink
+
+from .base import LOCAL_CACHE, PNG, FoodgramAPITestCase
+
+URL = "/api/recipes/what-can-i-cook/"
+
+
+@override_settings(CACHES=LOCAL_CACHE, PANTRY_INDEX_REBUILD_INTERVAL=0)
+class WhatCanICookTests(FoodgramAPITestCase):
+    """Ранжирование по покрытию, фильтры, страницы и сброс индекса.
+
+    У рецепта number ингредиенты number, number + 1 и number + 2.
+    """
+
+    def setUp(self):
+        cache.clear()
+        # Индекс живёт в памяти процесса и пережил бы тест.
+        pantry._index = None
+        self.addCleanup(setattr, pantry, "_index", None)
+        self.ingredients = list(Ingredient.objects.order_by("pk"))
+
+    def search(self, page=None, status=200, **params):
+        params = {
+            name: ",".join(str(self.ingredients[number].pk)
+                           for number in numbers)
+            for name, numbers in params.items()
+        }
+        response = self.client.get(URL, {**params, **(page or {})})
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def get_ranking(self, data):
+        return [
+            (item["id"], item["matched"], item["missing"])
+            for item in data["results"]
+        ]
+
+    def create_recipe(self, *numbers):
+        recipe = Recipe.objects.create(
+            author=self.users[1], name="Новый", image="recipes/images/n.png",
+            text="Описание", cooking_time=1,
+        )
+        RecipeIngredientLink.objects.bulk_create(
+            RecipeIngredientLink(recipe=recipe,
+                                 ingredient=self.ingredients[number],
+                                 amount=1)
+            for number in numbers
+        )
+        return recipe
+
+    def test_ranks_by_matched(self):
+        first, second, third = self.recipes[:3]
+        data = self.search(ingredients=(0, 1, 2))
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(self.get_ranking(data), [
+            (first.pk, 3, 0), (second.pk, 2, 1), (third.pk, 1, 2),
+        ])
+        self.assertEqual([item["coverage"] for item in data["results"]],
+                         [1.0, 0.667, 0.333])
+
+    def test_coverage_before_matched(self):
+        single = self.create_recipe(1)
+        pair = self.create_recipe(0, 1)
+        first, second = self.recipes[:2]
+        # Полностью покрытые рецепты — от новых к старым, дальше по доле
+        # имеющихся ингредиентов, а не по их числу.
+        self.assertEqual(self.get_ranking(self.search(ingredients=(0, 1))), [
+            (pair.pk, 2, 0), (single.pk, 1, 0),
+            (first.pk, 2, 1), (second.pk, 1, 2),
+        ])
+
+    def test_exclude_and_include(self):
+        first, second, third, fourth = self.recipes[:4]
+        data = self.search(ingredients=(0, 1, 2), exclude=(3,))
+        self.assertEqual(self.get_ranking(data), [(first.pk, 3, 0)])
+        data = self.search(ingredients=(0, 1, 2), exclude=(2,))
+        self.assertEqual(data["results"], [])
+        # Обязательный ингредиент тоже считается имеющимся; при равном
+        # покрытии новый рецепт выше.
+        data = self.search(ingredients=(0, 1), include=(3,))
+        self.assertEqual(self.get_ranking(data), [
+            (second.pk, 2, 1), (fourth.pk, 1, 2), (third.pk, 1, 2),
+        ])
+
+    def test_pagination(self):
+        second = self.recipes[1]
+        data = self.search({"limit": 1, "page": 2}, ingredients=(0, 1, 2))
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(self.get_ranking(data), [(second.pk, 2, 1)])
+        self.assertIn("page=3", data["next"])
+        self.assertIsNotNone(data["previous"])
+        self.search({"page": 5}, status=404, ingredients=(0, 1, 2))
+
+    def test_invalid_ingredients(self):
+        for query in ("", "?ingredients=", "?ingredients=abc",
+                      "?ingredients=1,x", "?exclude=1"):
+            with self.subTest(query=query):
+                response = self.client.get(URL + query)
+                self.assertEqual(response.status_code, 400)
+
+    def test_index_follows_recipe_changes(self):
+        recipe = self.recipes[5]
+        self.assertNotIn(recipe.pk, [
+            item["id"] for item in self.search(ingredients=(0,))["results"]
+        ])
+        self.use_temp_media()
+        self.client.force_authenticate(recipe.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/recipes/{recipe.pk}/",
+                {"image": PNG, "ingredients": [
+                    {"id": self.ingredients[0].pk, "amount": 5}
+                ]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn((recipe.pk, 1, 0),
+                      self.get_ranking(self.search(ingredients=(0,))))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/recipes/{recipe.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.search(ingredients=(0,))["count"], 1)
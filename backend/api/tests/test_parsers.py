@@ -0,0 +1,136 @@
+import base64
+import io
+import json
+import os
+from unittest import mock
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.test import SimpleTestCase, override_settings
+from rest_framework.exceptions import ParseError
+
+from api.parsers import RequestTooLarge, StreamingJSONParser
+
+# Малые блоки чтения, чтобы data URI, экранирование и кавычки
+# попадали на границы блоков.
+CHUNK_SIZES = (1, 2, 3, 5, 7, 64)
+# Больше заголовка data:image/png;base64, — как и настоящий предел.
+INLINE_LIMIT = 32
+
+
+def data_uri(payload, escape_slashes=False):
+    encoded = base64.b64encode(payload).decode()
+    if escape_slashes:
+        encoded = encoded.replace("/", "\\/")
+    return f"data:image/png;base64,{encoded}"
+
+
+@mock.patch("api.parsers.INLINE_STRING_LIMIT", INLINE_LIMIT)
+class StreamingJSONParserTests(SimpleTestCase):
+    """Разбор JSON с изображениями по частям при любых границах блоков."""
+
+    def setUp(self):
+        # Все байты, чтобы в base64 были и "+", и "/".
+        self.payload = bytes(range(256)) * 4 + os.urandom(100)
+
+    def parse(self, body, chunk_size):
+        with mock.patch("api.parsers.READ_CHUNK_SIZE", chunk_size):
+            return StreamingJSONParser().parse(io.BytesIO(body))
+
+    def read(self, upload):
+        self.assertIsInstance(upload, TemporaryUploadedFile)
+        self.addCleanup(upload.close)
+        self.assertEqual(upload.size, len(upload.read()))
+        upload.seek(0)
+        return upload.read()
+
+    def test_base64_split_across_chunks(self):
+        body = json.dumps({
+            "name": "Рецепт", "image": data_uri(self.payload),
+            "cooking_time": 5,
+        }).encode()
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                data = self.parse(body, chunk_size)
+                self.assertEqual(self.read(data.pop("image")), self.payload)
+                self.assertEqual(data, {"name": "Рецепт", "cooking_time": 5})
+
+    def test_escaped_slashes_in_base64(self):
+        # Так base64 отдают кодировщики, экранирующие "/".
+        body = (
+            '{"image": "' + data_uri(self.payload, escape_slashes=True)
+            + '"}'
+        ).encode()
+        self.assertIn(b"\\/", body)
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                data = self.parse(body, chunk_size)
+                self.assertEqual(self.read(data["image"]), self.payload)
+
+    def test_escaped_strings(self):
+        expected = {
+            "quote": 'Сказал "да"', "backslash": "C:\\path\\",
+            "newline": "строка\nвторая", "unicode": "\u0416\u2014",
+            "long": '\\"' * INLINE_LIMIT + "data:image/png;base64,AAAA",
+        }
+        for ensure_ascii in (True, False):
+            body = json.dumps(expected, ensure_ascii=ensure_ascii).encode()
+            for chunk_size in CHUNK_SIZES:
+                with self.subTest(ensure_ascii=ensure_ascii,
+                                  chunk_size=chunk_size):
+                    self.assertEqual(self.parse(body, chunk_size), expected)
+
+    def test_nested_uploads(self):
+        other = os.urandom(700)
+        body = json.dumps({
+            "recipes": [
+                {"image": data_uri(self.payload), "tags": ["a", "b"]},
+                {"image": data_uri(other), "short": "data:image/png;base64,"},
+            ],
+            "avatar": {"file": data_uri(other)},
+        }).encode()
+        for chunk_size in (3, 64):
+            with self.subTest(chunk_size=chunk_size):
+                data = self.parse(body, chunk_size)
+                first, second = data["recipes"]
+                self.assertEqual(self.read(first["image"]), self.payload)
+                self.assertEqual(first["tags"], ["a", "b"])
+                self.assertEqual(self.read(second["image"]), other)
+                self.assertEqual(second["short"], "data:image/png;base64,")
+                self.assertEqual(self.read(data["avatar"]["file"]), other)
+
+    @override_settings(MAX_IMAGE_UPLOAD_SIZE=1000)
+    def test_oversized_upload(self):
+        body = json.dumps({"image": data_uri(self.payload)}).encode()
+        for chunk_size in (7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertRaises(RequestTooLarge):
+                    self.parse(body, chunk_size)
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_oversized_json(self):
+        body = json.dumps({"text": "x" * 200}).encode()
+        with self.assertRaises(RequestTooLarge):
+            self.parse(body, 64)
+
+    def test_malformed_json(self):
+        image = data_uri(self.payload)
+        for body in (
+            b'{"name": }',
+            b'{"name": "open',
+            b"[1, 2",
+            ('{"image": "' + image[:-10]).encode(),
+            ('{"image": "' + image + '" "x": 1}').encode(),
+            ('{"image": "' + image[:200] + "!!" + image[200:] + '"}'
+             ).encode(),
+            ('{"image": "' + image[:200] + "\\q" + image[200:] + '"}'
+             ).encode(),
+        ):
+            for chunk_size in (5, 64):
+                with self.subTest(body=body[:30], chunk_size=chunk_size):
+                    with self.assertRaises(ParseError):
+                        self.parse(body, chunk_size)
+
+    def test_malformed_json_response(self):
+        response = self.client.post("/api/users/", b'{"email": ',
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,118 @@
+from django.core.cache import cache
+
+from api.instrumentation import query_budget
+from api.views import (
+    CustomUserManagerViewSet,
+    IngredientViewSet,
+    RecipeManagerViewSet,
+)
+from recipes.models import Ingredient
+
+from .base import PNG, FoodgramAPITransactionTestCase
+
+
+class QueryBudgetTests(FoodgramAPITransactionTestCase):
+    """Каждое действие с query_budgets укладывается в свой бюджет."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.checked = set()
+        self.login()
+        self.use_temp_media()
+
+    def check(self, viewset, action, method, url, data=None, status=200):
+        self.checked.add(action)
+        with self.subTest(action=action, method=method):
+            with query_budget(viewset.query_budgets[action]):
+                response = getattr(self.client, method)(url, data,
+                                                        format="json")
+                if response.streaming:
+                    # Строки выгрузки читаются из базы при отдаче тела.
+                    b"".join(response.streaming_content)
+            self.assertEqual(response.status_code, status)
+        return response
+
+    def assert_all_checked(self, viewset):
+        self.assertEqual(self.checked, set(viewset.query_budgets))
+
+    def get_recipe_data(self, name):
+        ingredients = Ingredient.objects.order_by("pk")[:2]
+        return {
+            "ingredients": [
+                {"id": ingredient.pk, "amount": 10}
+                for ingredient in ingredients
+            ],
+            "image": PNG,
+            "name": name,
+            "text": "Описание",
+            "cooking_time": 5,
+        }
+
+    def test_ingredients(self):
+        ingredient = Ingredient.objects.first()
+        self.check(IngredientViewSet, "list", "get", "/api/ingredients/")
+        self.check(IngredientViewSet, "retrieve", "get",
+                   f"/api/ingredients/{ingredient.pk}/")
+        self.assert_all_checked(IngredientViewSet)
+
+    def test_users(self):
+        viewset = CustomUserManagerViewSet
+        author = self.users[1]
+        self.check(viewset, "list", "get", "/api/users/")
+        self.check(viewset, "retrieve", "get", f"/api/users/{author.pk}/")
+        self.check(viewset, "me", "get", "/api/users/me/")
+        self.check(viewset, "subscriptions", "get",
+                   "/api/users/subscriptions/?recipes_limit=2")
+        self.check(viewset, "subscribe", "delete",
+                   f"/api/users/{author.pk}/subscribe/", status=204)
+        self.check(viewset, "subscribe", "post",
+                   f"/api/users/{author.pk}/subscribe/", status=201)
+        self.check(viewset, "subscribe_batch", "delete",
+                   "/api/users/subscribe/", {"ids": [author.pk]})
+        self.check(viewset, "subscribe_batch", "post",
+                   "/api/users/subscribe/", {"ids": [author.pk]})
+        self.check(viewset, "change_avatar", "put", "/api/users/me/avatar/",
+                   {"avatar": PNG})
+        self.check(viewset, "change_avatar", "delete",
+                   "/api/users/me/avatar/", status=204)
+        self.assert_all_checked(viewset)
+
+    def test_recipes(self):
+        viewset = RecipeManagerViewSet
+        recipe = self.recipes[1]
+        self.check(viewset, "list", "get", "/api/recipes/")
+        self.check(viewset, "retrieve", "get", f"/api/recipes/{recipe.pk}/")
+
+        created = self.check(viewset, "create", "post", "/api/recipes/",
+                             self.get_recipe_data("Новый"), status=201)
+        url = f"/api/recipes/{created.json()['id']}/"
+        self.check(viewset, "update", "put", url,
+                   self.get_recipe_data("Изменённый"))
+        self.check(viewset, "partial_update", "patch", url,
+                   {"name": "Ещё раз", "image": PNG, "ingredients": [
+                       {"id": Ingredient.objects.last().pk, "amount": 5}
+                   ]})
+        # Соседей пересчитывает воркер очереди.
+        self.run_worker()
+        self.check(viewset, "similar", "get", f"{url}similar/")
+        self.check(viewset, "generate_short_url", "get", f"{url}get-link/")
+        self.check(viewset, "destroy", "delete", url, status=204)
+
+        self.check(viewset, "download_shopping_cart", "get",
+                   "/api/recipes/download_shopping_cart/")
+        for action in ("favorite", "shopping_cart"):
+            self.check(viewset, action, "post",
+                       f"/api/recipes/{recipe.pk}/{action}/", status=201)
+            self.check(viewset, action, "delete",
+                       f"/api/recipes/{recipe.pk}/{action}/", status=204)
+            self.check(viewset, f"{action}_batch", "post",
+                       f"/api/recipes/{action}/", {"ids": [recipe.pk]})
+            self.check(viewset, f"{action}_batch", "delete",
+                       f"/api/recipes/{action}/", {"all": True})
+        ingredients = ",".join(
+            str(pk) for pk in Ingredient.objects.values_list("pk", flat=True)
+        )
+        self.check(viewset, "what_can_i_cook", "get",
+                   f"/api/recipes/what-can-i-cook/?ingredients={ingredients}")
+        self.assert_all_checked(viewset)
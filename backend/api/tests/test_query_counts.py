@@ -0,0 +1,46 @@
+from .base import FoodgramAPITestCase
+
+PAGE_SIZES = (2, 8)
+# Страница рецептов анониму: COUNT, рецепты с авторами, ингредиенты.
+RECIPE_LIST_QUERIES = 3
+# Авторизованному — ещё токен с пользователем, а авторы с отметкой
+# подписки приходят отдельным запросом.
+AUTHORIZED_RECIPE_LIST_QUERIES = 5
+# Токен с пользователем, COUNT, авторы, их рецепты.
+SUBSCRIPTIONS_QUERIES = 4
+
+
+class QueryCountTests(FoodgramAPITestCase):
+    """Число запросов не зависит от размера страницы (нет N+1)."""
+
+    def assert_queries(self, expected, url):
+        for size in PAGE_SIZES:
+            with self.subTest(url=url, limit=size):
+                with self.assertNumQueries(expected):
+                    response = self.client.get(f"{url}&limit={size}")
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertTrue(data["results"])
+                self.assertEqual(len(data["results"]),
+                                 min(size, data["count"]))
+
+    def test_recipe_list_anonymous(self):
+        self.assert_queries(RECIPE_LIST_QUERIES, "/api/recipes/?page=1")
+
+    def test_recipe_list_authorized(self):
+        self.login()
+        for url in (
+            "/api/recipes/?page=1",
+            "/api/recipes/?is_favorited=1",
+            "/api/recipes/?is_in_shopping_cart=1",
+            f"/api/recipes/?author={self.users[1].pk}",
+        ):
+            self.assert_queries(AUTHORIZED_RECIPE_LIST_QUERIES, url)
+
+    def test_subscriptions(self):
+        self.login()
+        for url in (
+            "/api/users/subscriptions/?page=1",
+            "/api/users/subscriptions/?recipes_limit=1",
+        ):
+            self.assert_queries(SUBSCRIPTIONS_QUERIES, url)
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from recipes.models import Ingredient, RecipeIngredientLink
+
+from .base import PNG, FoodgramAPITestCase
+
+
+class RecipeIngredientUpdateTests(FoodgramAPITestCase):
+    """Обновление рецепта меняет только разницу в ингредиентах."""
+
+    def setUp(self):
+        self.use_temp_media()
+        self.recipe = self.recipes[0]
+        self.client.force_authenticate(self.recipe.author)
+        self.ingredients = list(Ingredient.objects.order_by("pk"))
+        self.refresh_similar = self.enterContext(
+            mock.patch("api.serializers.refresh_similar")
+        )
+
+    def get_links(self):
+        return {
+            link.ingredient_id: (link.pk, link.amount)
+            for link in RecipeIngredientLink.objects.filter(
+                recipe=self.recipe
+            )
+        }
+
+    def update(self, amounts):
+        response = self.client.patch(
+            f"/api/recipes/{self.recipe.pk}/",
+            {"image": PNG, "ingredients": [
+                {"id": self.ingredients[number].pk, "amount": amount}
+                for number, amount in amounts.items()
+            ]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_changed_set(self):
+        first, second, third, fourth = (
+            ingredient.pk for ingredient in self.ingredients[:4]
+        )
+        before = self.get_links()
+        self.update({0: 10, 1: 25, 3: 5})
+        after = self.get_links()
+        self.assertEqual(set(after), {first, second, fourth})
+        # Неизменённая связь и связь с новой граммовкой — те же строки.
+        self.assertEqual(after[first], before[first])
+        self.assertEqual(after[second], (before[second][0], 25))
+        self.assertNotIn(after[fourth][0],
+                         [pk for pk, _ in before.values()])
+        self.assertFalse(RecipeIngredientLink.objects.filter(
+            pk=before[third][0]
+        ).exists())
+        self.refresh_similar.assert_called_once_with(self.recipe.pk)
+
+    def test_amounts_only(self):
+        before = self.get_links()
+        self.update({0: 1, 1: 10, 2: 30})
+        after = self.get_links()
+        self.assertEqual(
+            {pk: link_pk for pk, (link_pk, _) in after.items()},
+            {pk: link_pk for pk, (link_pk, _) in before.items()},
+        )
+        self.assertEqual(
+            [after[ingredient.pk][1] for ingredient in self.ingredients[:3]],
+            [1, 10, 30],
+        )
+        self.refresh_similar.assert_not_called()
+
+    def test_same_ingredients(self):
+        before = self.get_links()
+        self.update({0: 10, 1: 10, 2: 10})
+        self.assertEqual(self.get_links(), before)
+        self.refresh_similar.assert_not_called()
@@ -0,0 +1,146 @@
+from recipes.models import FavoriteRecipe, ShoppingListEntry
+from recipes.relations import (
+    ADDED,
+    EXISTS,
+    MISSING,
+    NOT_FOUND,
+    REMOVED,
+    add_relations,
+)
+from users.models import UserSubscription
+
+from .base import FoodgramAPITestCase
+
+
+class RelationEndpointTests(FoodgramAPITestCase):
+    def setUp(self):
+        self.login()
+
+    def test_non_numeric_id_is_not_found(self):
+        for url in (
+            "/api/users/abc/subscribe/",
+            "/api/recipes/abc/favorite/",
+            "/api/recipes/abc/shopping_cart/",
+        ):
+            for method in (self.client.post, self.client.delete):
+                with self.subTest(url=url, method=method.__name__):
+                    self.assertEqual(method(url).status_code, 404)
+
+    def test_subscribe_and_unsubscribe(self):
+        author = self.users[1]
+        url = f"/api/users/{author.pk}/subscribe/"
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["id"], author.pk)
+        self.assertEqual(self.client.post(url).status_code, 400)
+
+    def test_subscribe_to_self(self):
+        response = self.client.post(f"/api/users/{self.user.pk}/subscribe/")
+        self.assertEqual(response.status_code, 400)
+
+    def test_missing_user_is_not_found(self):
+        self.assertEqual(
+            self.client.post("/api/users/999999/subscribe/").status_code, 404
+        )
+
+
+class RelationBatchTests(FoodgramAPITestCase):
+    """Пакетные операции: итог по каждому идентификатору и счётчики."""
+
+    def setUp(self):
+        self.login()
+
+    def batch(self, method, url, data, status=200):
+        response = getattr(self.client, method)(url, data, format="json")
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def get_statuses(self, data):
+        return {item["id"]: item["status"] for item in data["results"]}
+
+    def get_counter(self, obj, field):
+        return type(obj).objects.values_list(field, flat=True).get(pk=obj.pk)
+
+    def test_favorite_add(self):
+        favorited, other = self.recipes[0], self.recipes[1]
+        data = self.batch("post", "/api/recipes/favorite/", {
+            "ids": [other.pk, favorited.pk, 999999, other.pk],
+        })
+        self.assertEqual(self.get_statuses(data), {
+            other.pk: ADDED, favorited.pk: EXISTS, 999999: NOT_FOUND,
+        })
+        self.assertTrue(FavoriteRecipe.objects.filter(
+            user=self.user, recipe=other
+        ).exists())
+        self.assertEqual(self.get_counter(other, "favorites_count"), 1)
+        self.assertEqual(self.get_counter(favorited, "favorites_count"), 1)
+
+    def test_cart_remove(self):
+        in_cart, other = self.recipes[0], self.recipes[1]
+        data = self.batch("delete", "/api/recipes/shopping_cart/", {
+            "ids": [in_cart.pk, other.pk, 999999],
+        })
+        self.assertEqual(self.get_statuses(data), {
+            in_cart.pk: REMOVED, other.pk: MISSING, 999999: NOT_FOUND,
+        })
+        self.assertEqual(self.get_counter(in_cart, "cart_count"), 0)
+
+    def test_subscribe(self):
+        author, new_author = self.users[1], self.users[2]
+        UserSubscription.objects.filter(author=new_author).delete()
+        data = self.batch("post", "/api/users/subscribe/", {
+            "ids": [self.user.pk, author.pk, new_author.pk, 999999],
+        })
+        self.assertEqual(self.get_statuses(data), {
+            self.user.pk: "self", author.pk: EXISTS,
+            new_author.pk: ADDED, 999999: NOT_FOUND,
+        })
+        self.assertEqual(self.get_counter(new_author, "followers_count"), 1)
+        data = self.batch("delete", "/api/users/subscribe/", {
+            "ids": [self.user.pk, new_author.pk],
+        })
+        self.assertEqual(self.get_statuses(data), {
+            self.user.pk: "self", new_author.pk: REMOVED,
+        })
+        self.assertEqual(self.get_counter(new_author, "followers_count"), 0)
+
+    def test_remove_all(self):
+        in_cart = self.recipes[::3]
+        data = self.batch("delete", "/api/recipes/shopping_cart/",
+                          {"all": True})
+        self.assertEqual(data, {"removed": len(in_cart)})
+        self.assertFalse(
+            ShoppingListEntry.objects.filter(user=self.user).exists()
+        )
+        for recipe in in_cart:
+            self.assertEqual(self.get_counter(recipe, "cart_count"), 0)
+        data = self.batch("delete", "/api/recipes/shopping_cart/",
+                          {"all": True})
+        self.assertEqual(data, {"removed": 0})
+
+    def test_invalid_body(self):
+        for method, data in (
+            ("post", {"all": True}),
+            ("post", {}),
+            ("post", {"ids": []}),
+            ("delete", {"ids": [1], "all": True}),
+            ("post", {"ids": ["abc"]}),
+        ):
+            with self.subTest(method=method, data=data):
+                self.batch(method, "/api/recipes/favorite/", data, 400)
+
+    def test_repeated_add_counts_once(self):
+        # Итог определяет RETURNING самой вставки, а не предварительная
+        # проверка: повторный пакет ничего не добавляет.
+        recipe = self.recipes[1]
+        self.assertEqual(
+            add_relations(FavoriteRecipe, self.user.pk, [recipe.pk]),
+            {recipe.pk: ADDED},
+        )
+        self.assertEqual(
+            add_relations(FavoriteRecipe, self.user.pk, [recipe.pk]),
+            {recipe.pk: EXISTS},
+        )
+        self.assertEqual(self.get_counter(recipe, "favorites_count"), 1)
@@ -0,0 +1,108 @@
+import io
+import json
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from api import renderers
+from api.parsers import StreamingJSONParser
+
+from .base import FoodgramAPITestCase
+
+DATA = {
+    "name": "Борщ — «по-домашнему»",
+    "emoji": "🍲",
+    "separators": "строка\u2028абзац\u2029конец",
+    "escapes": 'кавычки " и \\ слэш\n\t',
+    "amount": Decimal("12.50"),
+    "created": datetime(2024, 5, 17, 8, 30, 15, 123456, tzinfo=timezone.utc),
+    "naive": datetime(2024, 5, 17, 8, 30),
+    "day": date(2024, 5, 17),
+    "time": time(8, 30, 15),
+    "duration": timedelta(minutes=90),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "lazy": gettext_lazy("Not found."),
+    "numbers": [0, -1, 2 ** 53, 1.5, True, False, None],
+    "nested": {1: {"list": [{"пусто": []}, {}]}},
+}
+
+
+class RendererRoundTripTests(SimpleTestCase):
+    """orjson даёт те же байты, что JSONRenderer DRF и запасной json."""
+
+    def render(self, data=DATA, accepted_media_type=None):
+        return renderers.FastJSONRenderer().render(data, accepted_media_type)
+
+    def test_matches_drf_renderer(self):
+        self.assertEqual(self.render(), JSONRenderer().render(DATA))
+
+    def test_matches_stdlib_fallback(self):
+        content = self.render()
+        with mock.patch("api.renderers.orjson", None):
+            self.assertEqual(self.render(), content)
+            self.assertEqual(renderers.dumps(DATA), content)
+
+    def test_round_trip(self):
+        content = self.render()
+        self.assertNotIn("\u2028".encode(), content)
+        self.assertIn("Борщ".encode(), content)
+        expected = json.loads(content.decode())
+        self.assertEqual(renderers.loads(content), expected)
+        with mock.patch("api.renderers.orjson", None):
+            self.assertEqual(renderers.loads(content), expected)
+        self.assertEqual(expected["separators"], DATA["separators"])
+        self.assertEqual(expected["amount"], 12.5)
+        self.assertEqual(expected["created"], "2024-05-17T08:30:15.123456Z")
+
+    def test_parser_reads_rendered(self):
+        content = self.render()
+        for fallback in (False, True):
+            with self.subTest(fallback=fallback), mock.patch(
+                "api.renderers.orjson",
+                None if fallback else renderers.orjson,
+            ):
+                self.assertEqual(
+                    StreamingJSONParser().parse(io.BytesIO(content)),
+                    json.loads(content.decode()),
+                )
+
+    def test_indent_uses_drf_renderer(self):
+        content = self.render(
+            accepted_media_type="application/json; indent=4"
+        )
+        self.assertEqual(
+            content, JSONRenderer().render(
+                DATA, "application/json; indent=4"
+            )
+        )
+        self.assertIn(b"\n    ", content)
+
+    def test_empty(self):
+        self.assertEqual(self.render(None), b"")
+
+
+class BrowsableAPITests(FoodgramAPITestCase):
+    """Браузерная версия API по-прежнему работает."""
+
+    def test_html(self):
+        for url in ("/api/recipes/", f"/api/recipes/{self.recipes[0].pk}/",
+                    "/api/ingredients/"):
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={
+                    "Accept": "text/html"
+                })
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response["Content-Type"],
+                                 "text/html; charset=utf-8")
+                self.assertIn("ингредиент 1", response.content.decode())
+
+    def test_json_response(self):
+        response = self.client.get(f"/api/recipes/{self.recipes[0].pk}/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json()["name"], "Рецепт 0")
+        self.assertIn("Рецепт 0".encode(), response.content)
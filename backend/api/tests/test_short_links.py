@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from recipes import short_links
+from recipes.models import RecipeShortLink
+
+from .base import LOCAL_CACHE, FoodgramAPITestCase
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ShortLinkTests(FoodgramAPITestCase):
+    """Короткая ссылка ведёт на рецепт, пока он есть."""
+
+    def setUp(self):
+        cache.clear()
+
+    def get_link(self, recipe):
+        response = self.client.get(f"/api/recipes/{recipe.pk}/get-link/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["short-link"]
+
+    def test_redirect_until_recipe_deleted(self):
+        recipe = self.recipes[0]
+        link = self.get_link(recipe)
+        self.assertEqual(self.get_link(recipe), link)
+        path = link.removeprefix("http://testserver")
+        self.assertRegex(path, r"^/s/[0-9A-Za-z]+$")
+
+        # Созданный код сразу попадает в кэш: переход без запросов к базе.
+        with self.assertNumQueries(0):
+            response = self.client.get(path)
+        self.assertRedirects(response, f"/recipes/{recipe.pk}",
+                             fetch_redirect_response=False)
+
+        self.client.force_authenticate(recipe.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/recipes/{recipe.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_unknown_code(self):
+        self.assertEqual(self.client.get("/s/unknown/").status_code, 404)
+        self.assertEqual(
+            self.client.get("/api/recipes/999999/get-link/").status_code, 404
+        )
+
+    def test_generate_missing_clears_negative_cache(self):
+        code = "fresh"
+        self.assertEqual(self.client.get(f"/s/{code}/").status_code, 404)
+        self.assertEqual(
+            cache.get(short_links.CODE_KEY.format(code=code)),
+            short_links.MISSING,
+        )
+        # Первый рецепт получает закэшированный как несуществующий код.
+        codes, new_code = iter([code]), short_links.new_code
+        with mock.patch.object(
+            short_links, "new_code",
+            side_effect=lambda: next(codes, None) or new_code(),
+        ):
+            created = short_links.generate_missing(batch_size=5)
+        self.assertEqual(created, len(self.recipes))
+        recipe_id = RecipeShortLink.objects.get(code=code).recipe_id
+        self.assertRedirects(self.client.get(f"/s/{code}/"),
+                             f"/recipes/{recipe_id}",
+                             fetch_redirect_response=False)
@@ -0,0 +1,114 @@
+import random
+
+from django.test import override_settings
+
+from recipes.models import Ingredient, RecipeIngredientLink, SimilarRecipe
+from recipes.similar import rebuild, refresh
+
+from .base import PNG, FoodgramAPITransactionTestCase
+
+
+# Короткие списки: новый рецепт вытесняет соседей с меньшим сходством.
+@override_settings(SIMILAR_RECIPES_COUNT=2)
+class SimilarRecipeTests(FoodgramAPITransactionTestCase):
+    """Соседи после изменений совпадают с полным пересчётом."""
+
+    def setUp(self):
+        super().setUp()
+        self.use_temp_media()
+        self.ingredients = list(Ingredient.objects.order_by("pk"))
+        rebuild()
+
+    def get_lists(self):
+        lists = {}
+        for link in SimilarRecipe.objects.order_by("recipe_id", "-score",
+                                                   "-similar_id"):
+            lists.setdefault(link.recipe_id, []).append(
+                (link.similar_id, round(link.score, 9))
+            )
+        return lists
+
+    def get_neighbours(self, recipe_id):
+        return [similar_id for similar_id, _ in self.get_lists()[recipe_id]]
+
+    def assert_matches_rebuild(self):
+        incremental = self.get_lists()
+        rebuild()
+        self.assertEqual(incremental, self.get_lists())
+
+    def get_recipe_data(self, ingredients):
+        return {
+            "ingredients": [
+                {"id": ingredient.pk, "amount": 10}
+                for ingredient in ingredients
+            ],
+            "image": PNG,
+            "name": "Новый рецепт",
+            "text": "Описание",
+            "cooking_time": 5,
+        }
+
+    def test_create(self):
+        first = self.recipes[0]
+        self.login()
+        response = self.client.post(
+            "/api/recipes/", self.get_recipe_data(self.ingredients[:3]),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        recipe_id = response.json()["id"]
+        # Запрос только ставит пересчёт в очередь.
+        self.assertNotIn(recipe_id, self.get_lists())
+
+        self.run_worker()
+        self.assertEqual(self.get_neighbours(recipe_id)[0], first.pk)
+        self.assertEqual(self.get_neighbours(first.pk)[0], recipe_id)
+        self.assert_matches_rebuild()
+
+    def test_update_ingredients(self):
+        first, recipe = self.recipes[0], self.recipes[6]
+        old_neighbours = self.get_neighbours(recipe.pk)
+        self.client.force_authenticate(recipe.author)
+        response = self.client.patch(
+            f"/api/recipes/{recipe.pk}/",
+            self.get_recipe_data(self.ingredients[:3]), format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.run_worker()
+        self.assertEqual(self.get_neighbours(first.pk)[0], recipe.pk)
+        for other_id in old_neighbours:
+            self.assertNotIn(recipe.pk, self.get_neighbours(other_id))
+        self.assert_matches_rebuild()
+
+    def test_delete(self):
+        recipe = self.recipes[5]
+        referrers = set(
+            SimilarRecipe.objects.filter(similar=recipe)
+            .values_list("recipe_id", flat=True)
+        )
+        self.assertTrue(referrers)
+        self.client.force_authenticate(recipe.author)
+        response = self.client.delete(f"/api/recipes/{recipe.pk}/")
+        self.assertEqual(response.status_code, 204)
+
+        self.run_worker()
+        self.assertFalse(SimilarRecipe.objects.filter(similar=recipe.pk))
+        # Освободившееся место занял следующий по сходству рецепт.
+        for other_id in referrers:
+            self.assertEqual(len(self.get_neighbours(other_id)), 2)
+        self.assert_matches_rebuild()
+
+    def test_refresh_matches_rebuild(self):
+        shuffle = random.Random(24)
+        for recipe in shuffle.sample(self.recipes, 6):
+            RecipeIngredientLink.objects.filter(recipe=recipe).delete()
+            RecipeIngredientLink.objects.bulk_create(
+                RecipeIngredientLink(recipe=recipe, ingredient=ingredient,
+                                     amount=10)
+                for ingredient in shuffle.sample(self.ingredients,
+                                                 shuffle.randint(1, 5))
+            )
+            refresh(recipe.pk)
+            with self.subTest(recipe=recipe.pk):
+                self.assert_matches_rebuild()
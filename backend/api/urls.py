@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -19,3 +20,8 @@ router.register("recipes", RecipeManagerViewSet, basename="recipes")
 urlpatterns = [
     path("", include(router.urls)),
 ]
+
+if settings.ASYNC_READ_API:
+    from .async_views import get_urlpatterns
+
+    urlpatterns = get_urlpatterns() + urlpatterns
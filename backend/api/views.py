@@ -1,5 +1,17 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Value,
+    Window,
+)
+from django.db.models.functions import RowNumber
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
@@ -10,7 +22,6 @@ from rest_framework import (
     viewsets,
 )
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticated,
@@ -18,97 +29,294 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 
+from recipes.catalog import get_catalog, get_catalog_version
+from recipes.counters import change_counter
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
     Recipe,
     RecipeIngredientLink,
     ShoppingListEntry,
+    SimilarRecipe,
+)
+from recipes.pantry import get_pantry_index, invalidate_pantry
+from recipes.relations import (
+    ADDED,
+    REMOVED,
+    add_relation,
+    add_relations,
+    clear_relations,
+    get_target_id,
+    remove_relation,
+    remove_relations,
+)
+from recipes.short_links import get_code
+from recipes.similar import forget_similar
+from users.models import User, UserSubscription
+
+from .conditional import (
+    ConditionalGetMixin,
+    make_etag,
+    version_to_datetime,
+)
+from .exports import (
+    DEFAULT_EXPORT_FORMAT,
+    EXPORT_FORMATS,
+    ExportContentNegotiation,
+    build_shopping_list_response,
+    get_shopping_list_rows,
+)
+from .feed_cache import (
+    cache_page,
+    get_cached_page,
+    get_feed_versions,
+    get_page_key,
+    invalidate_user_feed,
+    is_feed_cacheable,
 )
-from users.models import User
-
 from .filters import IngredientSearchFilter, RecipeCustomFilter
+from .pagination import CustomPaginator, RankingPaginator
 from .permissions import IsOwnerOrReadOnly
 from .serializers import (
     AvatarResponseSerializer,
     AvatarUpdateSerializer,
     IngredientSerializer,
+    PantryRecipeSerializer,
+    PantrySearchSerializer,
     RecipeDetailSerializer,
     RecipeShortSerializer,
     RecipeWriteSerializer,
+    RelationBatchSerializer,
     SubscriptionOutputSerializer,
-    SubscriptionSerializer,
     UserSerializer,
+    get_recipes_limit,
 )
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+def annotate_for_reading(queryset, user):
+    """Собирает флаги пользователя и связи за постоянное число запросов."""
+    queryset = queryset.prefetch_related(
+        Prefetch(
+            "recipe_ingredients",
+            queryset=RecipeIngredientLink.objects.select_related(
+                "ingredient"
+            ),
+        )
+    )
+    if not user.is_authenticated:
+        return queryset.select_related("author")
+
+    return queryset.prefetch_related(
+        Prefetch(
+            "author",
+            queryset=User.objects.annotate(
+                is_subscribed=Exists(
+                    UserSubscription.objects.filter(
+                        user=user, author=OuterRef("pk")
+                    )
+                )
+            ),
+        )
+    ).annotate(
+        is_favorited=Exists(
+            FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef("pk")
+            )
+        ),
+        is_in_shopping_cart=Exists(
+            ShoppingListEntry.objects.filter(
+                user=user, recipe=OuterRef("pk")
+            )
+        ),
+    )
+
+
+def handle_relation_batch(request, model_class, forbidden=()):
+    """Пакетные POST и DELETE для избранного, покупок и подписок.
+
+    Тело: {"ids": [...]} или {"all": true} для удаления всего. Ответ —
+    итог по каждому идентификатору: added, exists, removed, missing,
+    not_found или self для идентификаторов из forbidden.
+    """
+    serializer = RelationBatchSerializer(data=request.data,
+                                         context={"request": request})
+    serializer.is_valid(raise_exception=True)
+    user = request.user
+    if serializer.validated_data["all"]:
+        removed = clear_relations(model_class, user.pk)
+        if removed:
+            invalidate_user_feed(user.pk)
+        return Response({"removed": removed})
+
+    ids = serializer.validated_data["ids"]
+    allowed = [pk for pk in ids if pk not in forbidden]
+    results = dict.fromkeys(ids, "self")
+    if allowed:
+        if request.method == "POST":
+            results.update(add_relations(model_class, user.pk, allowed))
+        else:
+            results.update(remove_relations(model_class, user.pk, allowed))
+    if any(result in (ADDED, REMOVED) for result in results.values()):
+        invalidate_user_feed(user.pk)
+    return Response({"results": [
+        {"id": pk, "status": result} for pk, result in results.items()
+    ]})
+
+
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all().order_by('name')
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientSearchFilter
+    # Предельное число SQL-запросов на действие, см. api.instrumentation
+    query_budgets = {"list": 2, "retrieve": 2}
 
+    def get_validators(self, request, *args, **kwargs):
+        return make_etag("ingredients", get_catalog().version), None
 
-class CustomPaginator(PageNumberPagination):
-    page_size_query_param = "limit"
+    def list(self, request, *args, **kwargs):
+        if "search" in request.query_params:
+            return super().list(request, *args, **kwargs)
+        name = request.query_params.get("name", "").strip()
+        return Response(get_catalog().search(
+            name, limit=settings.INGREDIENT_SEARCH_LIMIT if name else None
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            ingredient = get_catalog().get(int(kwargs["pk"]))
+        except (TypeError, ValueError):
+            ingredient = None
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
 
 
-class CustomUserManagerViewSet(DjoserUserViewSet):
+class CustomUserManagerViewSet(ConditionalGetMixin, DjoserUserViewSet):
     pagination_class = CustomPaginator
     serializer_class = UserSerializer
+    conditional_actions = ("retrieve", "me")
+    query_budgets = {
+        "list": 5,
+        "retrieve": 5,
+        "me": 4,
+        "subscriptions": 5,
+        "subscribe": 8,
+        "subscribe_batch": 6,
+        "change_avatar": 5,
+    }
 
     def get_permissions(self):
         if self.action == "retrieve":
             self.permission_classes = [AllowAny]
         return super().get_permissions()
 
+    def get_validators(self, request, *args, **kwargs):
+        user = request.user
+        pk = user.pk if self.action == "me" else kwargs.get("id")
+        queryset = User.objects.all()
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    UserSubscription.objects.filter(
+                        user=user, author=OuterRef("pk")
+                    )
+                )
+            )
+        else:
+            queryset = queryset.annotate(is_subscribed=Value(False))
+        try:
+            updated_at, is_subscribed = queryset.values_list(
+                "updated_at", "is_subscribed"
+            ).get(pk=pk)
+        except (User.DoesNotExist, ValueError):
+            return None, None
+        return (
+            make_etag("user", pk, user.pk, updated_at, is_subscribed),
+            None if user.is_authenticated else updated_at,
+        )
+
     @action(
         detail=False,
         methods=["get"],
         permission_classes=[IsAuthenticated],
     )
     def subscriptions(self, request):
-        authors = User.objects.filter(following__user=request.user)
+        recipes = Recipe.objects.all()
+        limit = get_recipes_limit(request)
+        if limit is not None:
+            # Из базы приходят только первые N рецептов каждого автора,
+            # одним запросом для всей страницы.
+            recipes = recipes.annotate(
+                author_position=Window(
+                    RowNumber(),
+                    partition_by=F("author_id"),
+                    order_by=F("pub_date").desc(),
+                )
+            ).filter(author_position__lte=limit)
+        authors = (
+            User.objects.filter(following__user=request.user)
+            .annotate(is_subscribed=Value(True))
+            .prefetch_related(Prefetch("recipes", queryset=recipes))
+            .order_by("username")
+        )
         paginated = self.paginate_queryset(authors)
         serializer = SubscriptionOutputSerializer(
             paginated, many=True, context={"request": request}
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="subscribe",
+    )
+    def subscribe_batch(self, request):
+        return handle_relation_batch(request, UserSubscription,
+                                     forbidden={request.user.pk})
+
     @action(
         detail=True,
         methods=["post", "delete"],
         permission_classes=[IsAuthenticated],
     )
     def subscribe(self, request, id=None):
-        serializer = SubscriptionSerializer(
-            data={"author_id": id},
-            context={"request": request}
-        )
-
+        user = request.user
+        id = get_target_id(id)
+        if id is None:
+            raise Http404
         if request.method == "POST":
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            if user.pk == id:
+                get_object_or_404(User, id=id)
+                return Response(
+                    {"errors": "Нельзя подписаться на самого себя."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if not add_relation(UserSubscription, user.pk, id):
+                get_object_or_404(User, id=id)
+                return Response(
+                    {"errors": "Вы уже подписаны на этого пользователя."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            invalidate_user_feed(user.pk)
             output_serializer = SubscriptionOutputSerializer(
-                serializer.validated_data["author"],
+                get_object_or_404(User, id=id),
                 context={"request": request}
             )
             return Response(output_serializer.data,
                             status=status.HTTP_201_CREATED)
 
         elif request.method == "DELETE":
-            author = get_object_or_404(User, id=id)
-            exists = request.user.follower.filter(author=author).exists()
-
-            if not exists:
+            if not remove_relation(UserSubscription, user.pk, id):
+                get_object_or_404(User, id=id)
                 return Response(
                     {"errors": "Вы не были подписаны на этого пользователя."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-
-            request.user.follower.filter(author=author).delete()
+            invalidate_user_feed(user.pk)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -127,7 +335,7 @@ class CustomUserManagerViewSet(DjoserUserViewSet):
             if user.avatar:
                 user.avatar.delete(save=False)
             user.avatar = avatar
-            user.save(update_fields=["avatar"])
+            user.save(update_fields=["avatar", "updated_at"])
             response_serializer = AvatarResponseSerializer(
                 user, context={"request": request}
             )
@@ -146,7 +354,7 @@ class CustomUserManagerViewSet(DjoserUserViewSet):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class RecipeManagerViewSet(viewsets.ModelViewSet):
+class RecipeManagerViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
     filter_backends = [DjangoFilterBackend, drf_filters.OrderingFilter]
@@ -154,15 +362,96 @@ class RecipeManagerViewSet(viewsets.ModelViewSet):
     ordering_fields = ["name", "pub_date", "cooking_time"]
     ordering = ["-pub_date"]
     pagination_class = CustomPaginator
+    query_budgets = {
+        "list": 8,
+        "retrieve": 6,
+        "create": 11,
+        "update": 14,
+        "partial_update": 14,
+        "destroy": 14,
+        "favorite": 6,
+        "shopping_cart": 6,
+        "favorite_batch": 6,
+        "shopping_cart_batch": 6,
+        "download_shopping_cart": 3,
+        "generate_short_url": 5,
+        "similar": 2,
+        "what_can_i_cook": 3,
+    }
 
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
             return RecipeDetailSerializer
         return RecipeWriteSerializer
 
+    def get_validators(self, request, *args, **kwargs):
+        """Считает валидаторы по отметкам времени вместо сериализации.
+
+        Рецепт показывает названия и единицы измерения ингредиентов,
+        поэтому в его валидаторах есть и версия каталога. ETag списка
+        строится из версий кэша ленты, без запросов к базе.
+        Last-Modified отдаётся только анонимам и только для одного
+        рецепта: удаление из списка или из избранного его не сдвигает.
+        """
+        user = request.user
+        if self.action == "retrieve":
+            fields = ["updated_at", "author__updated_at"]
+            queryset = self.get_queryset()
+            if user.is_authenticated:
+                queryset = queryset.annotate(
+                    author_is_subscribed=Exists(
+                        UserSubscription.objects.filter(
+                            user=user, author=OuterRef("author")
+                        )
+                    )
+                )
+                fields += [
+                    "is_favorited",
+                    "is_in_shopping_cart",
+                    "author_is_subscribed",
+                ]
+            try:
+                state = queryset.values_list(*fields).get(pk=kwargs["pk"])
+            except (Recipe.DoesNotExist, ValueError):
+                return None, None
+            catalog_version = get_catalog_version()
+            return (
+                make_etag("recipe", kwargs["pk"], user.pk, state,
+                          catalog_version),
+                None if user.is_authenticated else max(
+                    *state[:2], version_to_datetime(catalog_version)
+                ),
+            )
+
+        versions = get_feed_versions(user)
+        if versions is None:
+            return None, None
+        return make_etag("recipes", user.pk, versions), None
+
+    def list(self, request, *args, **kwargs):
+        if not is_feed_cacheable(request):
+            return super().list(request, *args, **kwargs)
+
+        page_key = get_page_key(request)
+        data = get_cached_page(request, page_key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        cache_page(request, page_key, response.data)
+        return response
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        author_id = instance.author_id
+        forget_similar(instance.pk)
+        invalidate_pantry()
+        instance.delete()
+        change_counter(User, author_id, "recipes_count", -1)
+
     def _handle_user_recipe_relation(
         self,
         request,
@@ -172,32 +461,52 @@ class RecipeManagerViewSet(viewsets.ModelViewSet):
         error_missing,
     ):
         user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        relation_exists = model_class.objects.filter(
-            user=user, recipe=recipe
-        ).exists()
-
+        pk = get_target_id(pk)
+        if pk is None:
+            raise Http404
         if request.method == "POST":
-            if relation_exists:
+            if not add_relation(model_class, user.pk, pk):
+                get_object_or_404(Recipe, pk=pk)
                 return Response(
                     {"errors": error_exists},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            model_class.objects.create(user=user, recipe=recipe)
-            serializer = RecipeShortSerializer(recipe)
+            invalidate_user_feed(user.pk)
+            serializer = RecipeShortSerializer(
+                get_object_or_404(Recipe, pk=pk)
+            )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         elif request.method == "DELETE":
-            if not relation_exists:
+            if not remove_relation(model_class, user.pk, pk):
+                get_object_or_404(Recipe, pk=pk)
                 return Response(
                     {"errors": error_missing},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            model_class.objects.filter(user=user, recipe=recipe).delete()
+            invalidate_user_feed(user.pk)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="favorite",
+    )
+    def favorite_batch(self, request):
+        return handle_relation_batch(request, FavoriteRecipe)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="shopping_cart",
+    )
+    def shopping_cart_batch(self, request):
+        return handle_relation_batch(request, ShoppingListEntry)
+
     @action(
         detail=True,
         methods=["post", "delete"],
@@ -230,36 +539,31 @@ class RecipeManagerViewSet(viewsets.ModelViewSet):
         detail=False,
         methods=["get"],
         permission_classes=[IsAuthenticated],
+        content_negotiation_class=ExportContentNegotiation,
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        ids = ShoppingListEntry.objects.filter(user=user).values_list(
-            "recipe__id", flat=True
+        export_format = request.query_params.get(
+            "format", DEFAULT_EXPORT_FORMAT
         )
-        if not ids:
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"errors": "Неподдерживаемый формат: "
+                           f"{', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = get_shopping_list_rows(request.user)
+        first_row = next(rows, None)
+        if first_row is None:
             return Response(
                 {"errors": "Ваш список покупок пуст."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        ingredients = (
-            RecipeIngredientLink.objects.filter(recipe__id__in=ids)
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(total_amount=Sum("amount"))
-            .order_by("ingredient__name")
+        return build_shopping_list_response(
+            chain([first_row], rows), export_format
         )
 
-        content = "Список покупок:"
-        for item in ingredients:
-            name = item["ingredient__name"]
-            unit = item["ingredient__measurement_unit"]
-            amount = item["total_amount"]
-            content += f"- {name} ({unit}) — {amount}"
-
-        response = HttpResponse(content, content_type="text/plain")
-        response["Content-Disposition"] = 'attachment; filename="cart.txt"'
-        return response
-
     @action(
         detail=True,
         methods=["get"],
@@ -267,30 +571,84 @@ class RecipeManagerViewSet(viewsets.ModelViewSet):
         url_path="get-link",
     )
     def generate_short_url(self, request, pk=None):
-        recipe = self.get_object()
         try:
-            full_url = request.build_absolute_uri(
-                reverse("recipes-detail", kwargs={"pk": recipe.pk})
-            )
-        except Exception:
-            return Response(
-                {"detail": "Ошибка генерации ссылки."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            code = get_code(int(pk))
+        except ValueError:
+            code = None
+        if code is None:
+            raise Http404
+        return Response(
+            {"short-link": request.build_absolute_uri(
+                reverse("short-link", kwargs={"code": code})
+            )},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["get"], permission_classes=[AllowAny])
+    def similar(self, request, pk=None):
+        """Похожие по составу рецепты из заранее посчитанных соседей."""
+        try:
+            links = list(
+                SimilarRecipe.objects.filter(recipe_id=int(pk))
+                .select_related("similar")
+                .order_by("-score", "-similar_id")
             )
-        return Response({"short-link": full_url}, status=status.HTTP_200_OK)
+        except ValueError:
+            raise Http404
+        if not links:
+            get_object_or_404(Recipe, pk=pk)
+        serializer = RecipeShortSerializer(
+            [link.similar for link in links], many=True,
+            context={"request": request},
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[AllowAny],
+        url_path="what-can-i-cook",
+    )
+    def what_can_i_cook(self, request):
+        """Рецепты по имеющимся ингредиентам, от наибольшего покрытия.
+
+        Ранжирование идёт по обратному индексу в памяти; из базы
+        выбираются только рецепты текущей страницы.
+        """
+        serializer = PantrySearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ranking = get_pantry_index().search(**serializer.validated_data)
+        paginator = RankingPaginator()
+        page = paginator.paginate_queryset(ranking, request, view=self)
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        results = []
+        for recipe_id, matched, missing in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                # Удалён после сборки индекса.
+                continue
+            recipe.matched, recipe.missing = matched, missing
+            results.append(recipe)
+        return paginator.get_paginated_response(PantryRecipeSerializer(
+            results, many=True, context={"request": request}
+        ).data)
 
     def get_queryset(self):
         queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            queryset = annotate_for_reading(queryset, self.request.user)
 
         user_id = self.kwargs.get("user_id")
         if user_id:
             return queryset.filter(author_id=user_id)
 
         if "favorites" in self.request.query_params:
-            return Recipe.objects.filter(favorited_by__user=self.request.user)
+            return queryset.filter(favorited_by__user=self.request.user)
 
         if "shopping_cart" in self.request.query_params:
-            return Recipe.objects.filter(
+            return queryset.filter(
                 in_shopping_cart_of__user=self.request.user
             )
 
@@ -0,0 +1,134 @@
+import hashlib
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+from foodgram.metrics import record_read_route
+
+STICKY_KEY = "db_router:primary:{client}"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# База для чтения в текущем HTTP-запросе. Вне запросов (команды,
+# image_worker) маршрута нет и всё идёт в основную базу.
+current_route = ContextVar("db_route", default=None)
+
+
+class Route:
+    """Изменяемый объект, чтобы запись из потока sync_to_async была
+    видна и остальному запросу."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+
+def get_read_alias():
+    route = current_route.get()
+    return route.alias if route is not None else DEFAULT_DB_ALIAS
+
+
+def is_reading_replica():
+    return get_read_alias() != DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Чтение в безопасных запросах — с реплики, всё остальное — с
+    основной базы."""
+
+    def db_for_read(self, model, **hints):
+        return get_read_alias()
+
+    def db_for_write(self, model, **hints):
+        route = current_route.get()
+        if route is not None:
+            # После записи запрос должен видеть её до конца.
+            route.alias = DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def get_sticky_keys(request):
+    """Ключи клиента: по токену и по адресу, чтобы сразу после входа
+    новый токен тоже читал из основной базы."""
+    clients = [
+        request.headers.get("Authorization"),
+        request.headers.get("X-Real-IP") or request.META.get("REMOTE_ADDR"),
+    ]
+    return [
+        STICKY_KEY.format(client=hashlib.md5(
+            client.encode(), usedforsecurity=False
+        ).hexdigest())
+        for client in clients if client
+    ]
+
+
+class ReplicaRoutingMiddleware:
+    """Выбирает базу для чтения на весь запрос.
+
+    GET, HEAD и OPTIONS читают с одной из DATABASE_REPLICAS, если клиент
+    не писал в последние DB_REPLICA_STICKY_SECONDS секунд: иначе реплика
+    могла ещё не получить его изменения, и только что добавленный в
+    избранное рецепт показался бы без отметки.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        keys = get_sticky_keys(request)
+        sticky = request.method not in SAFE_METHODS or cache.get_many(keys)
+        token = current_route.set(self.get_route(sticky))
+        try:
+            response = self.get_response(request)
+        finally:
+            current_route.reset(token)
+        if self.wrote(request, response):
+            cache.set_many(dict.fromkeys(keys, True),
+                           timeout=settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        keys = get_sticky_keys(request)
+        sticky = (request.method not in SAFE_METHODS
+                  or await cache.aget_many(keys))
+        token = current_route.set(self.get_route(sticky))
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_route.reset(token)
+        if self.wrote(request, response):
+            await cache.aset_many(dict.fromkeys(keys, True),
+                                  timeout=settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    def get_route(self, sticky):
+        alias = (
+            DEFAULT_DB_ALIAS if sticky
+            else random.choice(settings.DATABASE_REPLICAS)
+        )
+        record_read_route(alias)
+        return Route(alias)
+
+    def wrote(self, request, response):
+        return (request.method not in SAFE_METHODS
+                and response.status_code < 400)
@@ -0,0 +1,174 @@
+import os
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from recipes.images import (
+    FAILED_DIR,
+    PENDING_DIR,
+    PROCESSING_DIR,
+    get_queue_path,
+)
+
+# С несколькими воркерами gunicorn каждый процесс пишет значения в файлы
+# этого каталога, а /metrics суммирует их (см. gunicorn.conf.py).
+MULTIPROCESS_DIR = (
+    os.getenv("PROMETHEUS_MULTIPROC_DIR") if settings.METRICS_ENABLED
+    else None
+)
+if MULTIPROCESS_DIR:
+    os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUEST_LATENCY = Histogram(
+    "foodgram_request_duration_seconds",
+    "Время обработки запроса по действиям вьюсетов.",
+    ["view", "method", "status"],
+)
+REQUEST_DB_TIME = Histogram(
+    "foodgram_request_db_seconds",
+    "Время SQL-запросов внутри запроса.",
+    ["view"],
+)
+# Разность общего времени и времени SQL: сюда входят middleware,
+# маршрутизация, ожидание кэша и файлов, а не только сериализация.
+REQUEST_NON_DB_TIME = Histogram(
+    "foodgram_request_non_db_seconds",
+    "Время запроса за вычетом SQL-запросов.",
+    ["view"],
+)
+REQUEST_QUERIES = Histogram(
+    "foodgram_request_queries",
+    "Число SQL-запросов на запрос.",
+    ["view"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "foodgram_cache_requests",
+    "Обращения к кэшам: result=hit|miss.",
+    ["cache", "result"],
+)
+DB_CONNECTIONS_OPENED = Counter(
+    "foodgram_db_connections_opened",
+    "Открытые процессами соединения с базой.",
+    ["alias"],
+)
+
+DB_READ_ROUTES = Counter(
+    "foodgram_db_read_routes",
+    "Запросы по базам, из которых они читали (реплика или default).",
+    ["alias"],
+)
+
+
+def record_cache(name, hit):
+    """Без METRICS_ENABLED значения не пишутся: в многопроцессном режиме
+    каждое из них — файл в PROMETHEUS_MULTIPROC_DIR."""
+    if settings.METRICS_ENABLED:
+        CACHE_REQUESTS.labels(name, "hit" if hit else "miss").inc()
+
+
+def record_read_route(alias):
+    if settings.METRICS_ENABLED:
+        DB_READ_ROUTES.labels(alias).inc()
+
+
+def record_connection(connection, **kwargs):
+    """Приёмник connection_created: частые открытия — повод для пула."""
+    if not settings.METRICS_ENABLED or getattr(connection, "pool", None):
+        # С пулом сигнал приходит на каждую выдачу соединения из пула.
+        return
+    DB_CONNECTIONS_OPENED.labels(connection.alias).inc()
+
+
+class StateCollector:
+    """Значения, которые считаются в момент опроса, а не в процессах."""
+
+    def describe(self):
+        # Иначе реестр вызовет collect() уже при регистрации.
+        return []
+
+    def collect(self):
+        queue = GaugeMetricFamily(
+            "foodgram_image_queue_jobs",
+            "Задания на построение уменьшенных копий в очереди.",
+            labels=["state"],
+        )
+        for state in (PENDING_DIR, PROCESSING_DIR, FAILED_DIR):
+            try:
+                total = sum(
+                    name.endswith(".json") and not name.startswith(".")
+                    for name in os.listdir(get_queue_path(state))
+                )
+            except FileNotFoundError:
+                total = 0
+            queue.add_metric([state], total)
+        yield queue
+
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != "postgresql":
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT coalesce(state, 'unknown'), count(*) "
+                "FROM pg_stat_activity WHERE datname = current_database() "
+                "GROUP BY 1"
+            )
+            rows = cursor.fetchall()
+            cursor.execute("SHOW max_connections")
+            (max_connections,) = cursor.fetchone()
+        usage = GaugeMetricFamily(
+            "foodgram_db_connections",
+            "Соединения с базой по состояниям (pg_stat_activity).",
+            labels=["state"],
+        )
+        for state, total in rows:
+            usage.add_metric([state], total)
+        yield usage
+        yield GaugeMetricFamily(
+            "foodgram_db_max_connections",
+            "Предел соединений PostgreSQL.",
+            value=int(max_connections),
+        )
+
+
+if not MULTIPROCESS_DIR:
+    REGISTRY.register(StateCollector())
+
+
+def get_registry():
+    if not MULTIPROCESS_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(StateCollector())
+    return registry
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus.
+
+    Через nginx адрес не публикуется: Prometheus опрашивает контейнер
+    бэкенда напрямую. METRICS_TOKEN дополнительно требует заголовок
+    Authorization: Bearer <токен>.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(generate_latest(get_registry()),
+                        content_type=CONTENT_TYPE_LATEST)
@@ -12,7 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
+from urllib.parse import urlsplit
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
@@ -54,6 +57,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.instrumentation.MetricsMiddleware",
+    "api.instrumentation.QueryInstrumentationMiddleware",
+    "foodgram.db_router.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -94,9 +100,85 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
+        # Сколько секунд держать соединение между запросами (0 — закрывать
+        # после каждого). Под ASGI соединения привязаны к потокам, поэтому
+        # там лучше пул.
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        # Перед повторным использованием соединение проверяется, чтобы
+        # перезапуск PostgreSQL не оборачивался ошибкой в первом запросе.
+        "CONN_HEALTH_CHECKS": os.getenv(
+            "DB_CONN_HEALTH_CHECKS", "true"
+        ).lower() == "true",
+        "OPTIONS": {},
     }
 }
 
+# Пул psycopg 3: каждый процесс держит от DB_POOL_MIN_SIZE до
+# DB_POOL_MAX_SIZE соединений. Число воркеров, умноженное на
+# DB_POOL_MAX_SIZE, должно оставаться меньше max_connections PostgreSQL.
+DB_POOL = os.getenv("DB_POOL", "false").lower() == "true"
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 4)),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+    }
+    # Django не позволяет сочетать пул с постоянными соединениями.
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+
+# Реплики только для чтения: "хост[:порт][/база]" через запятую. Порт,
+# база и остальные параметры по умолчанию берутся из default.
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+    filter(None, os.getenv("DB_REPLICAS", "").split(",")), start=1
+):
+    address = urlsplit(f"//{address.strip()}")
+    alias = f"replica_{number}"
+    DATABASES[alias] = dict(
+        DATABASES["default"],
+        HOST=address.hostname,
+        PORT=str(address.port or DATABASES["default"]["PORT"] or ""),
+        NAME=address.path.lstrip("/") or DATABASES["default"]["NAME"],
+        OPTIONS=dict(DATABASES["default"]["OPTIONS"]),
+        TEST={"MIRROR": "default"},
+    )
+    DATABASE_REPLICAS.append(alias)
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["foodgram.db_router.ReplicaRouter"]
+# Сколько секунд после записи клиент читает из основной базы: должно
+# быть больше обычной задержки репликации.
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 5))
+
+# Версии снимков и страниц, отметки о недавней записи и коды коротких
+# ссылок хранятся в кэше по умолчанию. Изменение, сделанное в одном
+# процессе (воркере gunicorn, image_worker, команде manage.py), остальные
+# видят только через общий кэш: LocMemCache подходит лишь для разработки
+# в одном процессе, о нём предупреждает проверка recipes.W001.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+# Кэши, которые видит только процесс, где они созданы
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+if (
+    DATABASE_REPLICAS
+    and CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES
+):
+    # Отметка о недавней записи хранится в кэше: в кэше процесса её не
+    # увидят другие воркеры, и они сразу после записи читали бы с реплики.
+    raise ImproperlyConfigured(
+        "DB_REPLICAS требует общий кэш: задайте CACHE_BACKEND "
+        "(например, django.core.cache.backends.redis.RedisCache) "
+        "и CACHE_LOCATION."
+    )
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,12 +221,120 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Уменьшенные копии изображений и похожие рецепты считает воркер
+# process_images по заданиям из каталога-очереди; "sync" — сразу после
+# сохранения.
+IMAGE_PIPELINE_BACKEND = os.getenv("IMAGE_PIPELINE_BACKEND", "queue")
+IMAGE_QUEUE_DIR = os.getenv("IMAGE_QUEUE_DIR", BASE_DIR / "image_queue")
+
+# Учёт SQL-запросов каждого запроса к API: заголовок Server-Timing и
+# строка JSON в логгере api.queries
+QUERY_INSTRUMENTATION = os.getenv(
+    "QUERY_INSTRUMENTATION", str(DEBUG)
+).lower() == "true"
+# Сколько одинаковых запросов за один HTTP-запрос считать признаком N+1
+QUERY_DUPLICATE_THRESHOLD = int(os.getenv("QUERY_DUPLICATE_THRESHOLD", 3))
+# Превышение query_budgets представления — ошибка, а не предупреждение
+QUERY_BUDGET_STRICT = os.getenv(
+    "QUERY_BUDGET_STRICT", "false"
+).lower() == "true"
+
+# Метрики Prometheus на /metrics. Выключенные метрики не считаются. С
+# ними gunicorn собирает значения воркеров в PROMETHEUS_MULTIPROC_DIR
+# (по умолчанию /tmp/prometheus, см. gunicorn.conf.py).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+# Если задан, /metrics требует заголовок Authorization: Bearer <токен>
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api.queries": {
+            "handlers": ["console"],
+            "level": os.getenv("QUERY_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Куда команды benchmark_* складывают JSON с результатами замеров
+BENCHMARK_RESULTS_DIR = os.getenv(
+    "BENCHMARK_RESULTS_DIR", BASE_DIR / "benchmark_results"
+)
+
+# Предельный размер загружаемого изображения в байтах (после декодирования)
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv("MAX_IMAGE_UPLOAD_SIZE", 10 * 1024 * 1024)
+)
+
+# С какого размера выборки ?count=approximate берёт оценку планировщика
+APPROXIMATE_COUNT_THRESHOLD = int(
+    os.getenv("APPROXIMATE_COUNT_THRESHOLD", 10000)
+)
+
+# Сколько идентификаторов принимают пакетные избранное, покупки и подписки
+RELATION_BATCH_LIMIT = int(os.getenv("RELATION_BATCH_LIMIT", 100))
+
+# Сколько ингредиентов максимум отдаёт поиск для автодополнения
+INGREDIENT_SEARCH_LIMIT = int(os.getenv("INGREDIENT_SEARCH_LIMIT", 50))
+
+# Сколько секунд строки каталога ингредиентов живут в общем кэше
+INGREDIENT_CATALOG_CACHE_TIMEOUT = int(
+    os.getenv("INGREDIENT_CATALOG_CACHE_TIMEOUT", 60 * 60 * 24)
+)
+
+# Сколько секунд живут закэшированные страницы ленты рецептов
+RECIPE_FEED_CACHE_TIMEOUT = int(os.getenv("RECIPE_FEED_CACHE_TIMEOUT", 300))
+
+# Длина кода короткой ссылки на рецепт (62^6 ≈ 5,7·10^10 вариантов) и
+# сколько секунд код хранится в кэше редиректов
+SHORT_LINK_LENGTH = int(os.getenv("SHORT_LINK_LENGTH", 6))
+SHORT_LINK_CACHE_TIMEOUT = int(
+    os.getenv("SHORT_LINK_CACHE_TIMEOUT", 60 * 60 * 24)
+)
+
+# Сколько похожих рецептов хранится для каждого рецепта
+SIMILAR_RECIPES_COUNT = int(os.getenv("SIMILAR_RECIPES_COUNT", 10))
+
+# Поиск «что приготовить»: сколько ингредиентов можно передать в каждом
+# параметре, как часто (в секундах) воркер пересобирает обратный индекс
+# после изменения рецептов и сколько мегабайт занимают закэшированные
+# битовые маски ингредиентов (маска — число рецептов / 8 байт)
+PANTRY_MAX_INGREDIENTS = int(os.getenv("PANTRY_MAX_INGREDIENTS", 50))
+PANTRY_INDEX_REBUILD_INTERVAL = int(
+    os.getenv("PANTRY_INDEX_REBUILD_INTERVAL", 60)
+)
+PANTRY_BITMAP_CACHE_MB = int(os.getenv("PANTRY_BITMAP_CACHE_MB", 64))
+
+# TTF-шрифт с кириллицей для выгрузки списка покупок в PDF
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
+# Асинхронные обработчики GET для ингредиентов, рецептов и профилей;
+# включать при запуске под ASGI (gunicorn с воркерами uvicorn)
+ASYNC_READ_API = os.getenv("ASYNC_READ_API", "false").lower() == "true"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.StreamingJSONParser",
+        "rest_framework.parsers.FormParser",
+        "api.parsers.LimitedMultiPartParser",
+    ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
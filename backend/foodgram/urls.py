@@ -1,14 +1,27 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from recipes.models import SHORT_LINK_MAX_LENGTH
+from recipes.views import short_link_redirect
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
     path("api/auth/", include("djoser.urls.authtoken")),
+    # Без обязательного слэша: лишний редирект APPEND_SLASH не нужен.
+    re_path(
+        rf"^s/(?P<code>[0-9A-Za-z]{{1,{SHORT_LINK_MAX_LENGTH}}})/?$",
+        short_link_redirect,
+        name="short-link",
+    ),
 ]
 
+if settings.METRICS_ENABLED:
+    from .metrics import metrics_view
+
+    urlpatterns.append(path("metrics", metrics_view, name="metrics"))
 
 if settings.DEBUG:
     urlpatterns += static(
@@ -0,0 +1,28 @@
+# Настройки gunicorn; файл подхватывается из рабочего каталога /app.
+import glob
+import os
+
+# Общий каталог метрик нужен только с METRICS_ENABLED. prometheus_client
+# выбирает многопроцессный режим по переменной при импорте, поэтому она
+# ставится до того, как воркеры загрузят приложение.
+METRICS_DIR = None
+if os.getenv("METRICS_ENABLED", "false").lower() == "true":
+    METRICS_DIR = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus"
+    )
+
+
+def on_starting(server):
+    """Убирает значения метрик, оставшиеся от прошлого запуска."""
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        for path in glob.glob(os.path.join(METRICS_DIR, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    """Гистограммы умершего воркера остаются, его gauge — нет."""
+    if METRICS_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.db.models import Count
 
+from users.models import User
+
+from .counters import change_counter
 from .models import (
     FavoriteRecipe,
     Ingredient,
@@ -7,6 +11,8 @@ from .models import (
     RecipeIngredientLink,
     ShoppingListEntry,
 )
+from .pantry import invalidate_pantry
+from .similar import forget_similar, refresh_similar
 
 
 @admin.register(Ingredient)
@@ -34,11 +40,38 @@ class DishAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientInline,)
     empty_value_display = "-пусто-"
 
-    @admin.display(description="Количество в избранном")
+    @admin.display(description="Количество в избранном",
+                   ordering="favorites_count")
     def favorite_count(self, obj):
-        return obj.favorited_by.count()
+        return obj.favorites_count
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Как в API: счётчик рецептов автора меняется вместе с рецептом.
+        if not change:
+            change_counter(User, obj.author_id, "recipes_count", 1)
+        elif "author" in form.changed_data:
+            change_counter(User, form.initial["author"], "recipes_count", -1)
+            change_counter(User, obj.author_id, "recipes_count", 1)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_similar(form.instance.pk)
+        invalidate_pantry()
+
+    def delete_model(self, request, obj):
+        forget_similar(obj.pk)
+        invalidate_pantry()
+        super().delete_model(request, obj)
+        change_counter(User, obj.author_id, "recipes_count", -1)
 
-    favorite_count.short_description = "Количество в избранном"
+    def delete_queryset(self, request, queryset):
+        deleted = list(
+            queryset.order_by().values_list("author").annotate(Count("pk"))
+        )
+        super().delete_queryset(request, queryset)
+        for author_id, total in deleted:
+            change_counter(User, author_id, "recipes_count", -total)
 
 
 @admin.register(RecipeIngredientLink)
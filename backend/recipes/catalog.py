@@ -0,0 +1,126 @@
+import time
+from array import array
+from bisect import bisect_left
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram.metrics import record_cache
+
+VERSION_KEY = "ingredient_catalog:version"
+ROWS_KEY = "ingredient_catalog:rows:{version}"
+PREFIX_END = "\U0010ffff"
+
+
+class CatalogSnapshot:
+    """Отсортированный неизменяемый снимок каталога ингредиентов.
+
+    Названия хранятся в нижнем регистре в отдельном отсортированном
+    списке, поэтому поиск по началу названия — это два bisect.
+    """
+
+    def __init__(self, version, rows):
+        rows = sorted(rows, key=lambda row: (row[1].casefold(), row[1],
+                                             row[0]))
+        self.version = version
+        self.ids = array("q", (row[0] for row in rows))
+        self.keys = [row[1].casefold() for row in rows]
+        self.items = [
+            {"id": pk, "name": name, "measurement_unit": unit}
+            for pk, name, unit in rows
+        ]
+        self.positions = {pk: index for index, pk in enumerate(self.ids)}
+
+    def search(self, prefix, limit=None):
+        if not prefix:
+            return self.items
+        prefix = prefix.casefold()
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + PREFIX_END, lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.items[start:end]
+
+    def get(self, pk):
+        index = self.positions.get(pk)
+        return None if index is None else self.items[index]
+
+
+_snapshot = None
+
+
+def _load_rows():
+    from recipes.models import Ingredient
+
+    return list(
+        Ingredient.objects.order_by().values_list(
+            "id", "name", "measurement_unit"
+        )
+    )
+
+
+def get_catalog_version():
+    """Версия каталога — время его последнего изменения в наносекундах.
+
+    По ней строятся валидаторы ответов, которые показывают названия и
+    единицы измерения ингредиентов, без сборки снимка.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def get_catalog():
+    """Возвращает снимок каталога текущей версии.
+
+    Снимок живёт в памяти воркера; строки для его сборки берутся из
+    общего кэша и только при промахе — из базы.
+    """
+    global _snapshot
+
+    version = get_catalog_version()
+    if _snapshot is not None and _snapshot.version == version:
+        record_cache("ingredient_snapshot", True)
+        return _snapshot
+    record_cache("ingredient_snapshot", False)
+
+    rows_key = ROWS_KEY.format(version=version)
+    rows = cache.get(rows_key)
+    record_cache("ingredient_rows", rows is not None)
+    if rows is None:
+        rows = _load_rows()
+        cache.set(rows_key, rows,
+                  timeout=settings.INGREDIENT_CATALOG_CACHE_TIMEOUT)
+    _snapshot = CatalogSnapshot(version, rows)
+    return _snapshot
+
+
+async def aget_catalog():
+    """get_catalog() для асинхронных обработчиков.
+
+    Пока версия не сменилась, снимок берётся из памяти без потоков;
+    пересборка выполняется синхронным кодом в пуле потоков.
+    """
+    version = await cache.aget(VERSION_KEY)
+    if _snapshot is not None and _snapshot.version == version:
+        record_cache("ingredient_snapshot", True)
+        return _snapshot
+    return await sync_to_async(get_catalog)()
+
+
+def bump_catalog_version():
+    """Сразу меняет версию каталога и возвращает её; изменения вне
+    транзакций сбрасывает invalidate_catalog()."""
+    version = time.time_ns()
+    cache.set(VERSION_KEY, version, timeout=None)
+    return version
+
+
+def invalidate_catalog():
+    """Сбрасывает снимки во всех воркерах после фиксации транзакции."""
+    transaction.on_commit(bump_catalog_version)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Версии кэшей сбрасываются записью в кэш по умолчанию, и другие
+    процессы видят сброс, только если кэш у них общий."""
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.DEBUG or backend not in settings.PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Warning(
+            f"Кэш по умолчанию ({backend.rsplit('.', 1)[-1]}) свой у "
+            "каждого процесса: после изменения в одном процессе остальные "
+            "воркеры, image_worker и команды manage.py продолжат отдавать "
+            "устаревшие страницы ленты рецептов, снимок каталога "
+            "ингредиентов и индекс «что приготовить».",
+            hint="Задайте общий кэш: CACHE_BACKEND="
+                 "django.core.cache.backends.redis.RedisCache и "
+                 "CACHE_LOCATION.",
+            id="recipes.W001",
+        )
+    ]
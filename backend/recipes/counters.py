@@ -0,0 +1,48 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import User, UserSubscription
+
+from .models import FavoriteRecipe, Recipe, ShoppingListEntry
+
+# (модель, поле-счётчик, что считаем, внешний ключ на модель)
+COUNTERS = (
+    (Recipe, "favorites_count", FavoriteRecipe, "recipe"),
+    (Recipe, "cart_count", ShoppingListEntry, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", UserSubscription, "author"),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик в базе, не опуская его ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def actual_count(source, foreign_key):
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{foreign_key: OuterRef("pk")})
+            .order_by()
+            .values(foreign_key)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def reconcile_counters():
+    """Пересчитывает разошедшиеся счётчики одним UPDATE на каждый.
+
+    Возвращает число исправленных строк по каждому счётчику.
+    """
+    fixed = {}
+    for model, field, source, foreign_key in COUNTERS:
+        count = actual_count(source, foreign_key)
+        fixed[f"{model.__name__}.{field}"] = (
+            model.objects.exclude(**{field: count}).update(**{field: count})
+        )
+    return fixed
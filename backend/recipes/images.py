@@ -0,0 +1,194 @@
+import json
+import os
+import uuid
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+# Размеры уменьшенных копий по моделям и полям: имя -> (ширина, высота).
+RENDITIONS = {
+    "recipes.recipe": {
+        "image": {"thumbnail": (320, 320), "medium": (960, 960)},
+    },
+    "users.user": {
+        "avatar": {"thumbnail": (160, 160)},
+    },
+}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+DEFAULT_FORMAT = "jpeg"
+SYNC_BACKEND = "sync"
+# Задания очереди: копии изображения или пересчёт похожих рецептов.
+RENDITIONS_TASK = "renditions"
+SIMILAR_TASK = "similar"
+PENDING_DIR = "pending"
+PROCESSING_DIR = "processing"
+FAILED_DIR = "failed"
+
+
+def get_queue_path(*parts):
+    return os.path.join(settings.IMAGE_QUEUE_DIR, *parts)
+
+
+def get_rendition(renditions, source, size, fmt=DEFAULT_FORMAT):
+    """Имя файла копии или None, если копии для этого оригинала ещё нет."""
+    if not renditions or renditions.get("source") != source:
+        return None
+    return renditions.get(size, {}).get(fmt)
+
+
+def enqueue(instance, field_name):
+    """Ставит построение копий в очередь после фиксации транзакции.
+
+    Pillow не работает внутри запроса: задание выполняет воркер
+    process_images, а бэкенд sync строит копии сразу (для отладки).
+    """
+    schedule({
+        "task": RENDITIONS_TASK,
+        "model": instance._meta.label_lower,
+        "pk": instance.pk,
+        "field": field_name,
+        "source": getattr(instance, field_name).name,
+    })
+
+
+def schedule(job):
+    """После фиксации транзакции пишет задание в очередь, а с бэкендом
+    sync выполняет его сразу."""
+    if settings.IMAGE_PIPELINE_BACKEND == SYNC_BACKEND:
+        transaction.on_commit(lambda: run_job(job))
+    else:
+        transaction.on_commit(lambda: write_job(job))
+
+
+def write_job(job):
+    pending = get_queue_path(PENDING_DIR)
+    os.makedirs(pending, exist_ok=True)
+    # По префиксу воркер отличает задания, не читая файлы.
+    name = f"{job['task']}-{uuid.uuid4().hex}.json"
+    temporary = os.path.join(pending, f".{name}")
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(job, file)
+    os.replace(temporary, os.path.join(pending, name))
+
+
+def claim_jobs():
+    """Забирает задания из очереди; rename гарантирует одного владельца."""
+    pending = get_queue_path(PENDING_DIR)
+    processing = get_queue_path(PROCESSING_DIR)
+    os.makedirs(processing, exist_ok=True)
+    try:
+        names = sorted(
+            name for name in os.listdir(pending)
+            if name.endswith(".json") and not name.startswith(".")
+        )
+    except FileNotFoundError:
+        return []
+    claimed = []
+    for name in names:
+        path = os.path.join(processing, name)
+        try:
+            os.rename(os.path.join(pending, name), path)
+        except FileNotFoundError:
+            continue
+        claimed.append(path)
+    return claimed
+
+
+def run_job_file(path):
+    """Выполняет задание из файла; упавшие переносятся в failed/."""
+    try:
+        with open(path, encoding="utf-8") as file:
+            job = json.load(file)
+        run_job(job)
+    except Exception:
+        failed = get_queue_path(FAILED_DIR)
+        os.makedirs(failed, exist_ok=True)
+        os.replace(path, os.path.join(failed, os.path.basename(path)))
+        raise
+    os.remove(path)
+
+
+def is_similar_job(path):
+    return os.path.basename(path).startswith(f"{SIMILAR_TASK}-")
+
+
+def run_job(job):
+    if job.get("task") == SIMILAR_TASK:
+        # similar сам ставит задания через этот модуль.
+        from .similar import run_job as run_similar_job
+
+        run_similar_job(job)
+    else:
+        process_job(job)
+
+
+def render(source, size, fmt):
+    """Уменьшенная копия без EXIF, ICC-профиля и прочих метаданных."""
+    image = ImageOps.exif_transpose(source)
+    image.thumbnail(size, Image.Resampling.LANCZOS)
+    pil_format, options = FORMATS[fmt]
+    has_alpha = image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+    if has_alpha and pil_format == "JPEG":
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    else:
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    image.info = {}
+    output = BytesIO()
+    image.save(output, pil_format, **options)
+    return output.getvalue()
+
+
+def process_job(job):
+    model = apps.get_model(job["model"])
+    field_name = job["field"]
+    instance = model.objects.filter(pk=job["pk"]).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, field_name)
+    if not field_file or field_file.name != job["source"]:
+        return
+
+    renditions_field = f"{field_name}_renditions"
+    previous = getattr(instance, renditions_field) or {}
+    storage = field_file.storage
+    stem = PurePosixPath(field_file.name).with_suffix("")
+    renditions = {"source": field_file.name}
+    with field_file.open("rb"), Image.open(field_file) as source:
+        source.load()
+        for size_name, size in RENDITIONS[job["model"]][field_name].items():
+            renditions[size_name] = {}
+            for fmt in FORMATS:
+                name = f"renditions/{stem}.{size_name}.{fmt}"
+                if storage.exists(name):
+                    storage.delete(name)
+                renditions[size_name][fmt] = storage.save(
+                    name, ContentFile(render(source, size, fmt))
+                )
+
+    current = {
+        name for formats in renditions.values() if isinstance(formats, dict)
+        for name in formats.values()
+    }
+    for formats in previous.values():
+        if isinstance(formats, dict):
+            for name in set(formats.values()) - current:
+                storage.delete(name)
+
+    setattr(instance, renditions_field, renditions)
+    update_fields = [renditions_field]
+    if any(field.name == "updated_at" for field in model._meta.fields):
+        update_fields.append("updated_at")
+    instance.save(update_fields=update_fields)
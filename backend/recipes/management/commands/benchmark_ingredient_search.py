@@ -0,0 +1,96 @@
+import json
+import os
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from api.views import IngredientViewSet
+from recipes.catalog import ROWS_KEY, bump_catalog_version, invalidate_catalog
+from recipes.models import Ingredient
+
+DATA_PATH = os.path.join(settings.BASE_DIR, "data", "ingredients.json")
+BATCH_SIZE = 5000
+
+
+class Rollback(Exception):
+    """Откатывает синтетический каталог после замеров."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет задержку /api/ingredients/ на синтетическом каталоге. "
+        "Все созданные данные откатываются после замеров."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=100_000)
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        version = None
+        try:
+            with transaction.atomic():
+                names = self.create_catalog(options["size"])
+                # bulk_create не шлёт сигналов, а on_commit до отката не
+                # дойдёт: без новой версии ?name= искал бы по снимку,
+                # собранному до синтетических строк.
+                version = bump_catalog_version()
+                for param in ("name", "search"):
+                    self.measure(param, names, options["requests"])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # Снимок откаченных строк не должен остаться в общем кэше.
+            if version is not None:
+                cache.delete(ROWS_KEY.format(version=version))
+            invalidate_catalog()
+
+    def create_catalog(self, size):
+        with open(DATA_PATH, "r", encoding="utf-8") as file:
+            base_names = [item["fields"]["name"] for item in json.load(file)]
+
+        names = []
+        batch = []
+        for number in range(size):
+            name = f"{random.choice(base_names)} {number}"[:128]
+            names.append(name)
+            batch.append(Ingredient(name=name, measurement_unit="г"))
+            if len(batch) == BATCH_SIZE:
+                Ingredient.objects.bulk_create(batch)
+                batch = []
+        Ingredient.objects.bulk_create(batch)
+        self.stdout.write(f"Каталог: {Ingredient.objects.count()} записей.")
+        return names
+
+    def measure(self, param, names, total):
+        factory = APIRequestFactory()
+        view = IngredientViewSet.as_view({"get": "list"})
+        timings = []
+        for _ in range(total):
+            name = random.choice(names)
+            length = random.randint(1, 5)
+            if param == "search":
+                start = random.randint(0, max(len(name) - length, 0))
+                query = name[start:start + length]
+            else:
+                query = name[:length]
+            request = factory.get("/api/ingredients/", {param: query})
+            started = time.perf_counter()
+            view(request).render()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(self.style.SUCCESS(
+            f"?{param}=: p50={percentiles[49]:.2f} мс, "
+            f"p95={percentiles[94]:.2f} мс, "
+            f"p99={percentiles[98]:.2f} мс ({total} запросов)"
+        ))
@@ -0,0 +1,217 @@
+import json
+import os
+import random
+import shutil
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from recipes.models import MAX_COOKING_TIME, MIN_COOKING_TIME
+
+from .load_data import DATA_DIR, iter_json_array
+
+GENERATED_DIR = os.path.join(DATA_DIR, "generated")
+# За какой период разбрасываются даты публикации и подписок
+DATE_SPREAD = timedelta(days=365)
+
+
+class FixtureWriter:
+    """Пишет JSON-массив в формате dumpdata по одному элементу."""
+
+    def __init__(self, directory, name, model):
+        self.file = open(os.path.join(directory, f"{name}.json"), "w",
+                         encoding="utf-8")
+        self.model = model
+        self.total = 0
+
+    def __enter__(self):
+        self.file.write("[\n")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.write("\n]\n")
+        self.file.close()
+
+    def write(self, fields):
+        if self.total:
+            self.file.write(",\n")
+        self.total += 1
+        json.dump(
+            {"model": self.model, "pk": self.total, "fields": fields},
+            self.file, ensure_ascii=False,
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует синтетические фикстуры заданного объёма на основе "
+        f"{DATA_DIR}. Результат загружается командой "
+        "load_data --data-dir <каталог>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=GENERATED_DIR)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument(
+            "--ingredients-per-recipe", type=int, nargs=2,
+            default=(3, 12), metavar=("MIN", "MAX"),
+        )
+        parser.add_argument("--favorites", type=int, default=50000)
+        parser.add_argument("--shopping-cart", type=int, default=20000)
+        parser.add_argument("--subscriptions", type=int, default=20000)
+        parser.add_argument(
+            "--password", default="benchmark",
+            help="Пароль всех сгенерированных пользователей.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        users, recipes = options["users"], options["recipes"]
+        if users < 2 or recipes < 1:
+            raise CommandError("Нужно хотя бы 2 пользователя и 1 рецепт.")
+        low, high = options["ingredients_per_recipe"]
+        if not 1 <= low <= high:
+            raise CommandError("Некорректное число ингредиентов в рецепте.")
+        for name, total, space in (
+            ("favorites", options["favorites"], users * recipes),
+            ("shopping-cart", options["shopping_cart"], users * recipes),
+            ("subscriptions", options["subscriptions"],
+             users * (users - 1)),
+        ):
+            if total > space // 2:
+                raise CommandError(
+                    f"--{name}: слишком много пар для {users} пользователей "
+                    f"и {recipes} рецептов."
+                )
+
+        output = options["output"]
+        os.makedirs(output, exist_ok=True)
+        seed = {
+            name: [item["fields"] for item in iter_json_array(
+                os.path.join(DATA_DIR, f"{name}.json")
+            )]
+            for name in ("users", "recipes")
+        }
+        shutil.copy(os.path.join(DATA_DIR, "ingredients.json"), output)
+        ingredient_ids = [
+            item["pk"] for item in iter_json_array(
+                os.path.join(output, "ingredients.json")
+            )
+        ]
+        if len(ingredient_ids) < high:
+            raise CommandError("В каталоге меньше ингредиентов, чем нужно.")
+
+        now = timezone.now()
+        self.write_users(output, users, seed["users"], options["password"],
+                         now)
+        self.write_recipes(output, recipes, users, seed["recipes"], now)
+        self.write_recipe_ingredients(output, recipes, ingredient_ids,
+                                      low, high)
+        for name, model, total in (
+            ("favorites", "recipes.favoriterecipe", options["favorites"]),
+            ("shopping_cart", "recipes.shoppinglistentry",
+             options["shopping_cart"]),
+        ):
+            self.write_pairs(
+                output, name, model, total,
+                lambda: (random.randint(1, users),
+                         random.randint(1, recipes)),
+                ("user", "recipe"), "added_at", now,
+            )
+        self.write_pairs(
+            output, "subscriptions", "users.usersubscription",
+            options["subscriptions"], lambda: random.sample(
+                range(1, users + 1), 2
+            ),
+            ("user", "author"), "created", now,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Фикстуры записаны в {output}. Загрузка: "
+            f"python manage.py load_data --data-dir {output}"
+        ))
+
+    def report(self, name, total):
+        self.stdout.write(f"{name}: {total} записей.")
+
+    def random_date(self, now):
+        return (now - DATE_SPREAD * random.random()).isoformat()
+
+    def write_users(self, output, total, seed_users, password, now):
+        # Хэш считается один раз: это самая дорогая часть генерации.
+        password = make_password(password)
+        with FixtureWriter(output, "users", "users.user") as writer:
+            for number in range(1, total + 1):
+                template = random.choice(seed_users)
+                joined = self.random_date(now)
+                writer.write({
+                    "password": password,
+                    "last_login": None,
+                    "is_superuser": False,
+                    "is_staff": False,
+                    "is_active": True,
+                    "date_joined": joined,
+                    "email": f"user{number}@example.com",
+                    "username": f"user{number}",
+                    "first_name": template["first_name"],
+                    "last_name": template["last_name"],
+                    "avatar": template.get("avatar") or "",
+                    "updated_at": joined,
+                })
+        self.report("users", total)
+
+    def write_recipes(self, output, total, users, seed_recipes, now):
+        with FixtureWriter(output, "recipes", "recipes.recipe") as writer:
+            for number in range(1, total + 1):
+                template = random.choice(seed_recipes)
+                published = self.random_date(now)
+                writer.write({
+                    "author": random.randint(1, users),
+                    "name": f"{template['name']} {number}",
+                    "image": template["image"],
+                    "text": template["text"],
+                    "cooking_time": random.randint(
+                        MIN_COOKING_TIME, min(MAX_COOKING_TIME, 240)
+                    ),
+                    "pub_date": published,
+                    "updated_at": published,
+                })
+        self.report("recipes", total)
+
+    def write_recipe_ingredients(self, output, recipes, ingredient_ids,
+                                 low, high):
+        with FixtureWriter(output, "recipe_ingredients",
+                           "recipes.recipeingredientlink") as writer:
+            for recipe in range(1, recipes + 1):
+                count = random.randint(low, high)
+                for ingredient in random.sample(ingredient_ids, count):
+                    writer.write({
+                        "recipe": recipe,
+                        "ingredient": ingredient,
+                        "amount": random.randint(1, 500),
+                    })
+        self.report("recipe_ingredients", writer.total)
+
+    def write_pairs(self, output, name, model, total, make_pair, fields,
+                    date_field, now):
+        """Пишет total уникальных пар (например, пользователь и рецепт)."""
+        seen = set()
+
+        def unique_pairs():
+            while True:
+                pair = tuple(make_pair())
+                if pair not in seen:
+                    seen.add(pair)
+                    yield pair
+
+        with FixtureWriter(output, name, model) as writer:
+            for pair in islice(unique_pairs(), total):
+                writer.write({
+                    **dict(zip(fields, pair)),
+                    date_field: self.random_date(now),
+                })
+        self.report(name, total)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.short_links import generate_missing, warm_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт короткие ссылки для рецептов, у которых их ещё нет. "
+        "С --warm-cache все коды заодно загружаются в кэш редиректов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--warm-cache", action="store_true")
+
+    def handle(self, *args, **options):
+        created = generate_missing(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Создано ссылок: {created}"))
+        if options["warm_cache"]:
+            cached = warm_cache(options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Загружено в кэш: {cached}"
+            ))
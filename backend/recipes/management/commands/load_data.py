@@ -0,0 +1,328 @@
+import csv
+import io
+import json
+import os
+from contextlib import contextmanager
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from api.feed_cache import invalidate_feed
+from recipes.catalog import invalidate_catalog
+from recipes.counters import reconcile_counters
+from recipes.models import RecipeIngredientLink
+from recipes.pantry import invalidate_pantry
+from recipes.similar import rebuild
+
+DATA_DIR = os.path.join(settings.BASE_DIR, "data")
+READ_CHUNK_SIZE = 64 * 1024
+COPY_NULL = r"\N"
+
+# Порядок важен: сначала таблицы, на которые ссылаются остальные.
+FIXTURES = (
+    ("ingredients", "recipes.Ingredient"),
+    ("users", "users.User"),
+    ("recipes", "recipes.Recipe"),
+    ("recipe_ingredients", "recipes.RecipeIngredientLink"),
+    ("favorites", "recipes.FavoriteRecipe"),
+    ("shopping_cart", "recipes.ShoppingListEntry"),
+    ("subscriptions", "users.UserSubscription"),
+)
+
+
+def iter_json_array(path):
+    """Читает JSON-массив по одному элементу, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as file:
+        buffer = file.read(READ_CHUNK_SIZE).lstrip()
+        if not buffer.startswith("["):
+            raise CommandError(f"Ожидался JSON-массив: {path}")
+        buffer = buffer[1:]
+        while True:
+            buffer = buffer.lstrip(" \t\r\n,")
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError as error:
+                chunk = file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise CommandError(f"Ошибка чтения {path}: {error}")
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            yield item
+
+
+@contextmanager
+def keep_timestamps(model):
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из файла."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False)
+        or getattr(field, "auto_now_add", False)
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield fields
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def get_conflict_fields(model):
+    """Естественный ключ модели из UniqueConstraint, иначе pk."""
+    for constraint in model._meta.constraints:
+        if isinstance(constraint, models.UniqueConstraint) and not (
+            constraint.condition or constraint.expressions
+        ):
+            return list(constraint.fields)
+    return [model._meta.pk.name]
+
+
+def get_update_fields(model, conflict_fields):
+    """Поля, которые --update перезаписывает у существующей записи.
+
+    Служебные поля (editable=False) — копии изображений, счётчики, дата
+    изменения — остаются как есть; даты создания берутся из фикстуры.
+    Пустой список (все поля входят в ключ, как у ингредиентов) значит,
+    что обновлять нечего и конфликт достаточно пропустить.
+    """
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in conflict_fields
+        and (field.editable or getattr(field, "auto_now_add", False))
+    ]
+
+
+def get_copy_value(obj, field):
+    """Значение поля в виде, понятном COPY ... FORMAT csv."""
+    value = getattr(obj, field.attname)
+    if value is None:
+        return COPY_NULL
+    if isinstance(field, models.JSONField):
+        # get_db_prep_save() вернул бы адаптер драйвера, а не текст.
+        return json.dumps(value, cls=field.encoder)
+    value = field.get_db_prep_save(value, connection)
+    return COPY_NULL if value is None else value
+
+
+class Command(BaseCommand):
+    help = (
+        f"Загружает фикстуры из {DATA_DIR} пакетами. "
+        "Существующие записи пропускаются или обновляются (--update), "
+        "поэтому команду можно запускать повторно. Кэши ленты и каталога, "
+        "индекс «что приготовить» и похожие рецепты обновляются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "fixtures", nargs="*",
+            help="Фикстуры для загрузки (по умолчанию все): "
+                 + ", ".join(name for name, _ in FIXTURES),
+        )
+        parser.add_argument("--data-dir", default=DATA_DIR)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--update", action="store_true",
+            help="Обновлять существующие записи вместо пропуска.",
+        )
+        parser.add_argument(
+            "--copy", action="store_true",
+            help="Загружать через COPY во временную таблицу (PostgreSQL).",
+        )
+
+    def handle(self, *args, **options):
+        known = dict(FIXTURES)
+        selected = options["fixtures"] or list(known)
+        unknown = sorted(set(selected) - set(known))
+        if unknown:
+            raise CommandError(f"Неизвестные фикстуры: {', '.join(unknown)}")
+        if options["copy"] and connection.vendor != "postgresql":
+            raise CommandError("--copy доступен только для PostgreSQL.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть больше нуля.")
+
+        loaded = []
+        for name, label in FIXTURES:
+            if name not in selected:
+                continue
+            path = os.path.join(options["data_dir"], f"{name}.json")
+            if not os.path.exists(path):
+                self.stdout.write(
+                    self.style.WARNING(f"Файл не найден: {path}")
+                )
+                continue
+            model = apps.get_model(label)
+            self.stdout.write(self.style.NOTICE(f"{name}: загрузка..."))
+            with transaction.atomic(), keep_timestamps(model) as auto_fields:
+                objects = self.iter_objects(path, model, auto_fields)
+                if options["copy"]:
+                    total = self.copy_objects(model, objects,
+                                              options["update"])
+                else:
+                    total = self.insert_objects(
+                        name, model, objects,
+                        options["batch_size"], options["update"],
+                    )
+            loaded.append(model)
+            self.stdout.write(
+                self.style.SUCCESS(f"{name}: обработано {total} записей.")
+            )
+
+        if not loaded:
+            return
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), loaded):
+                cursor.execute(sql)
+        drift = reconcile_counters()
+        if any(drift.values()):
+            self.stdout.write(f"Пересчитаны счётчики: {drift}")
+        # bulk_create не шлёт post_save: кэши и производные данные,
+        # которые обычно обновляют сигналы и API, сбрасываются здесь.
+        invalidate_catalog()
+        invalidate_feed()
+        if RecipeIngredientLink in loaded:
+            invalidate_pantry()
+            total = rebuild(options["batch_size"])
+            self.stdout.write(f"Пересчитаны похожие рецепты: {total} пар.")
+
+    def iter_objects(self, path, model, auto_fields):
+        """Строит несохранённые объекты модели из элементов фикстуры.
+
+        Поддерживается и формат dumpdata ({"pk", "fields"}), и плоский.
+        """
+        now = timezone.now()
+        for item in iter_json_array(path):
+            values = {}
+            if "pk" in item:
+                values[model._meta.pk.attname] = item["pk"]
+            for name, value in item.get("fields", item).items():
+                if name in ("model", "pk"):
+                    continue
+                field = model._meta.get_field(name)
+                if field.many_to_many:
+                    continue
+                if isinstance(value, str) and not field.is_relation:
+                    value = value.strip()
+                values[field.attname] = (
+                    value if field.is_relation else field.to_python(value)
+                )
+            for field in auto_fields:
+                values.setdefault(field.attname, now)
+            yield model(**values)
+
+    def insert_objects(self, name, model, objects, batch_size, update):
+        conflict_fields = get_conflict_fields(model)
+        update_fields = get_update_fields(model, conflict_fields)
+        if update and update_fields:
+            options = {
+                "update_conflicts": True,
+                "unique_fields": conflict_fields,
+                "update_fields": [field.name for field in update_fields],
+            }
+        else:
+            options = {"ignore_conflicts": True}
+
+        total = 0
+        while batch := list(islice(objects, batch_size)):
+            model.objects.bulk_create(batch, batch_size=batch_size,
+                                      **options)
+            total += len(batch)
+            self.stdout.write(f"{name}: {total}...")
+        return total
+
+    def copy_objects(self, model, objects, update):
+        """COPY во временную таблицу и один INSERT ... ON CONFLICT из неё."""
+        quote = connection.ops.quote_name
+        fields = model._meta.concrete_fields
+        columns = ", ".join(quote(field.column) for field in fields)
+        table = quote(model._meta.db_table)
+        temp = quote(f"load_{model._meta.db_table}")
+        conflict_fields = get_conflict_fields(model)
+        update_fields = get_update_fields(model, conflict_fields)
+        if update and update_fields:
+            conflict_columns = [
+                model._meta.get_field(name).column
+                for name in conflict_fields
+            ]
+            assignments = ", ".join(
+                f"{quote(field.column)} = EXCLUDED.{quote(field.column)}"
+                for field in update_fields
+            )
+            conflict = (
+                f"ON CONFLICT ({', '.join(map(quote, conflict_columns))}) "
+                f"DO UPDATE SET {assignments}"
+            )
+        else:
+            conflict = "ON CONFLICT DO NOTHING"
+
+        total = 0
+
+        def csv_chunks():
+            nonlocal total
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for obj in objects:
+                writer.writerow([get_copy_value(obj, field)
+                                 for field in fields])
+                total += 1
+                if buffer.tell() >= READ_CHUNK_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+
+        copy_sql = (
+            f"COPY {temp} ({columns}) FROM STDIN "
+            f"WITH (FORMAT csv, NULL '{COPY_NULL}')"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE {temp} (LIKE {table}) ON COMMIT DROP"
+            )
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, "copy_expert"):
+                # psycopg2 читает из файлоподобного объекта.
+                raw_cursor.copy_expert(copy_sql, _ChunkReader(csv_chunks()))
+            else:
+                with raw_cursor.copy(copy_sql) as copy:
+                    for chunk in csv_chunks():
+                        copy.write(chunk)
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) "
+                f"SELECT {columns} FROM {temp} {conflict}"
+            )
+            # ON COMMIT DROP не срабатывает, если команду вызвали внутри
+            # внешней транзакции (call_command в тестах).
+            cursor.execute(f"DROP TABLE {temp}")
+        return total
+
+
+class _ChunkReader(io.TextIOBase):
+    """Файлоподобная обёртка над генератором строк для copy_expert."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.pending) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.pending += chunk
+        if size < 0:
+            size = len(self.pending)
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
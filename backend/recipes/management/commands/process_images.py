@@ -0,0 +1,119 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipes.images import (
+    PENDING_DIR,
+    PROCESSING_DIR,
+    RENDITIONS,
+    claim_jobs,
+    enqueue,
+    get_queue_path,
+    is_similar_job,
+    run_job_file,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит уменьшенные копии изображений и пересчитывает похожие "
+        "рецепты по заданиям из очереди"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Число процессов Pillow (1 — в текущем процессе).",
+        )
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="Пауза между проверками очереди, секунды.")
+        parser.add_argument("--once", action="store_true",
+                            help="Разобрать очередь и завершиться.")
+        parser.add_argument(
+            "--backfill", action="store_true",
+            help="Поставить в очередь изображения без актуальных копий.",
+        )
+        parser.add_argument(
+            "--requeue-stale", action="store_true",
+            help="Вернуть в очередь задания, брошенные упавшим воркером.",
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue_stale"]:
+            self.requeue_stale()
+        if options["backfill"]:
+            self.backfill()
+
+        pool = None
+        if options["workers"] > 1:
+            connections.close_all()
+            pool = ProcessPoolExecutor(options["workers"],
+                                       initializer=django.setup)
+        try:
+            while True:
+                jobs = claim_jobs()
+                if jobs:
+                    self.run(jobs, pool)
+                elif options["once"]:
+                    break
+                else:
+                    time.sleep(options["interval"])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def run(self, jobs, pool):
+        # Пересчёт похожих рецептов идёт по одному в этом процессе:
+        # параллельные задания заменяли бы одни и те же списки соседей.
+        similar = [path for path in jobs if is_similar_job(path)]
+        images = [path for path in jobs if not is_similar_job(path)]
+        if pool is None:
+            results = [self.call(run_job_file, path) for path in images]
+        else:
+            futures = [pool.submit(run_job_file, path) for path in images]
+            results = [self.call(future.result) for future in futures]
+        results += [self.call(run_job_file, path) for path in similar]
+        done = sum(results)
+        self.stdout.write(f"Обработано заданий: {done}, с ошибкой: "
+                          f"{len(results) - done}.")
+
+    def call(self, func, *args):
+        try:
+            func(*args)
+        except Exception as error:
+            self.stderr.write(self.style.ERROR(f"Ошибка задания: {error}"))
+            return False
+        return True
+
+    def requeue_stale(self):
+        processing = get_queue_path(PROCESSING_DIR)
+        if not os.path.isdir(processing):
+            return
+        os.makedirs(get_queue_path(PENDING_DIR), exist_ok=True)
+        for name in os.listdir(processing):
+            os.replace(os.path.join(processing, name),
+                       get_queue_path(PENDING_DIR, name))
+
+    def backfill(self):
+        queued = 0
+        for label, fields in RENDITIONS.items():
+            model = apps.get_model(label)
+            for field_name in fields:
+                objects = model.objects.exclude(
+                    **{field_name: ""}
+                ).exclude(**{f"{field_name}__isnull": True}).only(
+                    "pk", field_name, f"{field_name}_renditions"
+                )
+                for instance in objects.iterator():
+                    field_file = getattr(instance, field_name)
+                    renditions = getattr(instance,
+                                         f"{field_name}_renditions")
+                    if renditions.get("source") != field_file.name:
+                        enqueue(instance, field_name)
+                        queued += 1
+        self.stdout.write(f"Поставлено в очередь: {queued}.")
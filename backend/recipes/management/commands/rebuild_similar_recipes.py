@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.similar import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Полностью пересчитывает похожие рецепты (SIMILAR_RECIPES_COUNT "
+        "ближайших по составу для каждого). После изменения рецепта "
+        "соседи обновляются сами, load_data пересчитывает всё после "
+        "загрузки; команда нужна, если данные меняли в обход них."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = rebuild(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Сохранено пар: {total} "
+            f"за {time.perf_counter() - started:.1f} с"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет счётчики избранного, корзины, рецептов и подписчиков "
+        "с фактическими данными и исправляет расхождения."
+    )
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            fixed = reconcile_counters()
+        for counter, rows in fixed.items():
+            style = self.style.WARNING if rows else self.style.SUCCESS
+            self.stdout.write(style(f"{counter}: исправлено {rows}"))
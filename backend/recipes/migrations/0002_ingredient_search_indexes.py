@@ -0,0 +1,54 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_INDEXES = {
+    'postgresql': [
+        # istartswith: UPPER("name"::text) LIKE 'X%'
+        (
+            'recipes_ingredient_name_prefix_idx',
+            'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_prefix_idx '
+            'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)',
+        ),
+        # icontains: UPPER("name"::text) LIKE '%X%'
+        (
+            'recipes_ingredient_name_upper_trgm_idx',
+            'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_upper_trgm_idx '
+            'ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)',
+        ),
+        # trigram_similar: "name" % 'x'
+        (
+            'recipes_ingredient_name_trgm_idx',
+            'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm_idx '
+            'ON recipes_ingredient USING gin (name gin_trgm_ops)',
+        ),
+    ],
+    'sqlite': [
+        (
+            'recipes_ingredient_name_nocase_idx',
+            'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_nocase_idx '
+            'ON recipes_ingredient (name COLLATE NOCASE)',
+        ),
+    ],
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    for _, sql in SEARCH_INDEXES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for name, _ in SEARCH_INDEXES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 05:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeShortLink',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='short_link', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('code', models.CharField(max_length=16, unique=True, verbose_name='Код ссылки')),
+            ],
+            options={
+                'verbose_name': 'Короткая ссылка',
+                'verbose_name_plural': 'Короткие ссылки',
+            },
+        ),
+    ]
@@ -6,6 +6,7 @@ MIN_INGREDIENT_AMOUNT = 1
 MAX_INGREDIENT_AMOUNT = 32000
 MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 32000
+SHORT_LINK_MAX_LENGTH = 16
 
 
 class Ingredient(models.Model):
@@ -53,6 +54,12 @@ class Recipe(models.Model):
         upload_to="recipes/images/",
         help_text="Добавьте визуальное представление рецепта",
     )
+    image_renditions = models.JSONField(
+        verbose_name="Уменьшенные копии фото",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name="Текстовое описание рецепта",
         help_text="Опишите шаги приготовления и состав",
@@ -77,11 +84,25 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name="Дата добавления", auto_now_add=True, db_index=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True, db_index=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="Количество в избранном", default=0, editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        verbose_name="Количество в списках покупок", default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ["-pub_date"]
         verbose_name = "Кулинарный рецепт"
         verbose_name_plural = "Кулинарные рецепты"
+        indexes = [
+            models.Index(fields=["pub_date", "id"],
+                         name="recipe_pub_date_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} (автор: {self.author.username})"
@@ -187,3 +208,59 @@ class ShoppingListEntry(models.Model):
 
     def __str__(self):
         return f'"{self.recipe.name}" в списке покупок у {self.user.username}'
+
+
+class RecipeShortLink(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="short_link",
+        verbose_name="Рецепт",
+    )
+    code = models.CharField(
+        verbose_name="Код ссылки",
+        max_length=SHORT_LINK_MAX_LENGTH,
+        unique=True,
+    )
+
+    class Meta:
+        verbose_name = "Короткая ссылка"
+        verbose_name_plural = "Короткие ссылки"
+
+    def __str__(self):
+        return f"/s/{self.code}"
+
+
+class SimilarRecipe(models.Model):
+    """Один из ближайших соседей рецепта по составу (recipes.similar)."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="similar_links",
+        verbose_name="Рецепт",
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Похожий рецепт",
+    )
+    score = models.FloatField(verbose_name="Сходство")
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "similar"], name="unique_similar_recipe"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["recipe", "-score"],
+                         name="similar_recipe_score_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.similar_id} ({self.score:.3f})"
@@ -0,0 +1,225 @@
+import time
+from array import array
+from collections import defaultdict, deque
+from functools import lru_cache
+from itertools import groupby, repeat
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram.metrics import record_cache
+
+VERSION_KEY = "pantry_index:version"
+# Во сколько раз рецептов должно быть больше, чем позиций в списке,
+# чтобы маску было быстрее собрать побайтовым циклом
+SPARSE_RATIO = 32
+
+
+def to_bitmap(positions, length):
+    """Битовая маска (int), где бит p установлен для каждой позиции.
+
+    Короткие списки расставляются по байтам в цикле. Для длинных это
+    медленно, и позиции ставятся в строку из нулей на уровне C, а
+    строка разбирается int(..., 2) — это линейно по числу рецептов.
+    """
+    if not positions:
+        return 0
+    if len(positions) * SPARSE_RATIO < length:
+        buffer = bytearray(length // 8 + 1)
+        for position in positions:
+            buffer[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(buffer, "little")
+    digits = bytearray(b"0") * length
+    deque(map(digits.__setitem__, positions, repeat(ord("1"))), maxlen=0)
+    return int(digits[::-1], 2)
+
+
+def add_bitmap(counter, bitmap):
+    """Прибавляет по единице в позициях bitmap к счётчику, хранимому
+    по разрядам: counter[i] — маска рецептов, у которых i-й бит числа
+    совпадений равен 1."""
+    for index, digit in enumerate(counter):
+        counter[index], bitmap = digit ^ bitmap, digit & bitmap
+        if not bitmap:
+            return
+    counter.append(bitmap)
+
+
+def equal_mask(counter, value, mask):
+    """Рецепты из mask, у которых счётчик равен value."""
+    for index, digit in enumerate(counter):
+        mask = mask & digit if value >> index & 1 else mask ^ (mask & digit)
+    return mask if value >> len(counter) == 0 else 0
+
+
+class Ranking:
+    """Рецепты-кандидаты, упорядоченные по покрытию ингредиентами.
+
+    Кандидаты разбиты на уровни (совпало m из s ингредиентов рецепта).
+    Уровни идут по убыванию покрытия m / s, при равном — по числу
+    недостающих; полностью покрытые рецепты (m = s) образуют одну
+    группу. Внутри группы рецепты идут от новых к старым. Срез для
+    Paginator проходит группы по порядку и извлекает только нужные биты.
+    """
+
+    def __init__(self, index, candidates, counter, have):
+        self.index = index
+        self.candidates = candidates
+        self.counter = counter
+        groups = defaultdict(list)
+        for matched in range(1, have + 1):
+            for size in index.size_masks:
+                if size >= matched:
+                    groups[matched / size, matched - size].append(
+                        (matched, size)
+                    )
+        self.groups = [groups[key] for key in sorted(groups, reverse=True)]
+
+    def __len__(self):
+        return self.candidates.bit_count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("Ranking поддерживает только срезы.")
+        start, stop = index.start or 0, index.stop
+        matched_masks = {}
+        results = []
+        skipped = 0
+        for group in self.groups:
+            if stop is not None and skipped + len(results) >= stop:
+                break
+            levels = []
+            for matched, size in group:
+                if matched not in matched_masks:
+                    matched_masks[matched] = equal_mask(
+                        self.counter, matched, self.candidates
+                    )
+                mask = matched_masks[matched] & self.index.size_masks[size]
+                if mask:
+                    levels.append([mask, matched, size])
+            if skipped < start:
+                count = sum(mask.bit_count() for mask, _, _ in levels)
+                if skipped + count <= start:
+                    skipped += count
+                    continue
+            while levels and (stop is None
+                              or skipped + len(results) < stop):
+                level = max(levels, key=lambda item: item[0].bit_length())
+                mask, matched, size = level
+                position = mask.bit_length() - 1
+                level[0] ^= 1 << position
+                if not level[0]:
+                    levels.remove(level)
+                if skipped < start:
+                    skipped += 1
+                    continue
+                results.append((self.index.recipe_ids[position], matched,
+                                size - matched))
+        return results
+
+
+class PantryIndex:
+    """Обратный индекс ингредиент → рецепты для поиска «что приготовить».
+
+    Рецепты пронумерованы по возрастанию id; для каждого ингредиента
+    хранится отсортированный массив номеров его рецептов. Для поиска
+    массивы превращаются в битовые маски (недавние держатся в памяти в
+    пределах PANTRY_BITMAP_CACHE_MB), и число совпадений считается
+    побитовыми операциями над всеми рецептами сразу, без соединений
+    RecipeIngredientLink с самой собой.
+    """
+
+    def __init__(self, version, rows):
+        """rows — пары (рецепт, ингредиент), упорядоченные по рецепту."""
+        self.version = version
+        self.built = time.monotonic()
+        self.recipe_ids = array("q")
+        postings = defaultdict(lambda: array("i"))
+        by_size = defaultdict(lambda: array("i"))
+        for position, (recipe_id, group) in enumerate(
+            groupby(rows, key=itemgetter(0))
+        ):
+            ingredients = [ingredient_id for _, ingredient_id in group]
+            self.recipe_ids.append(recipe_id)
+            by_size[len(ingredients)].append(position)
+            for ingredient_id in ingredients:
+                postings[ingredient_id].append(position)
+        self.postings = dict(postings)
+        length = len(self.recipe_ids)
+        self.size_masks = {
+            size: to_bitmap(positions, length)
+            for size, positions in by_size.items()
+        }
+        # Маска занимает len(recipe_ids) / 8 байт.
+        self.get_bitmap = lru_cache(maxsize=max(
+            1, settings.PANTRY_BITMAP_CACHE_MB * 2 ** 23 // (length or 1)
+        ))(self.make_bitmap)
+
+    def make_bitmap(self, ingredient_id):
+        return to_bitmap(self.postings.get(ingredient_id),
+                         len(self.recipe_ids))
+
+    def search(self, ingredients=(), include=(), exclude=()):
+        """Рецепты, где есть хотя бы один из ingredients, все include и
+        ни одного exclude. Ингредиенты из include тоже считаются
+        имеющимися."""
+        have = set(ingredients) | set(include)
+        counter = []
+        candidates = 0
+        for ingredient_id in have:
+            bitmap = self.get_bitmap(ingredient_id)
+            candidates |= bitmap
+            add_bitmap(counter, bitmap)
+        for ingredient_id in set(include):
+            candidates &= self.get_bitmap(ingredient_id)
+        for ingredient_id in set(exclude):
+            candidates ^= candidates & self.get_bitmap(ingredient_id)
+        return Ranking(self, candidates, counter, len(have))
+
+
+_index = None
+
+
+def _load_rows():
+    from recipes.models import RecipeIngredientLink
+
+    return (
+        RecipeIngredientLink.objects.order_by("recipe_id")
+        .values_list("recipe_id", "ingredient_id")
+        .iterator(chunk_size=10000)
+    )
+
+
+def get_pantry_index():
+    """Индекс текущей версии из памяти воркера.
+
+    После изменения рецептов индекс пересобирается не чаще раза в
+    PANTRY_INDEX_REBUILD_INTERVAL секунд, до этого отвечает прежний.
+    Удалённые за это время рецепты отбрасываются при выборке из базы.
+    """
+    global _index
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    if _index is not None and (
+        _index.version == version
+        or time.monotonic() - _index.built
+        < settings.PANTRY_INDEX_REBUILD_INTERVAL
+    ):
+        record_cache("pantry_index", True)
+        return _index
+    record_cache("pantry_index", False)
+    _index = PantryIndex(version, _load_rows())
+    return _index
+
+
+def invalidate_pantry():
+    """Помечает индексы всех воркеров устаревшими после фиксации."""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    )
@@ -0,0 +1,223 @@
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .counters import COUNTERS, actual_count, change_counter
+
+# Итог для каждого идентификатора в пакетных операциях
+ADDED = "added"
+EXISTS = "exists"
+REMOVED = "removed"
+MISSING = "missing"
+NOT_FOUND = "not_found"
+
+
+def _describe(source):
+    """Таблица связи и счётчик, который она ведёт (из COUNTERS)."""
+    for target, field, counted, foreign_key in COUNTERS:
+        if counted is source:
+            break
+    else:
+        raise ValueError(f"Для {source.__name__} нет счётчика.")
+    using = router.db_for_write(source)
+    quote = connections[using].ops.quote_name
+    meta = source._meta
+    return {
+        "source": source,
+        "using": using,
+        "target": target,
+        "field": field,
+        "foreign_key_name": foreign_key,
+        "table": quote(meta.db_table),
+        "user": quote(meta.get_field("user").column),
+        "foreign_key": quote(meta.get_field(foreign_key).column),
+        "created": next(
+            item for item in meta.concrete_fields
+            if getattr(item, "auto_now_add", False)
+        ),
+        "target_table": quote(target._meta.db_table),
+        "target_pk": quote(target._meta.pk.column),
+        "counter": quote(target._meta.get_field(field).column),
+    }
+
+
+def get_target_id(value):
+    """Идентификатор из URL; None, если он не число."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _insert_returning(parts, user_id, condition, target_ids):
+    """INSERT связей с существующими целями (условие condition на их
+    pk) без дубликатов; RETURNING отдаёт цели добавленных связей."""
+    created = parts["created"]
+    connection = connections[parts["using"]]
+    sql = (
+        f"INSERT INTO {parts['table']} "
+        f"({parts['user']}, {parts['foreign_key']}, "
+        f"{connection.ops.quote_name(created.column)}) "
+        f"SELECT %s, {parts['target_pk']}, %s "
+        f"FROM {parts['target_table']} "
+        f"WHERE {parts['target_pk']} {condition} "
+        f"ON CONFLICT DO NOTHING RETURNING {parts['foreign_key']}"
+    )
+    params = [
+        user_id,
+        created.get_db_prep_value(timezone.now(), connection),
+        *target_ids,
+    ]
+    return sql, params
+
+
+def _apply(parts, change_sql, params, delta, target_id):
+    """Выполняет INSERT/DELETE ... RETURNING и меняет счётчик.
+
+    В PostgreSQL оба изменения идут одним запросом через CTE, без
+    отдельной транзакции; в остальных базах — двумя в транзакции.
+    """
+    connection = connections[parts["using"]]
+    if connection.vendor == "postgresql":
+        sign = "+" if delta > 0 else "-"
+        counter = parts["counter"]
+        sql = (
+            f"WITH changed AS ({change_sql}) "
+            f"UPDATE {parts['target_table']} "
+            f"SET {counter} = GREATEST({counter} {sign} 1, 0) "
+            f"WHERE {parts['target_pk']} IN (SELECT * FROM changed) "
+            f"RETURNING {parts['target_pk']}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone() is not None
+    with transaction.atomic(using=parts["using"]):
+        with connection.cursor() as cursor:
+            cursor.execute(change_sql, params)
+            changed = cursor.fetchone() is not None
+        if changed:
+            change_counter(parts["target"], target_id, parts["field"], delta)
+    return changed
+
+
+def add_relation(source, user_id, target_id):
+    """Добавляет связь (избранное, покупки, подписку) и счётчик цели.
+
+    Опирается на уникальное ограничение: повторное добавление, как и
+    несуществующая цель, ничего не меняет и возвращает False. Сигналы
+    post_save не отправляются.
+    """
+    parts = _describe(source)
+    target_id = get_target_id(target_id)
+    if target_id is None:
+        return False
+    sql, params = _insert_returning(parts, user_id, "= %s", [target_id])
+    return _apply(parts, sql, params, 1, target_id)
+
+
+def remove_relation(source, user_id, target_id):
+    """Удаляет связь одним DELETE ... RETURNING; False, если её не было.
+
+    Сигналы post_delete не отправляются.
+    """
+    parts = _describe(source)
+    target_id = get_target_id(target_id)
+    if target_id is None:
+        return False
+    sql = (
+        f"DELETE FROM {parts['table']} "
+        f"WHERE {parts['user']} = %s AND {parts['foreign_key']} = %s "
+        f"RETURNING {parts['foreign_key']}"
+    )
+    return _apply(parts, sql, [user_id, target_id], -1, target_id)
+
+
+def _recount(parts, target_ids):
+    """Пересчитывает счётчик у затронутых целей по фактическим связям.
+
+    В отличие от +1/-1, не расходится с данными, если параллельный
+    запрос успел изменить те же связи.
+    """
+    if target_ids:
+        parts["target"].objects.filter(pk__in=target_ids).update(**{
+            parts["field"]: actual_count(parts["source"],
+                                         parts["foreign_key_name"]),
+        })
+
+
+def _delete_returning(parts, where, params):
+    """Один DELETE ... RETURNING; идентификаторы целей удалённых связей."""
+    with connections[parts["using"]].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {parts['table']} WHERE {where} "
+            f"RETURNING {parts['foreign_key']}",
+            params,
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def add_relations(source, user_id, target_ids):
+    """Пакетное добавление: {идентификатор: ADDED | EXISTS | NOT_FOUND}.
+
+    Связи создаются одним INSERT ... SELECT ... ON CONFLICT DO NOTHING
+    RETURNING: добавленными считаются только возвращённые им цели, так
+    что параллельный запрос с теми же идентификаторами не получит ADDED
+    второй раз. Сигналы post_save не отправляются.
+    """
+    parts = _describe(source)
+    placeholders = ", ".join(["%s"] * len(target_ids))
+    sql, params = _insert_returning(parts, user_id, f"IN ({placeholders})",
+                                    target_ids)
+    with transaction.atomic(using=parts["using"]):
+        with connections[parts["using"]].cursor() as cursor:
+            cursor.execute(sql, params)
+            added = {row[0] for row in cursor.fetchall()}
+        _recount(parts, added)
+    rest = set(target_ids) - added
+    if rest:
+        rest -= set(
+            parts["target"].objects.filter(pk__in=rest)
+            .values_list("pk", flat=True)
+        )
+    return {
+        pk: ADDED if pk in added else NOT_FOUND if pk in rest else EXISTS
+        for pk in target_ids
+    }
+
+
+def remove_relations(source, user_id, target_ids):
+    """Пакетное удаление: {идентификатор: REMOVED | MISSING | NOT_FOUND}.
+
+    Сигналы post_delete не отправляются.
+    """
+    parts = _describe(source)
+    placeholders = ", ".join(["%s"] * len(target_ids))
+    with transaction.atomic(using=parts["using"]):
+        removed = set(_delete_returning(
+            parts,
+            f"{parts['user']} = %s "
+            f"AND {parts['foreign_key']} IN ({placeholders})",
+            [user_id, *target_ids],
+        ))
+        _recount(parts, removed)
+    rest = set(target_ids) - removed
+    if rest:
+        rest -= set(
+            parts["target"].objects.filter(pk__in=rest)
+            .values_list("pk", flat=True)
+        )
+    return {
+        pk: REMOVED if pk in removed else NOT_FOUND if pk in rest
+        else MISSING
+        for pk in target_ids
+    }
+
+
+def clear_relations(source, user_id):
+    """Удаляет все связи пользователя (весь список покупок, все
+    подписки) и возвращает их число."""
+    parts = _describe(source)
+    with transaction.atomic(using=parts["using"]):
+        removed = _delete_returning(parts, f"{parts['user']} = %s",
+                                    [user_id])
+        _recount(parts, removed)
+    return len(removed)
@@ -0,0 +1,135 @@
+import secrets
+import string
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from foodgram.metrics import record_cache
+
+from .models import Recipe, RecipeShortLink
+
+ALPHABET = string.digits + string.ascii_letters
+CODE_KEY = "short_link:{code}"
+# Сколько раз пробовать новый код, если случайный уже занят
+ATTEMPTS = 5
+# Несуществующий код тоже кэшируется, чтобы перебор не шёл в базу.
+MISSING = 0
+
+
+def new_code():
+    return "".join(
+        secrets.choice(ALPHABET) for _ in range(settings.SHORT_LINK_LENGTH)
+    )
+
+
+def remember(links):
+    """Кладёт пары (код, рецепт) в кэш редиректов."""
+    cache.set_many(
+        {CODE_KEY.format(code=code): recipe_id for code, recipe_id in links},
+        timeout=settings.SHORT_LINK_CACHE_TIMEOUT,
+    )
+
+
+def forget(code):
+    cache.delete(CODE_KEY.format(code=code))
+
+
+def resolve(code):
+    """Идентификатор рецепта по коду или None.
+
+    При попадании в кэш база не запрашивается вовсе.
+    """
+    key = CODE_KEY.format(code=code)
+    recipe_id = cache.get(key)
+    record_cache("short_link", recipe_id is not None)
+    if recipe_id is None:
+        recipe_id = (
+            RecipeShortLink.objects.filter(code=code)
+            .values_list("recipe_id", flat=True).first()
+        ) or MISSING
+        cache.set(key, recipe_id, timeout=settings.SHORT_LINK_CACHE_TIMEOUT)
+    return recipe_id or None
+
+
+def get_code(recipe_id):
+    """Код ссылки на рецепт; создаётся при первом запросе.
+
+    None, если рецепта нет.
+    """
+    code = (
+        RecipeShortLink.objects.filter(recipe_id=recipe_id)
+        .values_list("code", flat=True).first()
+    )
+    if code is not None:
+        return code
+    if not Recipe.objects.filter(pk=recipe_id).exists():
+        return None
+    for _ in range(ATTEMPTS):
+        code = new_code()
+        try:
+            with transaction.atomic():
+                RecipeShortLink.objects.create(recipe_id=recipe_id,
+                                               code=code)
+        except IntegrityError:
+            # Занят код или ссылку параллельно создал другой запрос.
+            existing = (
+                RecipeShortLink.objects.filter(recipe_id=recipe_id)
+                .values_list("code", flat=True).first()
+            )
+            if existing is not None:
+                return existing
+            continue
+        remember([(code, recipe_id)])
+        return code
+    raise IntegrityError("Не удалось подобрать свободный код ссылки.")
+
+
+def generate_missing(batch_size=1000):
+    """Создаёт ссылки для всех рецептов без них; возвращает их число.
+
+    Коды, совпавшие с занятыми, пропускаются bulk_create и достаются
+    рецепту на следующем проходе. Отрицательные записи кэша для новых
+    кодов удаляются.
+    """
+    created = 0
+    while True:
+        recipe_ids = list(
+            Recipe.objects.filter(short_link__isnull=True)
+            .order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not recipe_ids:
+            return created
+        links = RecipeShortLink.objects.bulk_create(
+            [
+                RecipeShortLink(recipe_id=recipe_id, code=new_code())
+                for recipe_id in recipe_ids
+            ],
+            ignore_conflicts=True,
+        )
+        codes = list(
+            RecipeShortLink.objects.filter(
+                recipe_id__in=recipe_ids,
+                code__in=[link.code for link in links],
+            ).values_list("code", flat=True)
+        )
+        # Пока код был свободен, его могли запросить и закэшировать как
+        # несуществующий.
+        cache.delete_many([CODE_KEY.format(code=code) for code in codes])
+        created += len(codes)
+
+
+def warm_cache(batch_size=1000):
+    """Загружает все коды в кэш редиректов; возвращает их число."""
+    total = 0
+    batch = []
+    links = RecipeShortLink.objects.order_by().values_list("code",
+                                                           "recipe_id")
+    for link in links.iterator(chunk_size=batch_size):
+        batch.append(link)
+        if len(batch) == batch_size:
+            remember(batch)
+            total += len(batch)
+            batch = []
+    remember(batch)
+    return total + len(batch)
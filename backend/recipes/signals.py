@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .images import enqueue
+from .models import Ingredient, Recipe, RecipeShortLink
+from .short_links import forget
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_catalog(sender, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(post_delete, sender=RecipeShortLink)
+def forget_short_link(sender, instance, **kwargs):
+    forget(instance.code)
+
+
+def queue_renditions(instance, field_name):
+    """Ставит в очередь копии нового изображения, по одной на файл."""
+    field_file = getattr(instance, field_name)
+    renditions = getattr(instance, f"{field_name}_renditions") or {}
+    if not field_file or renditions.get("source") == field_file.name:
+        return
+    queued = instance.__dict__.setdefault("_queued_renditions", set())
+    if (field_name, field_file.name) in queued:
+        return
+    queued.add((field_name, field_file.name))
+    enqueue(instance, field_name)
+
+
+@receiver(post_save, sender=Recipe)
+def queue_recipe_image_renditions(sender, instance, **kwargs):
+    queue_renditions(instance, "image")
+
+
+@receiver(post_save, sender=get_user_model())
+def queue_avatar_renditions(sender, instance, **kwargs):
+    queue_renditions(instance, "avatar")
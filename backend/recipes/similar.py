@@ -0,0 +1,192 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, OuterRef, Subquery
+
+from .images import SIMILAR_TASK, schedule
+from .models import RecipeIngredientLink, SimilarRecipe
+
+# Рецепт — множество ингредиентов, то есть строка бинарной матрицы
+# рецепт × ингредиент. Сходство — косинус между строками:
+# общих ингредиентов / sqrt(ингредиентов в одном * ингредиентов в другом).
+# Для пары он зависит только от их составов, поэтому после изменения
+# одного рецепта достаточно пересчитать списки, где он есть или может
+# появиться.
+
+
+def cosine(shared, size, other_size):
+    return shared / math.sqrt(size * other_size)
+
+
+def get_top(scores):
+    """Лучшие SIMILAR_RECIPES_COUNT пар (рецепт, сходство); при равном
+    сходстве выше более новый рецепт."""
+    return heapq.nlargest(
+        settings.SIMILAR_RECIPES_COUNT, scores.items(),
+        key=lambda item: (item[1], item[0]),
+    )
+
+
+def _ingredient_count(outer):
+    return Subquery(
+        RecipeIngredientLink.objects.filter(recipe_id=OuterRef(outer))
+        .order_by()
+        .values("recipe_id")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+
+
+def get_scores(recipe_ids):
+    """Сходство заданных рецептов со всеми, у кого есть общий
+    ингредиент, одним запросом: {рецепт: {другой рецепт: сходство}}."""
+    other = "ingredient__recipe_ingredients__recipe_id"
+    rows = (
+        RecipeIngredientLink.objects.filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values(source=F("recipe_id"), target=F(other))
+        .annotate(
+            shared=Count("pk"),
+            source_size=_ingredient_count("recipe_id"),
+            target_size=_ingredient_count(other),
+        )
+        .values_list("source", "target", "shared", "source_size",
+                     "target_size")
+    )
+    scores = defaultdict(dict)
+    for source, target, shared, size, other_size in rows:
+        if source != target:
+            scores[source][target] = cosine(shared, size, other_size)
+    return scores
+
+
+def _replace(neighbours):
+    """Заменяет списки соседей: {рецепт: [(сосед, сходство), ...]}."""
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id__in=neighbours).delete()
+        SimilarRecipe.objects.bulk_create([
+            SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                          score=score)
+            for recipe_id, top in neighbours.items()
+            for similar_id, score in top
+        ])
+
+
+def recompute(recipe_ids):
+    """Пересчитывает с нуля списки соседей заданных рецептов."""
+    if recipe_ids:
+        scores = get_scores(recipe_ids)
+        _replace({
+            recipe_id: get_top(scores.get(recipe_id, {}))
+            for recipe_id in recipe_ids
+        })
+
+
+def refresh(recipe_id):
+    """Обновляет соседей после изменения состава рецепта.
+
+    Пересчитываются его собственный список, списки, где он уже был
+    (сходство могло упасть, а следующего кандидата в таблице нет), и
+    списки, куда он теперь проходит по сходству.
+    """
+    scores = get_scores([recipe_id]).get(recipe_id, {})
+    affected = set(
+        SimilarRecipe.objects.filter(similar_id=recipe_id)
+        .values_list("recipe_id", flat=True)
+    )
+    lists = {
+        row["recipe_id"]: row
+        for row in SimilarRecipe.objects.filter(recipe_id__in=scores)
+        .order_by()
+        .values("recipe_id")
+        .annotate(total=Count("pk"), lowest=Min("score"))
+    }
+    for other_id, score in scores.items():
+        row = lists.get(other_id)
+        if (
+            row is None
+            or row["total"] < settings.SIMILAR_RECIPES_COUNT
+            or score >= row["lowest"]
+        ):
+            affected.add(other_id)
+    affected.discard(recipe_id)
+    others = get_scores(affected) if affected else {}
+    _replace({
+        recipe_id: get_top(scores),
+        **{
+            other_id: get_top(others.get(other_id, {}))
+            for other_id in affected
+        },
+    })
+
+
+def refresh_similar(recipe_id):
+    """Ставит обновление соседей рецепта в очередь process_images:
+    пересчёт затрагивает все рецепты с общими ингредиентами и не должен
+    занимать запрос."""
+    schedule({"task": SIMILAR_TASK, "refresh": recipe_id})
+
+
+def forget_similar(recipe_id):
+    """Вызывается до удаления рецепта: ставит в очередь пересчёт
+    списков, в которых он был (после удаления их уже не найти)."""
+    referrers = list(
+        SimilarRecipe.objects.filter(similar_id=recipe_id)
+        .values_list("recipe_id", flat=True)
+    )
+    if referrers:
+        schedule({"task": SIMILAR_TASK, "recompute": referrers})
+
+
+def run_job(job):
+    """Выполняет задание из refresh_similar или forget_similar."""
+    if "refresh" in job:
+        refresh(job["refresh"])
+    else:
+        recompute(job["recompute"])
+
+
+def rebuild(batch_size=5000):
+    """Полный пересчёт в памяти; возвращает число сохранённых пар.
+
+    Из связей строятся списки рецептов по ингредиентам (столбцы
+    разреженной матрицы), и общие ингредиенты каждого рецепта со всеми
+    остальными считаются одним проходом по его столбцам.
+    """
+    postings = defaultdict(list)
+    ingredients = defaultdict(list)
+    links = RecipeIngredientLink.objects.order_by().values_list(
+        "recipe_id", "ingredient_id"
+    )
+    for recipe_id, ingredient_id in links.iterator(chunk_size=batch_size):
+        postings[ingredient_id].append(recipe_id)
+        ingredients[recipe_id].append(ingredient_id)
+
+    total = 0
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        batch = []
+        for recipe_id, own in ingredients.items():
+            shared = Counter()
+            for ingredient_id in own:
+                shared.update(postings[ingredient_id])
+            del shared[recipe_id]
+            size = len(own)
+            top = get_top({
+                other_id: cosine(count, size, len(ingredients[other_id]))
+                for other_id, count in shared.items()
+            })
+            batch += [
+                SimilarRecipe(recipe_id=recipe_id, similar_id=other_id,
+                              score=score)
+                for other_id, score in top
+            ]
+            if len(batch) >= batch_size:
+                SimilarRecipe.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SimilarRecipe.objects.bulk_create(batch)
+    return total + len(batch)
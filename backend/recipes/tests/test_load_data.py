@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from api.feed_cache import FEED_VERSION_KEY
+from recipes import catalog, pantry
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredientLink,
+    SimilarRecipe,
+)
+from users.models import User, UserSubscription
+
+MODELS = (Ingredient, User, Recipe, RecipeIngredientLink, UserSubscription)
+
+
+class LoadDataTests(TestCase):
+    def load(self, *args, **options):
+        call_command("load_data", *args, stdout=StringIO(), **options)
+
+    def get_counts(self):
+        return {model.__name__: model.objects.count() for model in MODELS}
+
+    def test_update_twice(self):
+        self.load(update=True)
+        counts = self.get_counts()
+        self.assertTrue(all(counts.values()), counts)
+        self.load(update=True)
+        self.assertEqual(self.get_counts(), counts)
+
+    def test_load_ingredients_update(self):
+        call_command("load_ingredients", update=True, stdout=StringIO())
+        total = Ingredient.objects.count()
+        call_command("load_ingredients", update=True, stdout=StringIO())
+        self.assertEqual(Ingredient.objects.count(), total)
+
+    def test_update_overwrites_existing_rows(self):
+        self.load("users")
+        user = User.objects.order_by("pk").first()
+        User.objects.filter(pk=user.pk).update(first_name="Изменено")
+        self.load("users", update=True)
+        self.assertNotEqual(
+            User.objects.get(pk=user.pk).first_name, "Изменено"
+        )
+
+    def test_update_keeps_service_fields(self):
+        self.load()
+        recipe = Recipe.objects.order_by("pk").first()
+        renditions = {"source": recipe.image.name}
+        updated_at = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            name="Изменено", image_renditions=renditions,
+            updated_at=updated_at,
+        )
+        self.load("recipes", update=True)
+        recipe.refresh_from_db()
+        self.assertNotEqual(recipe.name, "Изменено")
+        self.assertEqual(recipe.image_renditions, renditions)
+        self.assertEqual(recipe.updated_at, updated_at)
+
+    def test_refreshes_derived_data(self):
+        self.load()
+        first, second = Recipe.objects.order_by("pk")[:2]
+        # У этих рецептов нет общих ингредиентов: пара устарела.
+        SimilarRecipe.objects.create(recipe=first, similar=second, score=1)
+        keys = (catalog.VERSION_KEY, pantry.VERSION_KEY, FEED_VERSION_KEY)
+        cache.set_many(dict.fromkeys(keys, 0), timeout=None)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load("recipe_ingredients")
+        self.assertNotIn(0, cache.get_many(keys).values())
+        self.assertFalse(SimilarRecipe.objects.filter(recipe=first,
+                                                      similar=second))
+
+    @skipUnless(connection.vendor == "postgresql", "COPY есть только в PG")
+    def test_copy_update_twice(self):
+        self.load(copy=True, update=True)
+        counts = self.get_counts()
+        self.assertTrue(all(counts.values()), counts)
+        self.load(copy=True, update=True)
+        self.assertEqual(self.get_counts(), counts)
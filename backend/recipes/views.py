@@ -0,0 +1,14 @@
+from django.http import Http404, HttpResponseRedirect
+
+from .short_links import resolve
+
+# Страница рецепта во фронтенде
+RECIPE_PAGE = "/recipes/{id}"
+
+
+def short_link_redirect(request, code):
+    """Переход по короткой ссылке /s/<code>/ на страницу рецепта."""
+    recipe_id = resolve(code)
+    if recipe_id is None:
+        raise Http404
+    return HttpResponseRedirect(RECIPE_PAGE.format(id=recipe_id))
@@ -14,6 +14,8 @@ class UserAdmin(BaseUserAdmin):
         "last_name",
         "is_staff",
         "is_active",
+        "recipes_count",
+        "followers_count",
     )
     search_fields = ("email", "username", "first_name", "last_name")
     list_filter = ("is_staff", "is_active", "date_joined")
@@ -43,6 +43,21 @@ class User(AbstractUser):
         null=True,
         help_text="Загрузите ваш аватар",
     )
+    avatar_renditions = models.JSONField(
+        verbose_name="Уменьшенные копии аватара",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения профиля", auto_now=True
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Количество рецептов", default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Количество подписчиков", default=0, editable=False
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]